@@ -0,0 +1,155 @@
+# coding: utf-8
+"""
+Cubo de acessos (periódico x ano de publicação x mês de acesso x tipo de
+acesso) acumulado em memória durante o accesses.dumpdata.
+
+Os acessos diários são somados no mês. Ao final do processamento o cubo
+produz as tabulações por periódico e por coleção, por ano de publicação e
+ano de acesso, as mesmas do accesses.documents_by_journals, sem uma nova
+leitura dos documentos e sem consultas ao AccessStats.
+
+O cubo é esparso: apenas as células (periódico, ano de publicação, mês de
+acesso) com acessos são mantidas, em um dicionário de vetores int32 com um
+contador por tipo de acesso. A memória é limitada pelo número de células
+com acessos, cerca de 200 bytes por célula (chave, entrada do dicionário e
+vetor), e não pelo produto das dimensões. Uma coleção com 300 periódicos,
+60 anos de publicação e 120 meses de acesso ocupa no máximo 2.160.000
+células (cerca de 430MB), em geral uma pequena fração disso.
+"""
+from __future__ import absolute_import
+import array
+import datetime
+import threading
+
+import output
+from thrift.ratchet import ACCESS_TYPES
+
+# ordem das colunas de acessos do accesses.documents_by_journals
+ROLLUP_TYPES = ('html', 'abstract', 'pdf', 'readcube')
+
+
+class Axis(object):
+    """
+    Índices dos valores de uma dimensão do cubo, na ordem de inclusão.
+    """
+
+    def __init__(self):
+        self.values = []
+        self._index = {}
+
+    def index(self, value):
+        try:
+            return self._index[value]
+        except KeyError:
+            self._index[value] = len(self.values)
+            self.values.append(value)
+            return self._index[value]
+
+    def __len__(self):
+        return len(self.values)
+
+
+class AccessCube(object):
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.journals = Axis()
+        self.years = Axis()
+        self.months = Axis()
+        self.titles = {}
+        # {(periódico, ano de publicação, mês): array('i') por ACCESS_TYPES}
+        self.cells = {}
+        self._lock = threading.Lock()
+
+    def add(self, issn, title, publication_year, accesses):
+        """
+        Soma os acessos de um documento no formato {data: {tipo: total}}.
+        """
+        if not accesses:
+            return
+
+        with self._lock:
+            self.titles.setdefault(issn, title)
+            journal = self.journals.index(issn)
+            year = self.years.index(publication_year)
+            for adate, adata in accesses.items():
+                counts = [adata.get(atype, 0) for atype in ACCESS_TYPES]
+                if not any(counts):
+                    continue
+
+                key = (journal, year, self.months.index(adate[:7]))
+                try:
+                    cell = self.cells[key]
+                except KeyError:
+                    cell = self.cells[key] = array.array('i', [0] * len(ACCESS_TYPES))
+                for i, count in enumerate(counts):
+                    cell[i] += count
+
+    def by_access_year(self):
+        """
+        Acessos por tipo, na ordem de ROLLUP_TYPES, no formato
+        {(ISSN, ano de publicação, ano de acesso): [total, ...]}.
+        """
+        order = [ACCESS_TYPES.index(atype) for atype in ROLLUP_TYPES]
+        result = {}
+
+        for (journal, year, month), cell in self.cells.items():
+            key = (
+                self.journals.values[journal],
+                self.years.values[year],
+                self.months.values[month][:4]
+            )
+            counts = result.setdefault(key, [0] * len(order))
+            for i, index in enumerate(order):
+                counts[i] += cell[index]
+
+        return result
+
+    def journal_rollup(self):
+        """
+        Linhas (ISSN, ano de publicação, ano de acesso, acessos por tipo
+        na ordem de ROLLUP_TYPES) com acessos.
+        """
+        for (issn, year, access_year), counts in self.by_access_year().items():
+            yield (issn, year, access_year, counts)
+
+    def collection_rollup(self):
+        """
+        Linhas (ano de publicação, ano de acesso, acessos por tipo na ordem
+        de ROLLUP_TYPES) da coleção.
+        """
+        result = {}
+
+        for (issn, year, access_year), counts in self.by_access_year().items():
+            totals = result.setdefault((year, access_year), [0] * len(counts))
+            for i, count in enumerate(counts):
+                totals[i] += count
+
+        for (year, access_year), counts in result.items():
+            yield (year, access_year, counts)
+
+    def write_rollups(self, journals_file, collection_file):
+        extraction_date = datetime.datetime.now().isoformat()[0:10]
+        header = [
+            u"publishing year", u"accesses year", u"accesses to html",
+            u"accesses to abstract", u"accesses to pdf", u"accesses to epdf",
+            u"total accesses"
+        ]
+
+        rows = sorted(self.journal_rollup())
+        with output.CSVWriter(journals_file) as writer:
+            writer.writerow([
+                u"extraction date", u"study unit", u"collection", u"ISSN SciELO",
+                u"title at SciELO"] + header)
+            for issn, year, access_year, counts in rows:
+                writer.writerow(
+                    [extraction_date, u'journal', self.collection, issn, self.titles.get(issn, u''),
+                     year, access_year] + [str(i) for i in counts] + [str(sum(counts))])
+
+        rows = sorted(self.collection_rollup())
+        with output.CSVWriter(collection_file) as writer:
+            writer.writerow([u"extraction date", u"study unit", u"collection"] + header)
+            for year, access_year, counts in rows:
+                writer.writerow(
+                    [extraction_date, u'collection', self.collection, year, access_year] +
+                    [str(i) for i in counts] + [str(sum(counts))])
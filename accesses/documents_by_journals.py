@@ -6,9 +6,9 @@ acesso para o texto completo em HTML, resumo em HTML, PDF e EPDF.
 
 import argparse
 import logging
-import codecs
 import datetime
 
+import output
 import utils
 import choices
 
@@ -44,12 +44,12 @@ def _config_logging(logging_level='INFO', logging_file=None):
 
 class Dumper(object):
 
-    def __init__(self, collection, issns=None, output_file=None):
-        self._articlemeta = utils.articlemeta_server()
+    def __init__(self, collection, issns=None, output_file=None, source=None, shard=None):
+        self._articlemeta = utils.articlemeta_server(source, shard)
         self._accessstats = utils.accessstats_server()
         self.collection = collection
         self.issns = issns
-        self.output_file = codecs.open(output_file, 'w', encoding='utf-8') if output_file else output_file
+        self.writer = output.CSVWriter(output_file)
         header = []
         header.append(u"extraction date")
         header.append(u"study unit")
@@ -70,17 +70,15 @@ class Dumper(object):
         header.append(u"accesses to epdf")
         header.append(u"total accesses")
 
-        self.write(u','.join([u'"%s"' % i.replace(u'"', u'""') for i in header]))
+        self.write(header)
 
     def write(self, line):
-        if not self.output_file:
-            print(line.encode('utf-8'))
-        else:
-            self.output_file.write('%s\r\n' % line)
+        self.writer.write(line)
 
     def run(self):
         for item in self.items():
             self.write(item)
+        self.writer.close()
         logger.info('Export finished')
 
     def items(self):
@@ -122,8 +120,7 @@ class Dumper(object):
         for item in acessos:
             l = None
             l = line + [str(i) for i in item]
-            joined_line = ','.join(['"%s"' % i.replace('"', '""') for i in l])
-            yield joined_line
+            yield l
 
 
 def main():
@@ -150,6 +147,20 @@ def main():
         help='File to receive the dumped data'
     )
 
+    parser.add_argument(
+        '--source',
+        '-s',
+        default=None,
+        help='Read ArticleMeta records from a local snapshot, ex: snapshot:/path/to/scl.db'
+    )
+
+    parser.add_argument(
+        '--shard',
+        type=utils.parse_shard,
+        default=None,
+        help='Process only the journals of partition K of N (stable hash of the ISSN SciELO), ex: 2/4'
+    )
+
     parser.add_argument(
         '--logging_file',
         '-o',
@@ -172,6 +183,6 @@ def main():
     if len(args.issns) > 0:
         issns = utils.ckeck_given_issns(args.issns)
 
-    dumper = Dumper(args.collection, issns, args.output_file)
+    dumper = Dumper(args.collection, issns, args.output_file, source=args.source, shard=args.shard)
 
     dumper.run()
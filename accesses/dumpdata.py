@@ -2,18 +2,23 @@
 """
 Esse processamento condença os metadados de documentos com os dados de acessos.
 """
+import os
 import sys
 import argparse
 import logging
 import re
 import json
-import codecs
 import datetime
 
-from legendarium.urlegendarium import URLegendarium
-
 import choices
+from document_record import DocumentRecord
+import matchkeys
+from matchkeys import pdf_keys, fbpe_key, eligible_match_keys
+import output
 import utils
+from accesses.negative_cache import NegativeCache, TTL
+from accesses.cube import AccessCube
+from thrift.ratchet import ACCESS_TYPES, date_bound
 
 __version__ = 0.1
 
@@ -21,11 +26,18 @@ logger = logging.getLogger(__name__)
 
 SUPPLBEG_REGEX = re.compile(r'^0 ')
 SUPPLEND_REGEX = re.compile(r' 0$')
-REGEX_PDF_PATH = re.compile(r'/pdf.*\.pdf$')
 FROM = '1500-01-01'
 UNTIL = datetime.datetime.now().isoformat()[0:10]
 DAYLY_GRANULARITY = False
 OUTPUT_FORMAT = 'csv'
+# long: uma linha por documento e data de acesso
+# wide: uma linha por documento com uma coluna por data e tipo de acesso
+# sparse: uma linha por documento com as datas de cada tipo de acesso
+# codificadas como 'data:total;data:total'
+LAYOUTS = ('long', 'wide', 'sparse')
+LAYOUT = 'long'
+# tipos de acesso e nomes das colunas csv
+CSV_ACCESS_TYPES = [('abstract', 'abstract'), ('html', 'html'), ('pdf', 'pdf'), ('readcube', 'epdf')]
 
 
 def _config_logging(logging_level='INFO', logging_file=None):
@@ -55,77 +67,6 @@ def _config_logging(logging_level='INFO', logging_file=None):
     return logger
 
 
-def pdf_keys(fulltexts):
-
-    keys = []
-
-    if not 'pdf' in fulltexts:
-        return keys
-
-    for language, url in fulltexts['pdf'].items():
-        path = REGEX_PDF_PATH.search(url)
-        if path:
-            keys.append(path.group().upper())
-
-    return keys
-
-
-def fbpe_key(code):
-    """
-    input:
-        'S0102-67202009000300001'
-    output:
-        'S0102-6720(09)000300001'
-    """
-
-    begin = code[0:10]
-    year = code[12:14]
-    end = code[14:]
-
-    return '%s(%s)%s' % (begin, year, end)
-
-
-def eligible_match_keys(document):
-    keys = []
-
-    keys.append(document.publisher_id)
-    keys.append(fbpe_key(document.publisher_id))
-    if document.doi:
-        keys.append(document.doi)
-    keys += pdf_keys(document.fulltexts())
-
-    suppl = ''.join([document.issue.supplement_volume or '', document.issue.supplement_number or '']).strip()
-
-    try:
-        leg = URLegendarium(
-            acron=document.journal.acronym,
-            year_pub=document.publication_date[:4],
-            volume=document.issue.volume,
-            number=document.issue.number,
-            fpage=document.start_page,
-            fpage_sequence=document.start_page_sequence,
-            lpage=document.end_page,
-            article_id=document.elocation,
-            suppl_number=suppl,
-            doi=document.doi,
-            order=document.issue.order
-        )
-    except ValueError as e:
-        logger.error(
-            'Fail to build legendarium eligible match key for %s_%s',
-            document.collection_acronym, document.publisher_id
-        )
-        logger.exception(e)
-        leg = ''
-
-    url_code = '/%s/' % leg.url_article if leg else ''
-
-    if url_code:
-        keys.append(url_code.upper())
-
-    return keys
-
-
 def country(country):
     if country in choices.ISO_3166:
         return country
@@ -134,34 +75,51 @@ def country(country):
     return 'undefined'
 
 
+_date_timestamps = {}
+
+
 def get_date_timestamp(date):
+    """
+    As mesmas datas de acesso se repetem entre os documentos, o resultado do
+    strptime é memorizado.
+    """
+    try:
+        return _date_timestamps[date]
+    except KeyError:
+        pass
+
     try:
-        return datetime.datetime.strptime(date, '%Y-%m').isoformat()
+        timestamp = datetime.datetime.strptime(date, '%Y-%m').isoformat()
     except ValueError:
         try:
-            return datetime.datetime.strptime(date, '%Y-%m-%d').isoformat()
+            timestamp = datetime.datetime.strptime(date, '%Y-%m-%d').isoformat()
         except ValueError:
-            return date
+            timestamp = date
 
-    return date
+    _date_timestamps[date] = timestamp
 
+    return timestamp
 
-def join_metadata_with_accesses(document, accesses_date, accesses):
 
-    issns = set()
-    issns.add(document.journal.scielo_issn)
-    if document.journal.print_issn:
-        issns.add(document.journal.print_issn)
-    if document.journal.electronic_issn:
-        issns.add(document.journal.electronic_issn)
+def document_metadata(document):
+    """
+    Metadados do documento comuns a todas as datas de acesso, calculados uma
+    única vez por documento.
+    """
+
+    record = DocumentRecord.of(document)
+    document = record.document
+
+    issns = set(record.issns)
+    issns.add(record.scielo_issn)
 
     data = {}
-    data['id'] = '_'.join([document.collection_acronym, document.publisher_id])
-    data['pid'] = document.publisher_id
-    data['issn'] = document.journal.scielo_issn
+    data['id'] = '_'.join([record.collection, record.publisher_id])
+    data['pid'] = record.publisher_id
+    data['issn'] = record.scielo_issn
     data['issns'] = issns
-    data['journal_title'] = document.journal.title
-    data['journal_current_status'] = document.journal.current_status
+    data['journal_title'] = record.journal_title
+    data['journal_current_status'] = record.current_status
     data['issue'] = document.issue.publisher_id
     data['document_title'] = ''
     if document.original_title():
@@ -175,16 +133,27 @@ def join_metadata_with_accesses(document, accesses_date, accesses):
     data['issue_title'] = ', '.join([document.journal.abbreviated_title, document.issue.publication_date[:4], document.issue.label])
     data['processing_date'] = document.processing_date
     data['publication_date_at_scielo'] = document.creation_date
-    data['publication_date'] = document.publication_date
-    data['publication_year'] = document.publication_date[0:4]
-    data['subject_areas'] = document.journal.subject_areas or ['undefined']
-    data['subject_areas'] = ['Multidisciplinary'] if len(data['subject_areas']) > 2 else data['subject_areas']
-    data['collection'] = document.collection_acronym
-    data['document_type'] = document.document_type
-    data['languages'] = list(set([i for i in document.languages()]+[document.original_language() or 'undefined']))
+    data['publication_date'] = record.publication_date
+    data['publication_year'] = record.publication_year
+    data['subject_areas'] = record.subject_areas or ['undefined']
+    data['subject_areas'] = ['Multidisciplinary'] if record.multidisciplinary else data['subject_areas']
+    data['collection'] = record.collection
+    data['document_type'] = record.document_type
+    data['languages'] = list(set([i for i in record.languages()]+[document.original_language() or 'undefined']))
     data['aff_countries'] = ['undefined']
-    if document.mixed_affiliations:
-        data['aff_countries'] = list(set([country(aff.get('country', 'undefined')) for aff in document.mixed_affiliations]))
+    mixed_affiliations = record.mixed_affiliations
+    if mixed_affiliations:
+        data['aff_countries'] = list(set([country(aff.get('country', 'undefined')) for aff in mixed_affiliations]))
+
+    return data
+
+
+def accesses_data(accesses_date, accesses):
+    """
+    Colunas de acesso de uma data.
+    """
+
+    data = {}
     data['access_date'] = get_date_timestamp(accesses_date)
     data['access_year'] = accesses_date[:4]
     data['access_month'] = accesses_date[5:7]
@@ -198,83 +167,114 @@ def join_metadata_with_accesses(document, accesses_date, accesses):
     return data
 
 
-def join_accesses(unique_id, accesses, from_date, until_date, dayly_granularity):
+def join_metadata_with_accesses(document, accesses_date, accesses, metadata=None):
     """
-    Esse metodo recebe 1 ou mais chaves para um documento em específico para que
-    os acessos sejam recuperados no Ratchet e consolidados em um unico id.
-    Esse processo é necessário pois os acessos de um documento podem ser registrados
-    para os seguintes ID's (PID, PID FBPE, Path PDF).
-    PID: Id original do SciELO ex: S0102-67202009000300001
-    PID FBPE: Id antigo do SciELO ex: S0102-6720(09)000300001
-    Path PDF: Quando o acesso é feito diretamente para o arquivo PDF no FS do
-    servidor ex: /pdf/rsp/v12n10/v12n10.pdf
+    Registro de uma data de acesso do documento. ``metadata`` recebe o
+    retorno de document_metadata para evitar o cálculo a cada data.
     """
-    logger.debug('joining accesses for: %s' % unique_id)
-    joined_data = {}
-    listed_data = []
-    def joining_monthly(joined_data, atype, data):
 
-        if 'total' in data:
-            del(data['total'])
+    data = dict(metadata or document_metadata(document))
+    data.update(accesses_data(accesses_date, accesses))
 
-        for year, months in data.items():
-            del(months['total'])
-            for month in months:
+    return data
 
-                dt = '%s-%s' % (year[1:], month[1:])
-                if not dt >= from_date[:7] or not dt <= until_date[:7]:
-                    continue
-                joined_data.setdefault(dt, {})
-                joined_data[dt].setdefault(atype, 0)
-                joined_data[dt][atype] += data[year][month]['total']
 
-        return joined_data
+def period_bound(date, end=False):
+    """
+    Data completa de um limite do período informado como 'AAAA',
+    'AAAA-MM' ou 'AAAA-MM-DD'. O limite final ``end`` é o último dia do mês
+    ou do ano.
+    """
+    return datetime.datetime.strptime(date_bound(date, end), '%Y-%m-%d').date()
 
-    def joining_dayly(joined_data, atype, data):
 
-        if 'total' in data:
-            del(data['total'])
+def access_periods(from_date, until_date, dayly_granularity=False):
+    """
+    Datas de acesso do período ('AAAA-MM' ou 'AAAA-MM-DD'), em ordem
+    crescente. Os limites podem ser datas parciais (ver period_bound).
+    """
+    begin = period_bound(from_date)
+    end = period_bound(until_date, end=True)
 
-        for year, months in data.items():
-            del(months['total'])
-            for month, days in months.items():
-                del(days['total'])
-                for day in days:
-                    dt = '%s-%s-%s' % (year[1:], month[1:], day[1:])
-                    if not dt >= from_date or not dt <= until_date:
-                        continue
-                    joined_data.setdefault(dt, {})
-                    joined_data[dt].setdefault(atype, 0)
-                    joined_data[dt][atype] += data[year][month][day]
+    if dayly_granularity:
+        return [
+            (begin + datetime.timedelta(days=i)).isoformat()
+            for i in range((end - begin).days + 1)
+        ]
 
-        return joined_data
+    periods = []
+    year, month = begin.year, begin.month
+    while (year, month) <= (end.year, end.month):
+        periods.append('%04d-%02d' % (year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
 
-    joining = joining_monthly
-    if dayly_granularity:
-        joining = joining_dayly
+    return periods
 
-    for data in accesses:
-        for key, value in data.items():
-            if not key in ['abstract', 'html', 'pdf', 'readcube']:
-                continue
-            joined_data = joining(joined_data, key, value)
+
+def join_periods(periods):
+    """
+    Soma por período os PeriodAccesses das chaves de um documento. Os acessos
+    de um documento podem ser registrados para os seguintes ID's (PID, PID
+    FBPE, Path PDF, DOI e URL do legendarium).
+    PID: Id original do SciELO ex: S0102-67202009000300001
+    PID FBPE: Id antigo do SciELO ex: S0102-6720(09)000300001
+    Path PDF: Quando o acesso é feito diretamente para o arquivo PDF no FS do
+    servidor ex: /pdf/rsp/v12n10/v12n10.pdf
+
+    Retorna {período: {tipo de acesso: total}}.
+    """
+    joined_data = {}
+
+    for period in periods:
+        accesses = joined_data.setdefault(period.period, {})
+        for atype in ACCESS_TYPES:
+            count = getattr(period, 'access_%s' % atype)
+            if count:
+                accesses[atype] = accesses.get(atype, 0) + count
 
     return joined_data
 
 
 class Dumper(object):
 
+    # partes opcionais dos documentos utilizadas (ver projection)
+    DOCUMENT_FIELDS = ['affiliations']
+
     def __init__(self, collection, issns=None, from_date=FROM, until_date=UNTIL,
-        dayly_granularity=DAYLY_GRANULARITY, fmt=OUTPUT_FORMAT, output_file=None):
+        dayly_granularity=DAYLY_GRANULARITY, fmt=OUTPUT_FORMAT, output_file=None, source=None, shard=None,
+        negative_cache=None, rollup_dir=None, layout=LAYOUT):
 
         self._ratchet = utils.ratchet_server()
-        self._articlemeta = utils.articlemeta_server()
-        self.from_date = from_date
-        self.until_date = until_date
+        self._articlemeta = utils.articlemeta_server(source, shard)
+        self._match_keys = matchkeys.MatchKeys(self._articlemeta)
+        # as datas parciais ('AAAA', 'AAAA-MM') são completadas antes das
+        # consultas ao Ratchet, que compara as datas ISO como texto
+        self.from_date = period_bound(from_date).isoformat()
+        self.until_date = period_bound(until_date, end=True).isoformat()
+        # NegativeCache com as chaves sem acessos, as respostas vazias são
+        # gravadas apenas quando a consulta abrange todo o histórico
+        self._negative_cache = negative_cache
+        self.full_history = self.from_date == FROM and self.until_date >= UNTIL
+        # com rollup_dir os acessos são acumulados em um AccessCube e as
+        # tabulações por periódico e por coleção são gravadas ao final
+        self.rollup_dir = rollup_dir
+        self._cube = AccessCube(collection) if rollup_dir else None
         self.dayly_granularity = dayly_granularity
-        self.output_file = codecs.open(output_file, 'w', encoding='utf-8') if output_file else output_file
+        self.writer = output.CSVWriter(output_file)
         self.issns = issns
         self.collection = collection
+        self.layout = layout
+        self.periods = None
+
+        if layout not in LAYOUTS:
+            raise ValueError('invalid layout: %s' % layout)
+
+        if layout == 'wide':
+            if self.from_date == FROM:
+                raise ValueError('the wide layout requires the accesses start period')
+            self.periods = access_periods(self.from_date, self.until_date, dayly_granularity)
+            self._period_columns = dict(
+                (period, i * len(CSV_ACCESS_TYPES)) for i, period in enumerate(self.periods))
 
         if fmt == 'json':
             self.fmt = self.fmt_json
@@ -302,49 +302,121 @@ class Dumper(object):
             header.append(u"processing date")
             header.append(u"publication date at SciELO")
             header.append(u"publication date")
-            header.append(u"access date")
-            header.append(u"access year")
-            header.append(u"access month")
-            header.append(u"access to abstract")
-            header.append(u"access to html")
-            header.append(u"access to pdf")
-            header.append(u"access to epdf")
+            header += self.accesses_header()
+
+            self.write(header)
+
+    def accesses_header(self):
+
+        if self.layout == 'wide':
+            header = []
+            for period in self.periods:
+                for atype, name in CSV_ACCESS_TYPES:
+                    header.append(u"access to %s %s" % (name, period))
+            header.append(u"access total")
+            return header
+
+        if self.layout == 'sparse':
+            header = [u"access to %s" % name for atype, name in CSV_ACCESS_TYPES]
             header.append(u"access total")
+            return header
 
-            self.write(u','.join([u'"%s"' % i.replace(u'"', u'""') for i in header]))
+        header = []
+        header.append(u"access date")
+        header.append(u"access year")
+        header.append(u"access month")
+        header.append(u"access to abstract")
+        header.append(u"access to html")
+        header.append(u"access to pdf")
+        header.append(u"access to epdf")
+        header.append(u"access total")
+
+        return header
 
     def get_accesses(self, issn):
-        for document in self._articlemeta.documents(collection=self.collection, issn=issn):
-            accesses = []
-
-            try:
-                keys = eligible_match_keys(document)
-            except Exception as e:
-                logger.error('Error ao ler: %s_%s', document.collection_acronym, document.publisher_id)
-                logger.exception(e)
-                continue
+        for document in self._articlemeta.documents(collection=self.collection, issn=issn, fields=self.DOCUMENT_FIELDS):
+            for data in self.document_accesses(document):
+                yield data
+
+    def ratchet_periods(self, key):
+        if self._negative_cache is not None and self._negative_cache.skip(key):
+            return []
+
+        periods = self._ratchet.document_periods(
+            key, self.from_date, self.until_date,
+            'daily' if self.dayly_granularity else 'monthly')
 
-            logger.debug('keys to join for %s: %s', document.publisher_id, str(keys))
-            for key in keys:
-                data = self._ratchet.document(key)
-                jdata = json.loads(data)
-                if 'objects' in jdata and len(jdata['objects']) > 0:
-                    accesses.append(jdata['objects'][0])
-            joined_accesses = join_accesses(document.publisher_id,
-                accesses, self.from_date, self.until_date,
-                self.dayly_granularity)
-
-            for adate, adata in joined_accesses.items():
-                try:
-                    yield join_metadata_with_accesses(document, adate, adata)
-                except Exception as e:
-                    logger.exception(e)
+        if self._negative_cache is not None:
+            self._negative_cache.record(key, len(periods) > 0, remember=self.full_history)
+
+        return periods
+
+    def document_accesses(self, document):
+        for metadata, adate, adata in self.document_periods(document):
+            yield join_metadata_with_accesses(document, adate, adata, metadata)
+
+    def document_periods(self, document):
+        """
+        Produz (metadados do documento, data, acessos) para cada data de
+        acesso. Os metadados são calculados uma única vez por documento e
+        compartilhados entre as datas.
+        """
+        try:
+            keys = self._match_keys.keys(document)
+        except Exception as e:
+            logger.error('Error ao ler: %s_%s', document.collection_acronym, document.publisher_id)
+            logger.exception(e)
+            return
+
+        logger.debug('keys to join for %s: %s', document.publisher_id, str(keys))
+        joined_accesses = join_periods(
+            period for key in keys for period in self.ratchet_periods(key))
+
+        if not joined_accesses:
+            return
+
+        try:
+            metadata = document_metadata(document)
+        except Exception as e:
+            logger.exception(e)
+            return
+
+        if self._cube is not None:
+            self._cube.add(
+                metadata['issn'], metadata['journal_title'],
+                metadata['publication_year'], joined_accesses)
+
+        for adate, adata in joined_accesses.items():
+            yield metadata, adate, adata
+
+    def document_lines(self, document):
+        """
+        Linhas de saída de um documento, uma para cada data de acesso. No
+        formato csv as colunas de metadados são formatadas uma única vez.
+        """
+        if self.fmt == self.fmt_json:
+            return [self.fmt(data) for data in self.document_accesses(document)]
+
+        if self.layout != 'long':
+            periods = list(self.document_periods(document))
+            if not periods:
+                return []
+            metadata_columns = self.csv_metadata(periods[0][0])
+            if self.layout == 'wide':
+                return [metadata_columns + self.csv_wide_accesses(periods)]
+            return [metadata_columns + self.csv_sparse_accesses(periods)]
+
+        lines = []
+        metadata_columns = None
+        for metadata, adate, adata in self.document_periods(document):
+            if metadata_columns is None:
+                metadata_columns = self.csv_metadata(metadata)
+            lines.append(metadata_columns + self.csv_accesses(accesses_data(adate, adata)))
+
+        return lines
 
     def write(self, line):
-        if not self.output_file:
-            print(line.encode('utf-8'))
-        else:
-            self.output_file.write('%s\r\n' % line)
+        self.writer.write(line)
 
     def fmt_json(self, data):
         del(data['issns'])
@@ -354,6 +426,10 @@ class Dumper(object):
 
     def fmt_csv(self, data):
 
+        return self.csv_metadata(data) + self.csv_accesses(data)
+
+    def csv_metadata(self, data):
+
         line = []
         line.append(datetime.datetime.now().isoformat()[0:10])
         line.append('document')
@@ -379,6 +455,12 @@ class Dumper(object):
         line.append(data['processing_date'])
         line.append(data['publication_date_at_scielo'])
         line.append(data['publication_date'])
+
+        return line
+
+    def csv_accesses(self, data):
+
+        line = []
         line.append(data['access_date'])
         line.append(data['access_year'])
         line.append(data['access_month'])
@@ -388,22 +470,64 @@ class Dumper(object):
         line.append(str(data.get('access_epdf', 0)))
         line.append(str(data['access_total']))
 
-        return ','.join(['"%s"' % i.replace('"', '""') for i in line])
+        return line
+
+    def csv_wide_accesses(self, periods):
+        """
+        Colunas de acessos de todas as datas do período, recebe os itens
+        (metadados, data, acessos) de document_periods.
+        """
+        line = [0] * (len(self.periods) * len(CSV_ACCESS_TYPES))
+
+        for metadata, adate, adata in periods:
+            column = self._period_columns.get(adate, None)
+            if column is None:
+                continue
+            for i, (atype, name) in enumerate(CSV_ACCESS_TYPES):
+                line[column + i] += adata.get(atype, 0)
+
+        return [str(i) for i in line] + [str(sum(line))]
+
+    def csv_sparse_accesses(self, periods):
+        """
+        Uma coluna por tipo de acesso com as datas com acessos no formato
+        'data:total;data:total', em ordem crescente de data.
+        """
+        line = []
+        total = 0
+
+        periods = sorted(periods, key=lambda item: item[1])
+        for atype, name in CSV_ACCESS_TYPES:
+            counts = [(adate, adata.get(atype, 0)) for metadata, adate, adata in periods]
+            line.append(u';'.join(['%s:%d' % (adate, count) for adate, count in counts if count]))
+            total += sum(count for adate, count in counts)
+
+        return line + [str(total)]
+
+    def write_rollups(self):
+        journals_file = os.path.join(self.rollup_dir, 'accesses_by_journals.csv')
+        collection_file = os.path.join(self.rollup_dir, 'accesses_by_collection.csv')
+        self._cube.write_rollups(journals_file, collection_file)
+        logger.info('Rollups written: %s, %s' % (journals_file, collection_file))
 
     def run(self):
 
         if not self.issns:
             self.issns = [None]
 
-        if not self.output_file:
-            for issn in self.issns:
-                for data in self.get_accesses(issn=issn):
-                    print(self.fmt(data))
-            exit()
-
         for issn in self.issns:
-            for data in self.get_accesses(issn=issn):
-                self.write(self.fmt(data))
+            for document in self._articlemeta.documents(collection=self.collection, issn=issn, fields=self.DOCUMENT_FIELDS):
+                for line in self.document_lines(document):
+                    self.write(line)
+
+        self.writer.close()
+
+        if self._cube is not None:
+            self.write_rollups()
+
+        if self._negative_cache is not None:
+            self._negative_cache.save()
+            logger.info('Ratchet lookups by key type:\n%s' % self._negative_cache.summary())
 
 
 def main():
@@ -458,6 +582,59 @@ def main():
         help='File to receive the dumped data'
     )
 
+    parser.add_argument(
+        '--source',
+        '-s',
+        default=None,
+        help='Read ArticleMeta records from a local snapshot, ex: snapshot:/path/to/scl.db'
+    )
+
+    parser.add_argument(
+        '--shard',
+        type=utils.parse_shard,
+        default=None,
+        help='Process only the journals of partition K of N (stable hash of the ISSN SciELO), ex: 2/4'
+    )
+
+    parser.add_argument(
+        '--layout',
+        choices=LAYOUTS,
+        default=LAYOUT,
+        help='CSV layout: long (a row by document and access date), wide (a row by document with a column by access date and type, requires --from_date) or sparse (a row by document with the access dates encoded as date:count)'
+    )
+
+    parser.add_argument(
+        '--rollup_dir',
+        default=None,
+        help='Also write the accesses by journal and by collection (publishing year x accesses year) to this directory'
+    )
+
+    parser.add_argument(
+        '--negative_cache',
+        default=None,
+        help='SQLite file recording the match keys without accesses, which are not looked up again until they expire'
+    )
+
+    parser.add_argument(
+        '--negative_cache_ttl',
+        type=int,
+        default=TTL,
+        help='Days before an empty match key is looked up again'
+    )
+
+    parser.add_argument(
+        '--negative_cache_bloom',
+        action='store_true',
+        help='Keep the empty match keys in a Bloom filter (less memory, 0.1%% of false positives)'
+    )
+
+    parser.add_argument(
+        '--skip_empty_rate',
+        type=float,
+        default=None,
+        help='Do not look up the key types whose recorded rate of empty responses is at least this value, ex: 0.999'
+    )
+
     parser.add_argument(
         '--logging_file',
         '-o',
@@ -488,7 +665,20 @@ def main():
         logger.error('Invalid until date: %s' % args.until_date)
         exit()
 
+    if args.layout != 'long' and args.output_format != 'csv':
+        parser.error('--layout %s requires the csv output format' % args.layout)
+
+    if args.layout == 'wide' and args.from_date == FROM:
+        parser.error('--layout wide requires --from_date')
+
+    negative_cache = None
+    if args.negative_cache:
+        negative_cache = NegativeCache(
+            args.negative_cache, ttl=args.negative_cache_ttl,
+            bloom=args.negative_cache_bloom, skip_empty_rate=args.skip_empty_rate)
+
     dumper = Dumper(args.collection, issns, args.from_date, args.until_date,
-        args.dayly_granularity, args.output_format, args.output_file)
+        args.dayly_granularity, args.output_format, args.output_file, source=args.source, shard=args.shard,
+        negative_cache=negative_cache, rollup_dir=args.rollup_dir, layout=args.layout)
 
     dumper.run()
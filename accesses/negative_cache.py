@@ -0,0 +1,232 @@
+# coding: utf-8
+"""
+Registro das chaves de correspondência que não retornaram acessos do Ratchet.
+
+A maior parte das chaves produzidas por matchkeys.eligible_match_keys (FBPE,
+URL do legendarium, caminhos de PDF) não tem acessos registrados. As chaves
+vazias são gravadas em um arquivo SQLite com a data da consulta e deixam de
+ser consultadas nas execuções seguintes até expirar o prazo (ttl, em dias).
+
+Com ``bloom`` as chaves são mantidas em memória em um filtro de Bloom, mais
+compacto que o conjunto de chaves, ao custo de uma fração (error_rate) de
+chaves com acessos consideradas vazias.
+
+Para cada tipo de chave (matchkeys.KEY_TYPES) são contabilizadas as
+consultas, as consultas evitadas e as respostas vazias. A proporção de
+respostas vazias é acumulada entre as execuções e, com ``skip_empty_rate``,
+os tipos cuja proporção é igual ou superior ao limite (com ao menos
+MIN_SAMPLES respostas) deixam de ser consultados.
+
+As chaves dos tipos UNCACHED_TYPES são sempre consultadas. O PID é a chave
+dos acessos dos documentos recém publicados, um PID sem acessos em uma
+execução passa a recebê-los nos dias seguintes.
+"""
+from __future__ import absolute_import
+import math
+import time
+import struct
+import hashlib
+import logging
+import sqlite3
+import threading
+
+from matchkeys import key_type, KEY_TYPES
+
+logger = logging.getLogger(__name__)
+
+TTL = 30
+BLOOM_ERROR_RATE = 0.001
+BLOOM_MIN_CAPACITY = 100000
+MIN_SAMPLES = 1000
+UNCACHED_TYPES = ('pid',)
+
+
+class BloomFilter(object):
+
+    def __init__(self, capacity, error_rate=BLOOM_ERROR_RATE):
+        capacity = max(capacity, 1)
+        self.size = int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, int(round(self.size / float(capacity) * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        h1, h2 = struct.unpack('<QQ', hashlib.md5(key.encode('utf-8')).digest())
+
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        for position in self._positions(key):
+            if not self.bits[position >> 3] & (1 << (position & 7)):
+                return False
+
+        return True
+
+
+class KeyTypeStats(object):
+
+    def __init__(self):
+        self.lookups = 0
+        self.skipped = 0
+        self.empty = 0
+        self.found = 0
+
+    @property
+    def empty_rate(self):
+        answered = self.empty + self.found
+
+        return float(self.empty) / answered if answered else 0.0
+
+
+class NegativeCache(object):
+
+    def __init__(self, path, ttl=TTL, bloom=False, error_rate=BLOOM_ERROR_RATE,
+                 skip_empty_rate=None):
+        self.path = path
+        self.ttl = ttl
+        self.bloom = bloom
+        self.error_rate = error_rate
+        self.skip_empty_rate = skip_empty_rate
+        self.stats = dict((i, KeyTypeStats()) for i in KEY_TYPES)
+        self.history = dict((i, KeyTypeStats()) for i in KEY_TYPES)
+        self.skipped_types = set()
+        self._pending = {}
+        self._pending_stats = dict((i, KeyTypeStats()) for i in KEY_TYPES)
+        self._lock = threading.Lock()
+        self._keys = set()
+        self.load()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path)
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS empty_keys '
+            '(key TEXT PRIMARY KEY, key_type TEXT, checked REAL)'
+        )
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS key_stats '
+            '(key_type TEXT PRIMARY KEY, empty INTEGER, found INTEGER)'
+        )
+
+        return connection
+
+    def load(self):
+        """
+        Remove as chaves expiradas e carrega as demais.
+        """
+        connection = self._connect()
+        try:
+            connection.execute(
+                'DELETE FROM empty_keys WHERE checked < ?',
+                (time.time() - self.ttl * 86400,)
+            )
+            connection.commit()
+
+            total = connection.execute('SELECT COUNT(*) FROM empty_keys').fetchone()[0]
+            if self.bloom:
+                self._keys = BloomFilter(
+                    max(total * 2, BLOOM_MIN_CAPACITY), self.error_rate)
+
+            for key, in connection.execute('SELECT key FROM empty_keys'):
+                self._keys.add(key)
+
+            for ktype, empty, found in connection.execute(
+                    'SELECT key_type, empty, found FROM key_stats'):
+                if ktype in self.history:
+                    self.history[ktype].empty = empty
+                    self.history[ktype].found = found
+        finally:
+            connection.close()
+
+        if self.skip_empty_rate is not None:
+            for ktype, stats in self.history.items():
+                if ktype in UNCACHED_TYPES:
+                    continue
+                if stats.empty + stats.found >= MIN_SAMPLES and stats.empty_rate >= self.skip_empty_rate:
+                    self.skipped_types.add(ktype)
+                    logger.info('Skipping the %s keys, %.1f%% of them are empty' % (
+                        ktype, stats.empty_rate * 100))
+
+        logger.info('Negative cache loaded with %d keys' % total)
+
+    def skip(self, key):
+        """
+        Indica se a consulta da chave pode ser evitada.
+        """
+        ktype = key_type(key)
+
+        with self._lock:
+            stats = self.stats[ktype]
+            stats.lookups += 1
+            if ktype in UNCACHED_TYPES:
+                return False
+            if ktype in self.skipped_types or key in self._keys:
+                stats.skipped += 1
+                return True
+
+        return False
+
+    def record(self, key, found, remember=True):
+        """
+        Registra a resposta do Ratchet para a chave. Com ``remember`` a
+        resposta é gravada, deve ser False quando a consulta não abrange todo
+        o histórico de acessos.
+        """
+        ktype = key_type(key)
+
+        with self._lock:
+            stats = [self.stats[ktype]]
+            if remember:
+                stats.append(self._pending_stats[ktype])
+
+            for item in stats:
+                if found:
+                    item.found += 1
+                else:
+                    item.empty += 1
+
+            if remember and not found and ktype not in UNCACHED_TYPES:
+                self._keys.add(key)
+                self._pending[key] = (ktype, time.time())
+
+    def save(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            pending_stats = self._pending_stats
+            self._pending_stats = dict((i, KeyTypeStats()) for i in KEY_TYPES)
+
+        connection = self._connect()
+        try:
+            connection.executemany(
+                'INSERT OR REPLACE INTO empty_keys (key, key_type, checked) VALUES (?, ?, ?)',
+                [(key, ktype, checked) for key, (ktype, checked) in pending.items()]
+            )
+
+            for ktype, stats in pending_stats.items():
+                if not stats.empty and not stats.found:
+                    continue
+                history = self.history[ktype]
+                history.empty += stats.empty
+                history.found += stats.found
+                connection.execute(
+                    'INSERT OR REPLACE INTO key_stats (key_type, empty, found) VALUES (?, ?, ?)',
+                    (ktype, history.empty, history.found)
+                )
+
+            connection.commit()
+        finally:
+            connection.close()
+
+    def summary(self):
+        lines = ['%-12s %9s %9s %9s %9s %8s %11s' % (
+            'key type', 'lookups', 'skipped', 'empty', 'found', 'empty%', 'history%')]
+
+        for ktype in KEY_TYPES:
+            stats = self.stats[ktype]
+            lines.append('%-12s %9d %9d %9d %9d %8.1f %11.1f' % (
+                ktype, stats.lookups, stats.skipped, stats.empty, stats.found,
+                stats.empty_rate * 100, self.history[ktype].empty_rate * 100))
+
+        return '\n'.join(lines)
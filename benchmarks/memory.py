@@ -0,0 +1,26 @@
+# coding: utf-8
+"""
+Pico de memória residente (RSS) dos processamentos executados pelo benchmark.
+
+O rusage do subprocesso não serve para essa medida: o ru_maxrss é preservado
+no exec e inclui a memória do processo do benchmark copiada no fork. O VmHWM
+de /proc/self/status é zerado no exec e reflete apenas o processamento.
+"""
+import resource
+
+
+def peak_rss_kb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except IOError:
+        pass
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def write_peak_rss(path):
+    with open(path, 'w') as f:
+        f.write(str(peak_rss_kb()))
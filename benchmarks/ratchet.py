@@ -0,0 +1,190 @@
+# coding: utf-8
+"""
+Este processamento compara, contra o Ratchet substituto (benchmarks.stubs),
+os métodos general_range (JSON) e accesses (PeriodAccesses) em cada
+combinação de protocolo (binary, compact) e transporte (buffered, framed).
+
+Para cada combinação são reportados o tamanho da resposta serializada
+(bytes), o tempo de leitura da resposta até a lista de períodos (decode_us,
+inclui o json.loads e o record_periods do general_range) e as chamadas/s
+pelo cliente thrift.ratchet.Ratchet.
+"""
+from __future__ import absolute_import
+import argparse
+import logging
+import json
+import time
+
+from thriftpy.utils import serialize, deserialize
+
+from benchmarks.stubs import StubServer, RatchetHandler, Dataset, JOURNALS, DOCUMENTS
+from thrift.ratchet import (
+    Ratchet, load_ratchet_thrift, record_periods, PROTOCOLS, TRANSPORTS,
+    protocol_factory, transport_factory)
+
+logger = logging.getLogger(__name__)
+
+METHODS = ('general_range', 'accesses')
+BEGIN_DATE = '1500-01-01'
+END_DATE = '2100-12-31'
+FIELDS = ['method', 'protocol', 'transport', 'granularity', 'bytes', 'decode_us', 'calls_s']
+
+
+def _config_logging(logging_level='INFO', logging_file=None):
+
+    allowed_levels = {
+        'DEBUG': logging.DEBUG,
+        'INFO': logging.INFO,
+        'WARNING': logging.WARNING,
+        'ERROR': logging.ERROR,
+        'CRITICAL': logging.CRITICAL
+    }
+
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    logger.setLevel(allowed_levels.get(logging_level, 'INFO'))
+
+    if logging_file:
+        hl = logging.FileHandler(logging_file, mode='a')
+    else:
+        hl = logging.StreamHandler()
+
+    hl.setFormatter(formatter)
+    hl.setLevel(allowed_levels.get(logging_level, 'INFO'))
+
+    logger.addHandler(hl)
+
+    return logger
+
+
+def response(handler, method, code, granularity):
+    """
+    Estrutura <método>_result do IDL, enviada pelo servidor em cada resposta.
+    """
+    result = getattr(load_ratchet_thrift().RatchetStats, '%s_result' % method)
+    data = getattr(handler, method)(code, BEGIN_DATE, END_DATE, granularity)
+
+    return result(success=data)
+
+
+def decode(method, protocol, payload, granularity):
+    """
+    Lê a resposta serializada e retorna a lista de PeriodAccesses.
+    """
+    result = getattr(load_ratchet_thrift().RatchetStats, '%s_result' % method)
+    data = deserialize(result(), payload, protocol_factory(protocol)).success
+
+    if method == 'general_range':
+        return record_periods(json.loads(data), granularity)
+
+    return data
+
+
+def measure(dataset, method, protocol, transport, granularity, calls):
+    handler = RatchetHandler(dataset)
+    code = sorted(dataset.documents)[0]
+
+    payload = serialize(response(handler, method, code, granularity), protocol_factory(protocol))
+    start = time.time()
+    for _ in range(calls):
+        decode(method, protocol, payload, granularity)
+    decode_seconds = (time.time() - start) / calls
+
+    server = StubServer(
+        load_ratchet_thrift().RatchetStats, handler,
+        proto_factory=protocol_factory(protocol), trans_factory=transport_factory(transport)
+    ).start()
+    try:
+        ratchet = Ratchet(server.host, server.port, protocol=protocol, transport=transport)
+        if method == 'general_range':
+            call = lambda key: record_periods(
+                json.loads(ratchet.document_range(key, BEGIN_DATE, END_DATE, granularity)),
+                granularity)
+        else:
+            call = lambda key: ratchet.document_periods(key, BEGIN_DATE, END_DATE, granularity)
+
+        codes = sorted(dataset.documents)
+        start = time.time()
+        for i in range(calls):
+            call(codes[i % len(codes)])
+        elapsed = time.time() - start
+    finally:
+        server.stop()
+
+    return {
+        'method': method,
+        'protocol': protocol,
+        'transport': transport,
+        'granularity': granularity,
+        'bytes': len(payload),
+        'decode_us': round(decode_seconds * 1000000, 1),
+        'calls_s': round(calls / elapsed, 1) if elapsed else 0
+    }
+
+
+def run(dataset, granularity='monthly', calls=500):
+    for method in METHODS:
+        for protocol in sorted(PROTOCOLS):
+            for transport in sorted(TRANSPORTS):
+                logger.info('Measuring: %s %s %s' % (method, protocol, transport))
+                yield measure(dataset, method, protocol, transport, granularity, calls)
+
+
+def main():
+
+    parser = argparse.ArgumentParser(
+        description='Compare the Ratchet JSON and typed responses over each thrift protocol and transport'
+    )
+
+    parser.add_argument(
+        '--granularity',
+        choices=['monthly', 'daily'],
+        default='monthly',
+        help='Accesses granularity'
+    )
+
+    parser.add_argument(
+        '--calls',
+        '-n',
+        type=int,
+        default=500,
+        help='Number of calls by combination'
+    )
+
+    parser.add_argument(
+        '--output_format',
+        '-f',
+        choices=['tsv', 'json'],
+        default='tsv',
+        help='Report format'
+    )
+
+    parser.add_argument(
+        '--logging_file',
+        '-o',
+        help='Full path to the log file'
+    )
+
+    parser.add_argument(
+        '--logging_level',
+        '-l',
+        default='INFO',
+        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'],
+        help='Logggin level'
+    )
+
+    args = parser.parse_args()
+    _config_logging(args.logging_level, args.logging_file)
+
+    dataset = Dataset.synthetic(JOURNALS, DOCUMENTS)
+
+    results = []
+    if args.output_format == 'tsv':
+        print('\t'.join(FIELDS))
+    for result in run(dataset, args.granularity, args.calls):
+        results.append(result)
+        if args.output_format == 'tsv':
+            print('\t'.join([str(result[i]) for i in FIELDS]))
+
+    if args.output_format == 'json':
+        print(json.dumps(results, indent=2))
@@ -0,0 +1,301 @@
+# coding: utf-8
+"""
+Este processamento executa os processamentos (console scripts) contra os
+servidores substitutos de benchmarks.stubs e reporta, para cada um, o tempo
+de execução, documentos/s, linhas/s, chamadas remotas por método e o pico de
+memória residente (RSS).
+
+Cada processamento é executado em um subprocesso, com um arquivo de
+configuração apontando para os servidores substitutos.
+"""
+from __future__ import absolute_import
+import os
+import sys
+import argparse
+import logging
+import json
+import shutil
+import subprocess
+import tempfile
+import time
+
+from benchmarks.stubs import StandIns, Dataset, JOURNALS, DOCUMENTS, COLLECTION
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (nome, módulo, argumentos). {output} e {workdir} são substituídos pelo
+# arquivo de saída e pelo diretório de trabalho da execução.
+JOBS = [
+    ('accesses_dumpdata', 'accesses.dumpdata', ['-r', '{output}']),
+    ('accesses_dumpdata_month', 'accesses.dumpdata',
+        ['--from_date', '2013-01-01', '--until_date', '2013-01-31', '-r', '{output}']),
+    ('accesses_documents_by_journals', 'accesses.documents_by_journals', ['-r', '{output}']),
+    ('publication_documents_languages', 'publication.documents_languages', ['-r', '{output}']),
+    ('publication_documents_affiliations', 'publication.documents_affiliations', ['-r', '{output}']),
+    ('publication_documents_affiliations_nationality', 'publication.documents_affiliations_nationality',
+        ['--home_nationality', 'brazil', '-r', '{output}']),
+    ('publication_documents_authors', 'publication.documents_authors', ['-r', '{output}']),
+    ('publication_documents_counts', 'publication.documents_counts', ['-r', '{output}']),
+    ('publication_documents_licenses', 'publication.documents_licenses', ['-r', '{output}']),
+    ('publication_documents_dates', 'publication.documents_dates', ['-r', '{output}']),
+    ('publication_journals', 'publication.journals', ['-r', '{output}']),
+    ('publication_journals_status_changes', 'publication.journals_status_changes', ['-r', '{output}']),
+    ('bibliometric_citedby_document', 'bibliometric.citedby_document', ['-r', '{output}']),
+    ('bibliometric_citedby_journal', 'bibliometric.citedby_journal', ['-r', '{output}']),
+    ('bibliometric_impact_factor', 'bibliometric.impact_factor', ['-r', '{output}']),
+    ('export_natural_keys', 'export.natural_keys', ['-r', '{output}']),
+    ('export_normalize_affiliations', 'export.normalize_affiliations', ['-r', '{output}']),
+    ('export_kbart', 'export.kbart', ['-r', '{output}']),
+    ('export_search_update_indicators', 'export.search_update_indicators',
+        ['--snapshot_file', '{workdir}/search_indicators.db', '--citedby_rpc_fallback']),
+]
+
+FIELDS = ['job', 'status', 'seconds', 'docs_s', 'rows', 'rows_s', 'rpc_calls', 'peak_rss_kb']
+
+
+def _config_logging(logging_level='INFO', logging_file=None):
+
+    allowed_levels = {
+        'DEBUG': logging.DEBUG,
+        'INFO': logging.INFO,
+        'WARNING': logging.WARNING,
+        'ERROR': logging.ERROR,
+        'CRITICAL': logging.CRITICAL
+    }
+
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    logger.setLevel(allowed_levels.get(logging_level, 'INFO'))
+
+    if logging_file:
+        hl = logging.FileHandler(logging_file, mode='a')
+    else:
+        hl = logging.StreamHandler()
+
+    hl.setFormatter(formatter)
+    hl.setLevel(allowed_levels.get(logging_level, 'INFO'))
+
+    logger.addHandler(hl)
+
+    return logger
+
+
+def count_lines(path):
+    if not os.path.exists(path):
+        return 0
+
+    with open(path, 'rb') as f:
+        return sum(1 for _ in f)
+
+
+def read_peak_rss(path):
+    if not os.path.exists(path):
+        return None
+
+    with open(path) as f:
+        return int(f.read())
+
+
+def run_process(command, env=None, cwd=None):
+    """
+    Executa o comando e retorna (código de saída, segundos, pico de RSS em
+    KB). O pico de RSS do rusage inclui a memória copiada no fork, o valor
+    gravado pelo processamento (ver benchmarks.memory) tem precedência.
+    """
+    start = time.time()
+    process = subprocess.Popen(command, env=env, cwd=cwd)
+    _, status, rusage = os.wait4(process.pid, 0)
+    elapsed = time.time() - start
+    process.returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -1
+
+    return process.returncode, elapsed, rusage.ru_maxrss
+
+
+class Benchmark(object):
+
+    def __init__(self, dataset, latency=0, collection=COLLECTION, workdir=None,
+                 ratchet_protocol='binary', ratchet_transport='buffered'):
+        self.dataset = dataset
+        self.latency = latency
+        self.ratchet_protocol = ratchet_protocol
+        self.ratchet_transport = ratchet_transport
+        self.collection = collection
+        self.workdir = workdir or tempfile.mkdtemp(prefix='processing_benchmark_')
+        self.settings_file = os.path.join(self.workdir, 'config.ini')
+
+    def command(self, name, module, args):
+        output = os.path.join(self.workdir, '%s.out' % name)
+        args = [i.format(output=output, workdir=self.workdir) for i in args]
+
+        return [
+            sys.executable, '-c',
+            'import sys, atexit, benchmarks.memory, %s as job; '
+            'atexit.register(benchmarks.memory.write_peak_rss, %r); '
+            'sys.argv[0] = %r; job.main()' % (
+                module, self.peak_rss_file(name), name)
+        ] + ['-c', self.collection] + args + [
+            '-l', 'ERROR', '-o', os.path.join(self.workdir, '%s.log' % name)
+        ], output
+
+    def peak_rss_file(self, name):
+
+        return os.path.join(self.workdir, '%s.rss' % name)
+
+    def run_job(self, servers, name, module, args):
+        command, output = self.command(name, module, args)
+
+        env = dict(os.environ)
+        env['PROCESSING_SETTINGS_FILE'] = self.settings_file
+        env['PYTHONPATH'] = os.pathsep.join(
+            [ROOT_DIR] + [i for i in [env.get('PYTHONPATH')] if i])
+
+        servers.reset()
+        logger.info('Running: %s' % name)
+        returncode, elapsed, peak_rss = run_process(command, env=env, cwd=self.workdir)
+        peak_rss = read_peak_rss(self.peak_rss_file(name)) or peak_rss
+        rpc = servers.counts()
+
+        rows = count_lines(output) or rpc.get('solr.documents', 0)
+        docs = len(self.dataset.documents)
+
+        return {
+            'job': name,
+            'status': 'ok' if returncode == 0 else 'error (%d)' % returncode,
+            'seconds': round(elapsed, 3),
+            'docs_s': round(docs / elapsed, 1) if elapsed else 0,
+            'rows': rows,
+            'rows_s': round(rows / elapsed, 1) if elapsed else 0,
+            'rpc_calls': sum(v for k, v in rpc.items() if k != 'solr.documents'),
+            'peak_rss_kb': peak_rss,
+            'rpc': rpc
+        }
+
+    def run(self, jobs=None):
+        jobs = [i for i in JOBS if not jobs or i[0] in jobs]
+
+        with StandIns(self.dataset, latency=self.latency,
+                      ratchet_protocol=self.ratchet_protocol,
+                      ratchet_transport=self.ratchet_transport) as servers:
+            servers.write_settings(self.settings_file)
+            for name, module, args in jobs:
+                yield self.run_job(servers, name, module, args)
+
+
+def fmt_tsv(result):
+
+    return '\t'.join([str(result[i]) for i in FIELDS])
+
+
+def main():
+
+    parser = argparse.ArgumentParser(
+        description='Run the processing scripts against local stand-in servers and report throughput'
+    )
+
+    parser.add_argument(
+        'jobs',
+        nargs='*',
+        help='Jobs to run, default all: %s' % ', '.join([i[0] for i in JOBS])
+    )
+
+    parser.add_argument(
+        '--journals',
+        '-j',
+        type=int,
+        default=JOURNALS,
+        help='Number of synthetic journals'
+    )
+
+    parser.add_argument(
+        '--documents',
+        '-d',
+        type=int,
+        default=DOCUMENTS,
+        help='Number of synthetic documents per journal'
+    )
+
+    parser.add_argument(
+        '--latency',
+        type=float,
+        default=0,
+        help='Latency in milliseconds added to each remote call'
+    )
+
+    parser.add_argument(
+        '--snapshot_file',
+        default=None,
+        help='Replay the documents stored in an ArticleMeta snapshot instead of synthetic ones'
+    )
+
+    parser.add_argument(
+        '--ratchet_protocol',
+        choices=['binary', 'compact'],
+        default='binary',
+        help='Thrift protocol of the Ratchet stand-in and client'
+    )
+
+    parser.add_argument(
+        '--ratchet_transport',
+        choices=['buffered', 'framed'],
+        default='buffered',
+        help='Thrift transport of the Ratchet stand-in and client'
+    )
+
+    parser.add_argument(
+        '--output_format',
+        '-f',
+        choices=['tsv', 'json'],
+        default='tsv',
+        help='Report format, json includes the remote calls by method'
+    )
+
+    parser.add_argument(
+        '--keep_workdir',
+        action='store_true',
+        help='Keep the outputs and logs of each job'
+    )
+
+    parser.add_argument(
+        '--logging_file',
+        '-o',
+        help='Full path to the log file'
+    )
+
+    parser.add_argument(
+        '--logging_level',
+        '-l',
+        default='INFO',
+        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'],
+        help='Logggin level'
+    )
+
+    args = parser.parse_args()
+    _config_logging(args.logging_level, args.logging_file)
+
+    if args.snapshot_file:
+        dataset = Dataset.from_snapshot(args.snapshot_file)
+    else:
+        dataset = Dataset.synthetic(args.journals, args.documents)
+
+    benchmark = Benchmark(
+        dataset, latency=args.latency / 1000.0,
+        ratchet_protocol=args.ratchet_protocol,
+        ratchet_transport=args.ratchet_transport)
+    logger.info('Working directory: %s' % benchmark.workdir)
+
+    results = []
+    if args.output_format == 'tsv':
+        print('\t'.join(FIELDS))
+    for result in benchmark.run(args.jobs):
+        results.append(result)
+        if args.output_format == 'tsv':
+            print(fmt_tsv(result))
+            sys.stdout.flush()
+
+    if args.output_format == 'json':
+        print(json.dumps(results, indent=2, sort_keys=True))
+
+    if not args.keep_workdir:
+        shutil.rmtree(benchmark.workdir)
@@ -0,0 +1,611 @@
+# coding: utf-8
+"""
+Servidores substitutos do ArticleMeta, Ratchet, AccessStats, PublicationStats,
+Citedby (thrift), do Solr do search.scielo.org e do Analytics (HTTP) para
+testes de desempenho.
+
+Os servidores thrift utilizam os mesmos IDLs dos clientes e respondem com
+registros sintéticos derivados de tests/fixtures ou com os registros gravados
+em um snapshot do ArticleMeta (processing_snapshot), com latência
+configurável por chamada. Cada servidor contabiliza as chamadas recebidas por
+método.
+
+As consultas ``search`` recebem respostas no formato do Elasticsearch,
+geradas a partir das agregações solicitadas.
+"""
+from __future__ import absolute_import
+import copy
+import json
+import socket
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+
+from thriftpy.rpc import make_server
+
+from tests.fixtures import articlemeta as articlemeta_fixture
+from tests.fixtures import ratchet as ratchet_fixture
+
+HOST = '127.0.0.1'
+COLLECTION = 'scl'
+JOURNALS = 2
+DOCUMENTS = 50
+FIRST_YEAR = 2000
+TERMS_SIZE = 10
+BUCKET_KEYS = {
+    'languages': ['pt', 'en', 'es'],
+    'access_month': ['%02d' % i for i in range(1, 13)],
+}
+
+
+def free_port(host=HOST):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind((host, 0))
+    port = sock.getsockname()[1]
+    sock.close()
+
+    return port
+
+
+def _set_issn(data, issn):
+    data['title']['v400'] = [{'_': issn}]
+    data['title']['v935'] = [{'_': issn}]
+    data['title'].pop('v435', None)
+    data['article']['v35'] = [{'_': issn}]
+    data['code_title'] = [issn]
+
+
+def synthetic_documents(journals=JOURNALS, documents=DOCUMENTS, collection=COLLECTION):
+    """
+    Produz ``journals`` x ``documents`` registros no formato do ArticleMeta a
+    partir do documento de tests/fixtures/articlemeta.py, variando ISSN, PID,
+    DOI, ano de publicação e data de processamento.
+    """
+    result = []
+
+    for j in range(journals):
+        issn = '%04d-%04d' % (1000 + j, 1000 + j)
+        for d in range(documents):
+            year = FIRST_YEAR + d % 15
+            pid = 'S%s%d%04d%05d' % (issn, year, 1 + d % 4, d + 1)
+            data = copy.deepcopy(articlemeta_fixture.document)
+            _set_issn(data, issn)
+            data['code'] = pid
+            data['collection'] = collection
+            data['article']['v880'] = [{'_': pid}]
+            data['doi'] = '10.1590/%s' % pid
+            data['article']['v237'] = [{'_': data['doi']}]
+            data['publication_year'] = str(year)
+            data['article']['v65'] = [{'_': '%d0000' % year}]
+            data['processing_date'] = '%d-%02d-%02d' % (year + 1, 1 + d % 12, 1 + d % 28)
+            result.append(data)
+
+    return result
+
+
+class Dataset(object):
+    """
+    Registros servidos pelos servidores substitutos.
+    """
+
+    def __init__(self, documents):
+        self.documents = OrderedDict((i['code'], i) for i in documents)
+        self.journals = OrderedDict()
+        for document in self.documents.values():
+            self.journals.setdefault(
+                (document['collection'], document['title']['v400'][0]['_']),
+                document['title']
+            )
+
+    @classmethod
+    def synthetic(cls, journals=JOURNALS, documents=DOCUMENTS, collection=COLLECTION):
+        return cls(synthetic_documents(journals, documents, collection))
+
+    @classmethod
+    def from_snapshot(cls, path):
+        """
+        Reproduz os registros gravados em um snapshot do ArticleMeta.
+        """
+        from snapshot.store import SnapshotStore
+
+        return cls([i.data for i in SnapshotStore(path).documents()])
+
+    def pids(self):
+        return list(self.documents.keys())
+
+    def select(self, collection=None, issn=None, from_date=None, until_date=None):
+        for document in self.documents.values():
+            if collection and document['collection'] != collection:
+                continue
+            if issn and document['title']['v400'][0]['_'] != issn:
+                continue
+            if from_date and document['processing_date'] < from_date:
+                continue
+            if until_date and document['processing_date'] > until_date:
+                continue
+            yield document
+
+
+def aggregations(aggs, dataset):
+    """
+    Gera o resultado de agregações do Elasticsearch para as agregações
+    solicitadas. Os buckets de ``pid`` correspondem aos documentos do
+    dataset, os demais são sintéticos.
+    """
+    result = {}
+
+    for name, spec in (aggs or {}).items():
+        sub = spec.get('aggs', spec.get('aggregations', None))
+
+        if 'terms' in spec or 'date_histogram' in spec:
+            field = spec.get('terms', spec.get('date_histogram', {})).get('field', name)
+            if field == 'pid':
+                keys = dataset.pids()
+            elif field.endswith('year'):
+                keys = [str(FIRST_YEAR + i) for i in range(TERMS_SIZE)]
+            else:
+                keys = BUCKET_KEYS.get(field, ['%s_%d' % (field, i) for i in range(3)])
+
+            buckets = []
+            for i, key in enumerate(keys):
+                bucket = {'key': key, 'doc_count': len(keys) - i}
+                bucket.update(aggregations(sub, dataset))
+                buckets.append(bucket)
+            result[name] = {'buckets': buckets}
+            continue
+
+        if 'filter' in spec or 'filters' in spec:
+            item = {'doc_count': len(dataset.documents)}
+            item.update(aggregations(sub, dataset))
+            result[name] = item
+            continue
+
+        result[name] = {'value': len(dataset.documents)}
+
+    return result
+
+
+def search_result(body, dataset):
+    body = json.loads(body) if body else {}
+
+    hits = []
+    for document in list(dataset.documents.values())[:1]:
+        hits.append({'_source': {
+            'pid': document['code'],
+            'collection': document['collection'],
+            'issn': document['title']['v400'][0]['_'],
+            'publication_date': document['publication_year']
+        }})
+
+    return json.dumps({
+        'hits': {'total': len(dataset.documents), 'hits': hits},
+        'aggregations': aggregations(
+            body.get('aggs', body.get('aggregations', None)), dataset)
+    })
+
+
+class CallCounter(object):
+    """
+    Contador de chamadas por método compartilhado entre threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def count(self, method):
+        with self._lock:
+            self._counts[method] = self._counts.get(method, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self._counts = {}
+
+    def counts(self):
+        with self._lock:
+            return dict(self._counts)
+
+
+class StubHandler(object):
+
+    def __init__(self, dataset, latency=0, counter=None):
+        self.dataset = dataset
+        self.latency = latency
+        self.counter = counter or CallCounter()
+
+    def _called(self, method):
+        self.counter.count(method)
+        if self.latency:
+            time.sleep(self.latency)
+
+
+class ArticleMetaHandler(StubHandler):
+
+    def __init__(self, dataset, latency=0, counter=None):
+        super(ArticleMetaHandler, self).__init__(dataset, latency, counter)
+        from thrift.articlemeta import load_articlemeta_thrift
+        self.thrift = load_articlemeta_thrift()
+
+    def getInterfaceVersion(self):
+        self._called('getInterfaceVersion')
+        return self.thrift.VERSION
+
+    def get_journal_identifiers(self, collection=None, issn=None, limit=1000, offset=0, extra_filter=None):
+        self._called('get_journal_identifiers')
+        keys = [
+            (c, i) for c, i in self.dataset.journals.keys()
+            if (not collection or c == collection) and (not issn or i == issn)
+        ]
+
+        return [
+            self.thrift.journal_identifiers(code=i, collection=c, processing_date='')
+            for c, i in keys[offset:offset + limit]
+        ]
+
+    def get_journal(self, code, collection=None):
+        self._called('get_journal')
+        for (c, issn), data in self.dataset.journals.items():
+            if issn == code and (not collection or c == collection):
+                return json.dumps(data)
+
+        return ''
+
+    def get_article_identifiers(self, collection=None, issn=None, from_date=None,
+                                until_date=None, limit=1000, offset=0, extra_filter=None):
+        self._called('get_article_identifiers')
+        documents = list(self.dataset.select(collection, issn, from_date, until_date))
+
+        return [
+            self.thrift.article_identifiers(
+                code=i['code'], collection=i['collection'],
+                processing_date=i['processing_date'], doi=i.get('doi', None)
+            ) for i in documents[offset:offset + limit]
+        ]
+
+    def get_articles(self, collection=None, issn=None, from_date=None, until_date=None,
+                     limit=1000, offset=0, extra_filter=None,
+                     replace_journal_metadata=True, body=False):
+        self._called('get_articles')
+        documents = list(self.dataset.select(collection, issn, from_date, until_date))
+
+        return json.dumps({'objects': documents[offset:offset + limit]})
+
+    def get_article(self, code, collection=None, replace_journal_metadata=True, fmt='xylose', body=False):
+        self._called('get_article')
+        document = self.dataset.documents.get(code, None)
+        if document is None:
+            for item in self.dataset.documents.values():
+                if item.get('doi', '').upper() == code.upper():
+                    document = item
+                    break
+
+        return json.dumps(document) if document else ''
+
+    def exists_article(self, code, collection):
+        self._called('exists_article')
+        return code in self.dataset.documents
+
+    def article_history_changes(self, collection, event, code, from_date, until_date, limit, offset):
+        self._called('article_history_changes')
+        return []
+
+    def journal_history_changes(self, collection, event, code, from_date, until_date, limit, offset):
+        self._called('journal_history_changes')
+        return []
+
+
+class RatchetHandler(StubHandler):
+    """
+    Responde com o registro de acessos de tests/fixtures/ratchet.py para os
+    PIDs do dataset e com registros vazios para as demais chaves. O
+    general_range restringe o registro ao período com thrift.ratchet.window_record
+    e o accesses retorna os mesmos acessos como PeriodAccesses.
+    """
+
+    def general(self, code):
+        self._called('general')
+        if code not in self.dataset.documents:
+            return json.dumps({'meta': {'total': 0}, 'objects': []})
+
+        data = copy.deepcopy(ratchet_fixture.record_1)
+        data['objects'][0]['code'] = code
+
+        return json.dumps(data)
+
+    def general_range(self, code, begin_date, end_date, granularity):
+        from thrift.ratchet import window_record
+
+        self._called('general_range')
+        if code not in self.dataset.documents:
+            return json.dumps({'meta': {'total': 0}, 'objects': []})
+
+        data = copy.deepcopy(ratchet_fixture.record_1)
+        data['objects'][0]['code'] = code
+
+        return json.dumps(window_record(data, begin_date, end_date, granularity))
+
+    def accesses(self, code, begin_date, end_date, granularity):
+        from thrift.ratchet import record_periods, window_record
+
+        self._called('accesses')
+        if code not in self.dataset.documents:
+            return []
+
+        data = copy.deepcopy(ratchet_fixture.record_1)
+
+        return record_periods(
+            window_record(data, begin_date, end_date, granularity), granularity)
+
+
+class SearchHandler(StubHandler):
+    """
+    AccessStats e Citedby, que expõem consultas ao Elasticsearch.
+    """
+
+    def search(self, body, parameters=None):
+        self._called('search')
+        return search_result(body, self.dataset)
+
+    def document(self, code, collection=None):
+        self._called('document')
+        return json.dumps({'code': code, 'collection': collection})
+
+
+class PublicationStatsHandler(SearchHandler):
+
+    def search(self, doc_type, body, parameters=None):
+        self._called('search')
+        return search_result(body, self.dataset)
+
+
+class CitedbyHandler(SearchHandler):
+
+    def citedby_pid(self, q, metaonly=False):
+        self._called('citedby_pid')
+        document = self.dataset.documents.get(q, {})
+        cited_by = [
+            {'code': pid, 'issn': pid[1:10], 'source': 'Journal', 'titles': ['Title']}
+            for pid in list(self.dataset.documents.keys())[:3] if pid != q
+        ]
+
+        result = {
+            'article': {
+                'code': q,
+                'collection': document.get('collection', COLLECTION),
+                'total_received': len(cited_by)
+            }
+        }
+        if not metaonly:
+            result['cited_by'] = cited_by
+
+        return json.dumps(result)
+
+    def citedby_doi(self, q, metaonly=False):
+        self._called('citedby_doi')
+        return json.dumps({'article': {'doi': q, 'total_received': 0}, 'cited_by': []})
+
+    def citedby_meta(self, title, author=None, year=None, metaonly=False):
+        self._called('citedby_meta')
+        return json.dumps({'article': {'total_received': 0}, 'cited_by': []})
+
+
+class StubServer(object):
+    """
+    Servidor thrift executado em uma thread.
+    """
+
+    def __init__(self, service, handler, host=HOST, port=None,
+                 proto_factory=None, trans_factory=None):
+        self.host = host
+        self.port = port or free_port(host)
+        self.handler = handler
+        kwargs = {}
+        if proto_factory is not None:
+            kwargs['proto_factory'] = proto_factory
+        if trans_factory is not None:
+            kwargs['trans_factory'] = trans_factory
+        self._server = make_server(service, handler, host, self.port, **kwargs)
+        self._thread = threading.Thread(target=self._server.serve)
+        self._thread.daemon = True
+
+    @property
+    def address(self):
+        return '%s:%d' % (self.host, self.port)
+
+    def start(self):
+        self._thread.start()
+        _wait_port(self.host, self.port)
+
+        return self
+
+    def stop(self):
+        self._server.close()
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def impact_factor_chart(years=5):
+    categories = [str(FIRST_YEAR + i) for i in range(years)]
+
+    return {
+        'options': {
+            'xAxis': {'categories': categories},
+            'series': [{'data': [0.1 * (i + 1)] * years} for i in range(6)]
+        }
+    }
+
+
+class HTTPStub(object):
+    """
+    Servidor HTTP substituto do Solr do search.scielo.org e do Analytics.
+
+    As atualizações enviadas ao Solr são contabilizadas como ``solr.update``
+    e os documentos recebidos como ``solr.documents``.
+    """
+
+    def __init__(self, latency=0, counter=None, host=HOST, port=None):
+        self.host = host
+        self.port = port or free_port(host)
+        self.latency = latency
+        self.counter = counter or CallCounter()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def _reply(self, data):
+                if stub.latency:
+                    time.sleep(stub.latency)
+                self.send_response(200)
+                self.send_header('content-type', 'application/json')
+                self.end_headers()
+                self.wfile.write(json.dumps(data).encode('utf-8'))
+
+            def do_GET(self):
+                if '/ajx/bibliometrics/journal/impact_factor_chart' in self.path:
+                    stub.counter.count('analytics.impact_factor_chart')
+                    self._reply(impact_factor_chart())
+                    return
+
+                stub.counter.count('analytics.other')
+                self._reply({})
+
+            def do_POST(self):
+                stub.counter.count('solr.update')
+                length = int(self.headers.get('content-length', 0) or 0)
+                data = self.rfile.read(length) if length else b''
+                if data.startswith(b'['):
+                    for _ in json.loads(data.decode('utf-8')):
+                        stub.counter.count('solr.documents')
+                self._reply({'responseHeader': {'status': 0}})
+
+            def log_message(self, *args):
+                pass
+
+        self._server = _ThreadingHTTPServer((host, self.port), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+
+    @property
+    def address(self):
+        return '%s:%d' % (self.host, self.port)
+
+    def start(self):
+        self._thread.start()
+
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def _wait_port(host, port, timeout=5):
+    limit = time.time() + timeout
+    while time.time() < limit:
+        try:
+            socket.create_connection((host, port), timeout=1).close()
+            return
+        except socket.error:
+            time.sleep(0.01)
+
+
+class StandIns(object):
+    """
+    Inicia os servidores substitutos de todos os serviços remotos.
+
+    with StandIns(Dataset.synthetic(), latency=0.001) as servers:
+        servers.write_settings('config.ini')
+    """
+
+    def __init__(self, dataset, latency=0, ratchet_protocol='binary',
+                 ratchet_transport='buffered'):
+        from thrift.accessstats import AccessStats
+        from thrift.articlemeta import load_articlemeta_thrift
+        from thrift.citedby import Citedby
+        from thrift.publicationstats import PublicationStats
+        from thrift.ratchet import load_ratchet_thrift, protocol_factory, transport_factory
+
+        self.dataset = dataset
+        self.ratchet_protocol = ratchet_protocol
+        self.ratchet_transport = ratchet_transport
+        self.servers = OrderedDict([
+            ('articlemeta', StubServer(
+                load_articlemeta_thrift().ArticleMeta, ArticleMetaHandler(dataset, latency))),
+            ('ratchet', StubServer(
+                load_ratchet_thrift().RatchetStats, RatchetHandler(dataset, latency),
+                proto_factory=protocol_factory(ratchet_protocol),
+                trans_factory=transport_factory(ratchet_transport))),
+            ('accessstats', StubServer(
+                AccessStats.ACCESSSTATS_THRIFT.AccessStats, SearchHandler(dataset, latency))),
+            ('publicationstats', StubServer(
+                PublicationStats.PUBLICATIONSTATS_THRIFT.PublicationStats,
+                PublicationStatsHandler(dataset, latency))),
+            ('citedby', StubServer(
+                Citedby.CITEDBY_THRIFT.Citedby, CitedbyHandler(dataset, latency))),
+        ])
+        self.http = HTTPStub(latency)
+
+    def start(self):
+        for server in self.servers.values():
+            server.start()
+        self.http.start()
+
+        return self
+
+    def stop(self):
+        for server in self.servers.values():
+            server.stop()
+        self.http.stop()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def reset(self):
+        for server in self.servers.values():
+            server.handler.counter.reset()
+        self.http.counter.reset()
+
+    def counts(self):
+        """
+        Chamadas recebidas no formato {'servico.metodo': total}.
+        """
+        result = {}
+        for name, server in self.servers.items():
+            for method, total in server.handler.counter.counts().items():
+                result['%s.%s' % (name, method)] = total
+        result.update(self.http.counter.counts())
+
+        return result
+
+    def settings(self):
+        return {
+            'articlemeta_thriftserver': self.servers['articlemeta'].address,
+            'ratchet_thriftserver': self.servers['ratchet'].address,
+            'ratchet_thrift_protocol': self.ratchet_protocol,
+            'ratchet_thrift_transport': self.ratchet_transport,
+            'accessstats_thriftserver': self.servers['accessstats'].address,
+            'accessesstats_thriftserver': self.servers['accessstats'].address,
+            'publicationstats_thriftserver': self.servers['publicationstats'].address,
+            'citedby_thriftserver': self.servers['citedby'].address,
+            'solr_search_scielo_org': self.http.address,
+            'solr_search_scielo_org_index': 'search-scielo',
+            'analytics_url': 'http://%s' % self.http.address,
+        }
+
+    def write_settings(self, path):
+        with open(path, 'w') as f:
+            f.write('[app:main]\n')
+            for key, value in sorted(self.settings().items()):
+                f.write('%s = %s\n' % (key, value))
@@ -7,12 +7,12 @@ Formato de saída:
 """
 import argparse
 import logging
-import codecs
 import json
-import datetime
 
+import output
 import utils
 import choices
+from document_record import DocumentRecord
 
 logger = logging.getLogger(__name__)
 
@@ -48,14 +48,17 @@ def _config_logging(logging_level='INFO', logging_file=None):
 
 class Dumper(object):
 
-    def __init__(self, collection, issns=None, output_file=None, output_format=OUTPUT_FORMAT):
+    # partes opcionais dos documentos utilizadas (ver projection)
+    DOCUMENT_FIELDS = []
+
+    def __init__(self, collection, issns=None, output_file=None, output_format=OUTPUT_FORMAT, source=None, shard=None):
 
         self._citedby = utils.citedby_server()
-        self._articlemeta = utils.articlemeta_server()
+        self._articlemeta = utils.articlemeta_server(source, shard)
         self.collection = collection
         self.issns = issns
         self.output_format = output_format
-        self.output_file = codecs.open(output_file, 'w', encoding='utf-8') if output_file else output_file
+        self.writer = output.CSVWriter(output_file)
 
         if output_format != 'json':
             header = []
@@ -81,17 +84,15 @@ class Dumper(object):
             header.append(u"cited by document publication year")
             header.append(u"cited by document title")
 
-            self.write(u','.join([u'"%s"' % i.replace(u'"', u'""') for i in header]))
+            self.write(header)
 
     def write(self, line):
-        if not self.output_file:
-            print(line.encode('utf-8'))
-        else:
-            self.output_file.write('%s\r\n' % line)
+        self.writer.write(line)
 
     def run(self):
         for item in self.items():
             self.write(item)
+        self.writer.close()
         logger.info('Export finished')
 
     def items(self):
@@ -100,16 +101,26 @@ class Dumper(object):
             self.issns = [None]
 
         for issn in self.issns:
-            for data in self._articlemeta.documents(collection=self.collection, issn=issn):
+            for data in self._articlemeta.documents(collection=self.collection, issn=issn, fields=self.DOCUMENT_FIELDS):
                 logger.debug('Reading document: %s' % data.publisher_id)
+                for line in self.document_lines(data):
+                    yield line
+
+    def document_lines(self, data):
+        """
+        Linhas de saída de um documento, uma para cada citação recebida.
+        """
+        citedby = self._citedby.citedby_pid(data.publisher_id, metaonly=False)
+        if self.output_format == 'json' and isinstance(citedby, dict):
+            return [self.fmt_json(citedby)]
 
-                citedby = self._citedby.citedby_pid(data.publisher_id, metaonly=False)
-                if self.output_format == 'json' and isinstance(citedby, dict):
-                    yield self.fmt_json(citedby)
-                    continue
+        items = (citedby or {}).get('cited_by', [])
+        if not items:
+            return []
 
-                for item in citedby.get('cited_by', []):
-                    yield self.fmt_csv((data, item))
+        record = DocumentRecord(data)
+
+        return [self.fmt_csv((record, item)) for item in items]
 
     def fmt_json(self, content):
 
@@ -118,35 +129,12 @@ class Dumper(object):
     def fmt_csv(self, content):
 
         data, citedby = content
+        record = DocumentRecord.of(data)
+        data = record.document
 
-        know_languages = set(['pt', 'es', 'en'])
-        languages = set(data.languages())
-
-        issns = []
-        if data.journal.print_issn:
-            issns.append(data.journal.print_issn)
-        if data.journal.electronic_issn:
-            issns.append(data.journal.electronic_issn)
-
-        line = []
-        line.append(datetime.datetime.now().isoformat()[0:10])
-        line.append(u'document')
-        line.append(data.collection_acronym)
-        line.append(data.journal.scielo_issn)
-        line.append(u';'.join(issns))
-        line.append(data.journal.title)
-        line.append(u';'.join(data.journal.subject_areas or []))
-        for area in choices.THEMATIC_AREAS:
-            if area.lower() in [i.lower() for i in data.journal.subject_areas or []]:
-                line.append(u'1')
-            else:
-                line.append(u'0')
-        line.append('1' if len(data.journal.subject_areas or []) > 2 else '0')
-        line.append(data.journal.current_status)
-        line.append(data.publisher_id)
-        line.append(data.publication_date[0:4])
-        line.append(data.document_type)
-        line.append(u'1' if data.document_type.lower() in choices.CITABLE_DOCUMENT_TYPES else '0')
+        line = record.columns()
+        line.append(record.document_type)
+        line.append(u'1' if record.citable else '0')
         line.append(data.original_title() or '')
         line.append(citedby.get('code', ''))
         line.append(citedby.get('issn', ''))
@@ -161,9 +149,7 @@ class Dumper(object):
         else:
             line.append('')
 
-        joined_line = ','.join(['"%s"' % i.replace('"', '""') for i in line])
-
-        return joined_line
+        return line
 
 
 def main():
@@ -198,6 +184,20 @@ def main():
         help='File to receive the dumped data'
     )
 
+    parser.add_argument(
+        '--source',
+        '-s',
+        default=None,
+        help='Read ArticleMeta records from a local snapshot, ex: snapshot:/path/to/scl.db'
+    )
+
+    parser.add_argument(
+        '--shard',
+        type=utils.parse_shard,
+        default=None,
+        help='Process only the journals of partition K of N (stable hash of the ISSN SciELO), ex: 2/4'
+    )
+
     parser.add_argument(
         '--logging_file',
         '-o',
@@ -220,6 +220,6 @@ def main():
     if len(args.issns) > 0:
         issns = utils.ckeck_given_issns(args.issns)
 
-    dumper = Dumper(args.collection, issns, args.output_file, args.output_format)
+    dumper = Dumper(args.collection, issns, args.output_file, args.output_format, source=args.source, shard=args.shard)
 
     dumper.run()
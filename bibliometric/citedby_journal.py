@@ -7,10 +7,10 @@ Formato de saída:
 """
 import argparse
 import logging
-import codecs
 import json
 import datetime
 
+import output
 import utils
 import choices
 
@@ -59,14 +59,14 @@ def compute_citations(raw_data):
 
 class Dumper(object):
 
-    def __init__(self, collection, issns=None, output_file=None, output_format=OUTPUT_FORMAT, with_ref_links=False):
+    def __init__(self, collection, issns=None, output_file=None, output_format=OUTPUT_FORMAT, with_ref_links=False, source=None, shard=None):
 
         self._citedby = utils.citedby_server()
-        self._articlemeta = utils.articlemeta_server()
+        self._articlemeta = utils.articlemeta_server(source, shard)
         self.collection = collection
         self.issns = issns
         self.output_format = output_format
-        self.output_file = codecs.open(output_file, 'w', encoding='utf-8') if output_file else output_file
+        self.writer = output.CSVWriter(output_file)
 
         if output_format != 'json':
             header = []
@@ -86,17 +86,15 @@ class Dumper(object):
             header.append(u"cited publications from (year)")
             header.append(u"total of citations")
 
-            self.write(u','.join([u'"%s"' % i.replace(u'"', u'""') for i in header]))
+            self.write(header)
 
     def write(self, line):
-        if not self.output_file:
-            print(line.encode('utf-8'))
-        else:
-            self.output_file.write('%s\r\n' % line)
+        self.writer.write(line)
 
     def run(self):
         for item in self.items():
             self.write(item)
+        self.writer.close()
         logger.info('Export finished')
 
     def items(self):
@@ -153,9 +151,7 @@ class Dumper(object):
         line.append(str(citedby[1][0]))
         line.append(str(citedby[1][1]))
 
-        joined_line = ','.join(['"%s"' % i.replace('"', '""') for i in line])
-
-        return joined_line
+        return line
 
 
 def main():
@@ -197,6 +193,20 @@ def main():
         help='File to receive the dumped data'
     )
 
+    parser.add_argument(
+        '--source',
+        '-s',
+        default=None,
+        help='Read ArticleMeta records from a local snapshot, ex: snapshot:/path/to/scl.db'
+    )
+
+    parser.add_argument(
+        '--shard',
+        type=utils.parse_shard,
+        default=None,
+        help='Process only the journals of partition K of N (stable hash of the ISSN SciELO), ex: 2/4'
+    )
+
     parser.add_argument(
         '--logging_file',
         '-o',
@@ -219,6 +229,6 @@ def main():
     if len(args.issns) > 0:
         issns = utils.ckeck_given_issns(args.issns)
 
-    dumper = Dumper(args.collection, issns, args.output_file, args.output_format, args.with_ref_links)
+    dumper = Dumper(args.collection, issns, args.output_file, args.output_format, args.with_ref_links, source=args.source, shard=args.shard)
 
     dumper.run()
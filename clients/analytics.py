@@ -8,14 +8,18 @@ import logging
 
 import requests
 
+import instrumentation
+import utils
+
 logger = logging.getLogger(__name__)
 
 
 class Analytics(object):
 
-    def __init__(self):
+    def __init__(self, source=None):
 
-        self.source = 'http://analytics.scielo.org'
+        self.source = source or utils.settings.get('app:main', {}).get(
+            'analytics_url', 'http://analytics.scielo.org')
 
     def _compute_impact_factor(self, data):
 
@@ -48,7 +52,9 @@ class Analytics(object):
 
         try:
             logger.debug('Requesting data to Analytics %s %s' % (url, str(payload)))
-            response = requests.get(url, params=payload, timeout=360)
+            with instrumentation.timer('analytics', 'impact_factor_chart') as call:
+                response = requests.get(url, params=payload, timeout=360)
+                call.response(response)
         except Exception as e:
             logger.error('Could not retrieve data from Analytics %s %s' % (url, str(payload)))
             return None
@@ -6,38 +6,73 @@ This client connects to Solr API.
 """
 import logging
 import json
+import time
 
 import requests
 
+import instrumentation
 import utils
 
 logger = logging.getLogger(__name__)
 
 
-API_DOMAIN = utils.settings.get('app:main', {}).get(
-    'solr_search_scielo_org', 'localhost:8080')
+UPDATE_ENDPOINT = 'http://%s/solr/%s/update'
 
-API_INDEX = utils.settings.get('app:main', {}).get(
-    'solr_search_scielo_org_index', 'search-scielo')
+BATCH_SIZE = 1000
+FLUSH_INTERVAL = 60
+TIMEOUT = 60
 
 
 class Search(object):
+    """
+    As atualizações de indicadores são acumuladas em memória e enviadas ao
+    Solr em lotes de atualizações atômicas (``set``), em uma única sessão
+    HTTP. O lote é enviado quando atinge ``batch_size`` documentos ou quando
+    o último envio ocorreu há mais de ``flush_interval`` segundos. O método
+    ``deploy`` envia o restante do lote e executa o commit e o optimize do
+    índice uma única vez. ``on_flush`` recebe os documentos de cada lote
+    enviado com sucesso.
+    """
+
+    def __init__(self, update_endpoint=None, batch_size=BATCH_SIZE,
+                 flush_interval=FLUSH_INTERVAL, timeout=TIMEOUT, on_flush=None):
+
+        self.update_endpoint = update_endpoint or self.default_update_endpoint()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.timeout = timeout
+        self.session = requests.Session()
+        self._buffer = []
+        self._last_flush = time.time()
+        self.on_flush = on_flush
+
+    @staticmethod
+    def default_update_endpoint():
+        app = utils.settings.get('app:main', {})
+
+        return UPDATE_ENDPOINT % (
+            app.get('solr_search_scielo_org', 'localhost:8080'),
+            app.get('solr_search_scielo_org_index', 'search-scielo')
+        )
 
-    UPDATE_ENDPOINT = 'http://%s/solr/%s/update' % (API_DOMAIN, API_INDEX)
-
-    def _do_request(self, url, params=None, data=None, headers=None):
+    def _do_request(self, url, params=None, data=None, headers=None, method='update',
+                    http_method='post'):
         """
         Realiza as requisições diversas utilizando a biblioteca requests,
-        tratando de forma genérica as exceções.
+        tratando de forma genérica as exceções. As atualizações são enviadas
+        com POST, o commit e o optimize com GET, apenas com os parâmetros.
         """
 
         if not headers:
             headers = {'content-type': 'application/json'}
 
         try:
-            response = requests.get(
-                url, params=params, data=data, headers=headers)
-        except:
+            with instrumentation.timer('search', method) as call:
+                response = self.session.request(
+                    http_method, url, params=params, data=data, headers=headers,
+                    timeout=self.timeout)
+                call.response(response)
+        except requests.RequestException:
             return None
 
         if response.status_code == 200:
@@ -45,40 +80,56 @@ class Search(object):
 
     def update_document_indicators(self, doc_id, citations, accesses):
         """
-            Atualiza os indicadores de acessos e citações de um determinado
-            doc_id.
+            Agenda a atualização dos indicadores de acessos e citações de um
+            determinado doc_id.
             exemplo de doc_id: S0021-25712009000400007-spa
         """
 
-        headers = {'content-type': 'application/json'}
-
-        data = {
-            "add": {
-                "doc": {
-                    "id": doc_id
-                }
-            }
-        }
+        doc = {"id": doc_id}
 
         if citations:
-            data['add']['doc']['total_received'] = {'set': str(citations)}
+            doc['total_received'] = {'set': str(citations)}
 
         if accesses:
-            data['add']['doc']['total_access'] = {'set': str(accesses)}
+            doc['total_access'] = {'set': str(accesses)}
+
+        if len(doc) == 1:
+            return
+
+        self._buffer.append(doc)
+
+        if len(self._buffer) >= self.batch_size or \
+                time.time() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """
+            Envia as atualizações acumuladas em uma única requisição.
+        """
 
-        params = {'wt': 'json'}
+        self._last_flush = time.time()
+
+        if not self._buffer:
+            return None
+
+        docs, self._buffer = self._buffer, []
 
         response = self._do_request(
-            self.UPDATE_ENDPOINT,
-            params=params,
-            data=json.dumps(data),
-            headers=headers
+            self.update_endpoint,
+            params={'wt': 'json'},
+            data=json.dumps(docs)
         )
 
         if not response:
-            logger.debug('Document (%s) could not be updated' % doc_id)
+            logger.warning('%d documents could not be updated' % len(docs))
+            return None
 
-        logger.debug('Document (%s) updated' % doc_id)
+        logger.debug('%d documents updated' % len(docs))
+
+        if self.on_flush:
+            self.on_flush(docs)
+
+        return len(docs)
 
     def _commit(self):
         """
@@ -88,8 +139,10 @@ class Search(object):
         params = {'commit': 'true'}
 
         response = self._do_request(
-            self.UPDATE_ENDPOINT,
-            params=params
+            self.update_endpoint,
+            params=params,
+            method='commit',
+            http_method='get'
         )
 
         if response and response.status_code == 200:
@@ -106,8 +159,10 @@ class Search(object):
         params = {'optimize': 'true'}
 
         response = self._do_request(
-            self.UPDATE_ENDPOINT,
-            params=params
+            self.update_endpoint,
+            params=params,
+            method='optimize',
+            http_method='get'
         )
 
         if response and response.status_code == 200:
@@ -118,7 +173,9 @@ class Search(object):
 
     def deploy(self):
         """
-            Executa o commit e optimize do indice.
+            Envia as atualizações pendentes e executa o commit e optimize do
+            indice.
         """
+        self.flush()
         self._commit()
         self._optimize()
@@ -0,0 +1,115 @@
+# coding: utf-8
+"""
+Registro compacto dos metadados de um documento utilizados pelas tabulações
+de documentos (publication, bibliometric.citedby_document e
+accesses.dumpdata).
+
+As propriedades do xylose percorrem o registro do ArticleMeta a cada acesso.
+O DocumentRecord lê uma única vez por documento os metadados comuns às
+tabulações e os valores derivados (ano de publicação, documento citável,
+ISSN's, áreas temáticas). Autores, afiliações e idiomas são lidos no primeiro
+acesso, apenas pelas tabulações que os utilizam. Os demais atributos são
+lidos do documento do xylose (``document``), o registro pode ser utilizado
+no lugar do documento pelos demais processamentos.
+"""
+from __future__ import absolute_import
+import datetime
+
+import choices
+
+_MISSING = object()
+
+
+class DocumentRecord(object):
+
+    __slots__ = (
+        'document', 'collection', 'publisher_id', 'scielo_issn', 'issns',
+        'journal_title', 'subject_areas', 'area_flags', 'multidisciplinary',
+        'current_status', 'publication_date', 'publication_year',
+        'document_type', 'citable', '_authors', '_mixed_affiliations',
+        '_languages'
+    )
+
+    def __init__(self, document):
+        journal = document.journal
+
+        self.document = document
+        self.collection = document.collection_acronym
+        self.publisher_id = document.publisher_id
+        self.scielo_issn = journal.scielo_issn
+        self.issns = [i for i in (journal.print_issn, journal.electronic_issn) if i]
+        self.journal_title = journal.title
+        self.subject_areas = journal.subject_areas or []
+        areas = set([i.lower() for i in self.subject_areas])
+        self.area_flags = [
+            u'1' if area.lower() in areas else u'0' for area in choices.THEMATIC_AREAS]
+        self.multidisciplinary = len(self.subject_areas) > 2
+        self.current_status = journal.current_status
+        self.publication_date = document.publication_date
+        self.publication_year = self.publication_date[0:4]
+        self.document_type = document.document_type
+        self.citable = self.document_type.lower() in choices.CITABLE_DOCUMENT_TYPES
+        self._authors = _MISSING
+        self._mixed_affiliations = _MISSING
+        self._languages = _MISSING
+
+    @classmethod
+    def of(cls, document):
+        """
+        Registro do documento do xylose, ``document`` quando já é um
+        DocumentRecord.
+        """
+        if isinstance(document, cls):
+            return document
+
+        return cls(document)
+
+    @property
+    def authors(self):
+        if self._authors is _MISSING:
+            self._authors = self.document.authors
+
+        return self._authors
+
+    @property
+    def mixed_affiliations(self):
+        if self._mixed_affiliations is _MISSING:
+            self._mixed_affiliations = self.document.mixed_affiliations
+
+        return self._mixed_affiliations
+
+    def languages(self):
+        if self._languages is _MISSING:
+            self._languages = self.document.languages()
+
+        return self._languages
+
+    def __getattr__(self, name):
+        # demais metadados lidos do documento do xylose, os atributos
+        # privados e especiais não são repassados
+        if name == 'document' or name.startswith('_'):
+            raise AttributeError(name)
+
+        return getattr(self.document, name)
+
+    def columns(self):
+        """
+        Colunas iniciais das tabulações de documentos, da data de extração
+        ao ano de publicação.
+        """
+        line = [
+            datetime.datetime.now().isoformat()[0:10],
+            u'document',
+            self.collection,
+            self.scielo_issn,
+            u';'.join(self.issns),
+            self.journal_title,
+            u';'.join(self.subject_areas)
+        ]
+        line += self.area_flags
+        line.append('1' if self.multidisciplinary else '0')
+        line.append(self.current_status)
+        line.append(self.publisher_id)
+        line.append(self.publication_year)
+
+        return line
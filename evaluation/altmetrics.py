@@ -5,7 +5,6 @@ Este processamento gera uma tabulação com scores do altimetrics para documento
 
 import argparse
 import logging
-import codecs
 import requests
 import datetime
 
@@ -15,6 +14,8 @@ try:
 except:
     from urllib import parse  # Python3
 
+import instrumentation
+import output
 import utils
 import choices
 
@@ -61,13 +62,13 @@ def get_doi_from_url(url):
 
 class Dumper(object):
 
-    def __init__(self, collection, issns=None, output_file=None):
+    def __init__(self, collection, issns=None, output_file=None, source=None, shard=None):
 
         self._ratchet = utils.ratchet_server()
-        self._articlemeta = utils.articlemeta_server()
+        self._articlemeta = utils.articlemeta_server(source, shard)
         self.collection = collection
         self.issns = issns
-        self.output_file = codecs.open(output_file, 'w', encoding='utf-8') if output_file else output_file
+        self.writer = output.CSVWriter(output_file)
         header = []
         header.append(u"extraction date")
         header.append(u"study unit")
@@ -87,17 +88,15 @@ class Dumper(object):
         header.append(u"score")
         header.append(u'altmetrics url')
 
-        self.write(u','.join([u'"%s"' % i.replace(u'"', u'""') for i in header]))
+        self.write(header)
 
     def write(self, line):
-        if not self.output_file:
-            print(line.encode('utf-8'))
-        else:
-            self.output_file.write('%s\r\n' % line)
+        self.writer.write(line)
 
     def run(self):
         for item in self.items():
             self.write(item)
+        self.writer.close()
 
     def altmetrics_items_by_journals(self, issn):
 
@@ -112,7 +111,9 @@ class Dumper(object):
             payload['page'] = page
             try:
                 logger.debug('Requesting data to altmetrics %s' % str(payload))
-                response = requests.get(ALTMETRICS_API_URL, params=payload, timeout=10)
+                with instrumentation.timer('altmetrics', 'citations') as call:
+                    response = requests.get(ALTMETRICS_API_URL, params=payload, timeout=10)
+                    call.response(response)
             except Exception as e:
                 logger.error('Could not retrieve data from altmetrics %s' % str(payload))
                 continue
@@ -193,7 +194,7 @@ class Dumper(object):
         line.append(str(score) or u'0')
         line.append(details_url or u'not defined')
 
-        return u','.join([u'"%s"' % i.replace(u'"', u'""') for i in line])
+        return line
 
 
 def main():
@@ -220,6 +221,20 @@ def main():
         help='File to receive the dumped data'
     )
 
+    parser.add_argument(
+        '--source',
+        '-s',
+        default=None,
+        help='Read ArticleMeta records from a local snapshot, ex: snapshot:/path/to/scl.db'
+    )
+
+    parser.add_argument(
+        '--shard',
+        type=utils.parse_shard,
+        default=None,
+        help='Process only the journals of partition K of N (stable hash of the ISSN SciELO), ex: 2/4'
+    )
+
     parser.add_argument(
         '--logging_file',
         '-o',
@@ -242,6 +257,6 @@ def main():
     if len(args.issns) > 0:
         issns = utils.ckeck_given_issns(args.issns)
 
-    dumper = Dumper(args.collection, issns, args.output_file)
+    dumper = Dumper(args.collection, issns, args.output_file, source=args.source, shard=args.shard)
 
     dumper.run()
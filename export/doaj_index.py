@@ -0,0 +1,314 @@
+# coding: utf-8
+"""
+Este processamento constrói um índice local dos identificadores de artigos do
+DOAJ a partir do dump público de artigos (ou de um arquivo local equivalente).
+
+O índice é utilizado pelo processamento de exportação para o DOAJ
+(export.exdoaj) para identificar artigos já disponíveis no DOAJ sem consultar
+a API de busca para cada documento.
+
+Chaves do índice:
+    DOI normalizado
+    (ISSN, ano de publicação, título normalizado)
+"""
+import os
+import re
+import argparse
+import logging
+import json
+import sqlite3
+import string
+import tarfile
+import tempfile
+import threading
+import unicodedata
+
+import requests
+
+import utils
+
+logger = logging.getLogger(__name__)
+
+DOAJ_ARTICLE_DUMP_URL = 'https://doaj.org/public-data-dump/article'
+DOI_PREFIX_REGEX = re.compile(r'^(https?://)?(dx\.)?doi\.org/', re.IGNORECASE)
+SPACES_REGEX = re.compile(r'\s+')
+TITLE_CHARS = frozenset(string.ascii_lowercase + string.digits + ' ')
+BATCH_SIZE = 5000
+
+
+def _config_logging(logging_level='INFO', logging_file=None):
+
+    allowed_levels = {
+        'DEBUG': logging.DEBUG,
+        'INFO': logging.INFO,
+        'WARNING': logging.WARNING,
+        'ERROR': logging.ERROR,
+        'CRITICAL': logging.CRITICAL
+    }
+
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    logger.setLevel(allowed_levels.get(logging_level, 'INFO'))
+
+    if logging_file:
+        hl = logging.FileHandler(logging_file, mode='a')
+    else:
+        hl = logging.StreamHandler()
+
+    hl.setFormatter(formatter)
+    hl.setLevel(allowed_levels.get(logging_level, 'INFO'))
+
+    logger.addHandler(hl)
+
+    return logger
+
+
+def normalize_doi(doi):
+    """
+    input:
+        'https://doi.org/10.1590/S0102-67202009000300001'
+    output:
+        '10.1590/s0102-67202009000300001'
+    """
+    return DOI_PREFIX_REGEX.sub('', (doi or '').strip()).lower()
+
+
+def normalize_title(title):
+    """
+    input:
+        u'Análise  de <i>dados</i>: 2ª edição, 1999-2009'
+    output:
+        u'analise de dados 2a edicao 19992009'
+
+    Os dígitos são mantidos, diferente de utils.cleanup_string, para que
+    títulos que diferem apenas em números (volumes, anos, partes) não
+    produzam a mesma chave.
+    """
+    title = SPACES_REGEX.sub(' ', utils.remove_tags(title or '').lower())
+    try:
+        nfkd_form = unicodedata.normalize('NFKD', title)
+    except TypeError:
+        nfkd_form = unicodedata.normalize('NFKD', unicode(title))
+
+    return SPACES_REGEX.sub(' ', u''.join(x for x in nfkd_form if x in TITLE_CHARS)).strip()
+
+
+def record_keys(record):
+    """
+    Extrai de um registro do dump de artigos do DOAJ o id do artigo, o DOI
+    normalizado e as chaves (ISSN, ano, título normalizado).
+    """
+    bibjson = record.get('bibjson', {})
+
+    doi = None
+    issns = set(bibjson.get('journal', {}).get('issns', []))
+    for identifier in bibjson.get('identifier', []):
+        if identifier.get('type', '').lower() == 'doi':
+            doi = normalize_doi(identifier.get('id', ''))
+        elif identifier.get('type', '').lower() in ['pissn', 'eissn']:
+            issns.add(identifier.get('id', ''))
+
+    year = bibjson.get('year', '') or ''
+    title = normalize_title(bibjson.get('title', ''))
+
+    meta = []
+    if year and title:
+        meta = [(issn.upper(), str(year), title) for issn in issns if issn]
+
+    return record.get('id', None), doi, meta
+
+
+def read_dump(path):
+    """
+    Lê os registros de um dump de artigos do DOAJ. São aceitos o arquivo
+    tar.gz distribuído pelo DOAJ, com lotes JSON de artigos, ou um único
+    arquivo JSON contendo a lista de artigos.
+    """
+    if tarfile.is_tarfile(path):
+        with tarfile.open(path, 'r:*') as tar:
+            for member in tar:
+                if not member.isfile() or not member.name.endswith('.json'):
+                    continue
+                logger.info('Reading dump batch: %s' % member.name)
+                for record in json.loads(tar.extractfile(member).read().decode('utf-8')):
+                    yield record
+        return
+
+    with open(path, 'rb') as f:
+        for record in json.loads(f.read().decode('utf-8')):
+            yield record
+
+
+def download_dump(url, api_key=None, timeout=60):
+    """
+    Realiza o download do dump de artigos do DOAJ para um arquivo temporário
+    e retorna o seu caminho.
+    """
+    params = {'api_key': api_key} if api_key else None
+
+    response = requests.get(url, params=params, stream=True, timeout=timeout)
+    response.raise_for_status()
+
+    fd, path = tempfile.mkstemp(suffix='.tar.gz')
+    with os.fdopen(fd, 'wb') as f:
+        for chunk in response.iter_content(chunk_size=1024 * 1024):
+            f.write(chunk)
+
+    logger.info('DOAJ dump downloaded to: %s' % path)
+
+    return path
+
+
+class DOAJIndex(object):
+    """
+    Índice local dos identificadores de artigos do DOAJ armazenado em SQLite.
+
+    DOIs e chaves (ISSN, ano, título) associados a mais de um artigo são
+    marcados como ambíguos e não são resolvidos, assim como acontece nas
+    consultas à API do DOAJ.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    @property
+    def connection(self):
+        if not hasattr(self._local, 'connection'):
+            self._local.connection = sqlite3.connect(self.path)
+
+        return self._local.connection
+
+    def create(self):
+        cursor = self.connection.cursor()
+        cursor.execute('DROP TABLE IF EXISTS doi')
+        cursor.execute('DROP TABLE IF EXISTS meta')
+        cursor.execute('CREATE TABLE doi (doi TEXT PRIMARY KEY, doaj_id TEXT)')
+        cursor.execute(
+            'CREATE TABLE meta (issn TEXT, year TEXT, title TEXT, doaj_id TEXT, '
+            'PRIMARY KEY (issn, year, title))'
+        )
+        self.connection.commit()
+
+    def build(self, records, batch_size=BATCH_SIZE):
+        self.create()
+        cursor = self.connection.cursor()
+
+        count = 0
+        for record in records:
+            doaj_id, doi, meta = record_keys(record)
+            if not doaj_id:
+                continue
+
+            if doi:
+                cursor.execute(
+                    'INSERT OR IGNORE INTO doi (doi, doaj_id) VALUES (?, ?)',
+                    (doi, doaj_id)
+                )
+                if cursor.rowcount == 0:
+                    cursor.execute(
+                        "UPDATE doi SET doaj_id = '' WHERE doi = ? AND doaj_id != ?",
+                        (doi, doaj_id)
+                    )
+
+            for issn, year, title in meta:
+                cursor.execute(
+                    'INSERT OR IGNORE INTO meta (issn, year, title, doaj_id) VALUES (?, ?, ?, ?)',
+                    (issn, year, title, doaj_id)
+                )
+                if cursor.rowcount == 0:
+                    cursor.execute(
+                        "UPDATE meta SET doaj_id = '' WHERE issn = ? AND year = ? AND title = ? AND doaj_id != ?",
+                        (issn, year, title, doaj_id)
+                    )
+
+            count += 1
+            if count % batch_size == 0:
+                self.connection.commit()
+                logger.info('%d DOAJ records indexed' % count)
+
+        self.connection.commit()
+        logger.info('%d DOAJ records indexed' % count)
+
+        return count
+
+    def doaj_id_by_doi(self, doi):
+        row = self.connection.execute(
+            'SELECT doaj_id FROM doi WHERE doi = ?', (normalize_doi(doi),)
+        ).fetchone()
+
+        if row and row[0]:
+            return row[0]
+
+    def doaj_id_by_meta(self, issns, publication_year, title):
+        title = normalize_title(title)
+
+        for issn in issns:
+            if not issn:
+                continue
+            row = self.connection.execute(
+                'SELECT doaj_id FROM meta WHERE issn = ? AND year = ? AND title = ?',
+                (issn.upper(), publication_year, title)
+            ).fetchone()
+            if row and row[0]:
+                return row[0]
+
+
+def main():
+
+    parser = argparse.ArgumentParser(
+        description='Build a local index of DOAJ article identifiers'
+    )
+
+    parser.add_argument(
+        'index_file',
+        help='Full path to the SQLite file that will receive the index'
+    )
+
+    parser.add_argument(
+        '--dump_file',
+        '-d',
+        default=None,
+        help='Full path to a local DOAJ article dump (tar.gz or json). If not given the dump will be downloaded'
+    )
+
+    parser.add_argument(
+        '--dump_url',
+        default=DOAJ_ARTICLE_DUMP_URL,
+        help='DOAJ article dump URL'
+    )
+
+    parser.add_argument(
+        '--api_key',
+        '-k',
+        default=None,
+        help='DOAJ API key used to download the dump'
+    )
+
+    parser.add_argument(
+        '--logging_file',
+        '-o',
+        help='Full path to the log file'
+    )
+
+    parser.add_argument(
+        '--logging_level',
+        '-l',
+        default='DEBUG',
+        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'],
+        help='Logggin level'
+    )
+
+    args = parser.parse_args()
+    _config_logging(args.logging_level, args.logging_file)
+
+    dump_file = args.dump_file
+    if not dump_file:
+        logger.info('Downloading DOAJ dump from: %s' % args.dump_url)
+        dump_file = download_dump(args.dump_url, args.api_key)
+
+    logger.info('Building DOAJ index: %s' % args.index_file)
+    DOAJIndex(args.index_file).build(read_dump(dump_file))
+
+    if not args.dump_file:
+        os.remove(dump_file)
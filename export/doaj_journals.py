@@ -6,7 +6,6 @@ nesta fonte de informação.
 import os
 import argparse
 import logging
-import codecs
 import json
 import time
 from io import BytesIO, StringIO
@@ -14,13 +13,24 @@ from datetime import datetime, timedelta
 
 import requests
 from lxml import etree
+from multiprocessing.pool import ThreadPool
 
 from doaj.journals import Journals
 
+import instrumentation
+import output
 import utils
 
 logger = logging.getLogger(__name__)
 
+DOAJ_JOURNAL_API_URL = 'https://doaj.org/api/v1/search/journals/issn:%s'
+TIMEOUT = 3
+ATTEMPTS = 10
+BACKOFF = 0.5
+MAX_BACKOFF = 30
+POOL_SIZE = 10
+WORKERS = 8
+
 
 def _config_logging(logging_level='INFO', logging_file=None):
 
@@ -49,45 +59,102 @@ def _config_logging(logging_level='INFO', logging_file=None):
     return logger
 
 
-def request_api(url, timeout=3, attempts=10):
+def http_session(pool_size=POOL_SIZE):
+    """
+    Sessão HTTP com pool de conexões para reaproveitar as conexões abertas
+    com a API do DOAJ entre as requisições.
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    return session
+
+
+def request_api(url, timeout=TIMEOUT, attempts=ATTEMPTS, backoff=BACKOFF,
+                session=None, method='journals'):
+    """
+    Realiza a requisição com até ``attempts`` tentativas, aguardando entre
+    elas um intervalo que cresce exponencialmente a partir de ``backoff``
+    segundos. Erros do cliente (4xx), exceto 429, não são repetidos.
+    ``method`` identifica a chamada na instrumentação.
+    """
+
+    session = session or requests
 
-    attempt = 0
-    while True:
+    for attempt in range(attempts):
         result = None
-        if attempt == attempts:
-            return None
         try:
-            result = requests.get(url, timeout=3)
-        except:
-            logger.error("Fail to retrieve data from (%s) attempt %d/%d" % (url, attempt, attempts))
-            time.sleep(1)
+            with instrumentation.timer('doaj', method) as call:
+                result = session.get(url, timeout=timeout)
+                call.response(result)
+        except requests.RequestException:
+            logger.error("Fail to retrieve data from (%s) attempt %d/%d" % (url, attempt + 1, attempts))
 
-        if result and result.status_code == 200:
-            return result
+        if result is not None:
+            if result.status_code == 200:
+                return result
 
-        attempt += 1
+            if 400 <= result.status_code < 500 and result.status_code != 429:
+                logger.error("Fail to retrieve data from (%s) status %d" % (url, result.status_code))
+                return None
+
+        if attempt + 1 < attempts:
+            time.sleep(min(backoff * 2 ** attempt, MAX_BACKOFF))
 
 
 class Dumper(object):
 
-    def __init__(self, collection, issns=None, output_file=None):
+    def __init__(self, collection, issns=None, output_file=None,
+                 workers=WORKERS, timeout=TIMEOUT, attempts=ATTEMPTS, source=None, shard=None):
 
-        self._articlemeta = utils.articlemeta_server()
+        self._articlemeta = utils.articlemeta_server(source, shard)
         self.collection = collection
         self.doaj_journals = Journals()
         self.issns = issns
-        self.output_file = codecs.open(output_file, 'w', encoding='utf-8') if output_file else output_file
+        self.workers = workers
+        self.timeout = timeout
+        self.attempts = attempts
+        self.session = http_session(max(POOL_SIZE, workers))
+        self._cache = {}
+        self.writer = output.CSVWriter(output_file)
         header = [u"coleção",u"issn scielo",u"issn impresso",u"issn eletrônico",u"título",u"ID no DOAJ",u"Provider no DOAJ",u"Status no DOAJ"]
 
-        self.write(u','.join([u'"%s"' % i.replace(u'"', u'""') for i in header]))
+        self.write(header)
+
+    def doaj_journal_by_issn(self, issn):
+        """
+        Consulta o DOAJ por ISSN, mantendo as respostas em cache pois o mesmo
+        ISSN pode ser consultado por mais de um periódico.
+        """
+        if issn in self._cache:
+            return self._cache[issn]
+
+        result = request_api(
+            DOAJ_JOURNAL_API_URL % issn, timeout=self.timeout,
+            attempts=self.attempts, session=self.session
+        )
+
+        journal = None
+        if result is not None:
+            try:
+                journal = result.json()
+            except ValueError:
+                logger.error("Invalid JSON data retrieved for %s" % issn)
+
+        self._cache[issn] = journal
+
+        return journal
 
     def get_doaj_journal(self, issns):
         data = {}
         journal = None
 
         for issn in issns:
-            journal = request_api('https://doaj.org/api/v1/search/journals/issn:%s' % issn).json()
-            if journal:
+            journal = self.doaj_journal_by_issn(issn)
+            if journal and len(journal.get('results', [])) > 0:
                 break
 
         if not journal:
@@ -109,30 +176,45 @@ class Dumper(object):
         return data
 
     def write(self, line):
-        if not self.output_file:
-            print(line.encode('utf-8'))
-        else:
-            self.output_file.write('%s\r\n' % line)
+        self.writer.write(line)
 
     def run(self):
         for item in self.items():
             self.write(item)
+        self.writer.close()
 
-    def items(self):
+    def journal_issns(self, data):
+        jissns = set()
+        if data.print_issn:
+            jissns.add(data.print_issn)
+        if data.electronic_issn:
+            jissns.add(data.electronic_issn)
+        jissns.add(data.scielo_issn)
+
+        return sorted(jissns)
+
+    def _fmt_journal(self, data):
+
+        return self.fmt_csv(data, self.get_doaj_journal(self.journal_issns(data)))
+
+    def journals(self):
 
         if not self.issns:
             self.issns = [None]
 
         for issn in self.issns:
             for data in self._articlemeta.journals(collection=self.collection, issn=issn):
-                jissns = set()
-                if data.print_issn:
-                    jissns.add(data.print_issn)
-                if data.electronic_issn:
-                    jissns.add(data.print_issn)
-                jissns.add(data.scielo_issn)
-                in_doaj = self.get_doaj_journal(list(jissns))
-                yield self.fmt_csv(data, in_doaj)
+                yield data
+
+    def items(self):
+        pool = ThreadPool(self.workers)
+
+        try:
+            for item in pool.imap(self._fmt_journal, self.journals()):
+                yield item
+        finally:
+            pool.close()
+            pool.join()
 
     def fmt_csv(self, data, in_doaj):
 
@@ -147,9 +229,7 @@ class Dumper(object):
             in_doaj.get('active', "")
         ]
 
-        joined_line = ','.join(['"%s"' % i.replace('"', '""') for i in line])
-
-        return joined_line
+        return line
 
 def main():
 
@@ -175,6 +255,44 @@ def main():
         help='File to receive the dumped data'
     )
 
+    parser.add_argument(
+        '--workers',
+        '-w',
+        type=int,
+        default=WORKERS,
+        help='Number of concurrent DOAJ lookups'
+    )
+
+    parser.add_argument(
+        '--timeout',
+        '-t',
+        type=float,
+        default=TIMEOUT,
+        help='DOAJ API request timeout in seconds'
+    )
+
+    parser.add_argument(
+        '--attempts',
+        '-a',
+        type=int,
+        default=ATTEMPTS,
+        help='Max attempts per DOAJ API request'
+    )
+
+    parser.add_argument(
+        '--source',
+        '-s',
+        default=None,
+        help='Read ArticleMeta records from a local snapshot, ex: snapshot:/path/to/scl.db'
+    )
+
+    parser.add_argument(
+        '--shard',
+        type=utils.parse_shard,
+        default=None,
+        help='Process only the journals of partition K of N (stable hash of the ISSN SciELO), ex: 2/4'
+    )
+
     parser.add_argument(
         '--logging_file',
         '-o',
@@ -197,6 +315,7 @@ def main():
     if len(args.issns) > 0:
         issns = utils.ckeck_given_issns(args.issns)
 
-    dumper = Dumper(args.collection, issns)
+    dumper = Dumper(args.collection, issns, workers=args.workers,
+                    timeout=args.timeout, attempts=args.attempts, source=args.source, shard=args.shard)
 
     dumper.run()
@@ -7,6 +7,7 @@ import argparse
 import logging
 import codecs
 import json
+import threading
 import requests
 from io import BytesIO, StringIO
 from datetime import datetime, timedelta
@@ -16,9 +17,18 @@ from lxml import etree
 from doaj.articles import Articles
 
 import utils
+from export.doaj_index import DOAJIndex
 
 FROM = datetime.now() - timedelta(days=30)
 FROM = FROM.isoformat()[:10]
+LOOKUP_WORKERS = 4
+FETCH_WORKERS = 4
+UPLOAD_WORKERS = 2
+LOOKUP_RATE = 5
+FETCH_RATE = None
+UPLOAD_RATE = 2
+BATCH_SIZE = 0
+BATCH_BYTES = 10 * 1024 * 1024
 
 DOAJ_XSD = open(os.path.dirname(__file__)+'/xsd/doaj/doajArticles.xsd', 'r').read()
 logger = logging.getLogger(__name__)
@@ -51,10 +61,32 @@ def _config_logging(logging_level='INFO', logging_file=None):
     return logger
 
 
+def merge_records(xmls):
+    """
+    Agrupa os elementos <record> de vários XML no formato DOAJ em um único
+    documento <records>.
+    """
+    records = etree.Element('records')
+
+    for xml in xmls:
+        if not isinstance(xml, bytes):
+            xml = xml.encode('utf-8')
+        root = etree.parse(BytesIO(xml)).getroot()
+        if root.tag == 'records':
+            records.extend(list(root))
+        else:
+            records.append(root)
+
+    return etree.ElementTree(records)
+
+
 class Dumper(object):
 
     def __init__(self, collection, issns=None, output_file=None, from_date=FROM, 
-        user=None, password=None, api_token=None):
+        user=None, password=None, api_token=None, lookup_workers=LOOKUP_WORKERS,
+        fetch_workers=FETCH_WORKERS, upload_workers=UPLOAD_WORKERS,
+        lookup_rate=LOOKUP_RATE, fetch_rate=FETCH_RATE, upload_rate=UPLOAD_RATE,
+        batch_size=BATCH_SIZE, batch_bytes=BATCH_BYTES, doaj_index=None):
 
         self._articlemeta = utils.articlemeta_server()
         self.collection = collection
@@ -62,6 +94,22 @@ class Dumper(object):
         self.user = user
         self.password = password
         self.issns = issns or [None]
+        self.lookup_workers = lookup_workers
+        self.fetch_workers = fetch_workers
+        self.upload_workers = upload_workers
+        self._lookup_limiter = utils.RateLimiter(lookup_rate)
+        self._fetch_limiter = utils.RateLimiter(fetch_rate)
+        self._upload_limiter = utils.RateLimiter(upload_rate)
+        self._session_lock = threading.Lock()
+        self._local = threading.local()
+        self._main_thread = threading.current_thread()
+        self.batch_size = batch_size
+        self.batch_bytes = batch_bytes
+        self._batch = []
+        self._batch_length = 0
+        self._batch_lock = threading.Lock()
+        self._batch_count = 0
+        self.doaj_index = DOAJIndex(doaj_index) if doaj_index else None
         self.session = self.authenticated_session()
         self.parse_schema()
         self.doaj_articles = Articles(usertoken=api_token)
@@ -85,6 +133,7 @@ class Dumper(object):
 
         result = []
 
+        self._lookup_limiter.wait()
         try:
             result = [i for i in self.doaj_articles.search(query)]
         except:
@@ -98,6 +147,7 @@ class Dumper(object):
         query = 'doi:%s' % (doi)
 
         result = []
+        self._lookup_limiter.wait()
         try:
             result = [i for i in self.doaj_articles.search(query)]
         except:
@@ -106,8 +156,28 @@ class Dumper(object):
         if len(result) == 1:
             return result[0].get('id', None)
 
+    def _doaj_id_by_index(self, document):
+        journal = document.journal
+
+        doaj_id = None
+        if document.original_title():
+            doaj_id = self.doaj_index.doaj_id_by_meta(
+                [journal.scielo_issn, journal.print_issn, journal.electronic_issn],
+                document.publication_date[0:4],
+                document.original_title()
+            )
+
+        if doaj_id:
+            return doaj_id
+
+        if document.doi:
+            return self.doaj_index.doaj_id_by_doi(document.doi)
+
     def _doaj_id(self, document):
 
+        if self.doaj_index:
+            return self._doaj_id_by_index(document)
+
         doaj_id = None
 
         if document.original_title():
@@ -135,6 +205,21 @@ class Dumper(object):
 
         self.doaj_schema = sch
 
+    def _schema(self):
+        """
+        Os objetos XMLSchema do lxml não devem ser compartilhados entre
+        threads, cada thread de validação mantém a sua própria cópia.
+        """
+
+        if threading.current_thread() is self._main_thread:
+            return self.doaj_schema
+
+        if not hasattr(self._local, 'schema'):
+            self._local.schema = etree.XMLSchema(
+                etree.parse(BytesIO(DOAJ_XSD.encode('utf-8'))))
+
+        return self._local.schema
+
     def authenticated_session(self):
         auth_url = 'https://doaj.org/account/login'
         login = {'username': self.user, 'password': self.password}
@@ -158,7 +243,7 @@ class Dumper(object):
 
         return session
 
-    def xml_is_valid(self, xml):
+    def xml_is_valid(self, xml, well_formed_only=False):
 
         try:
             xml = StringIO(xml)
@@ -169,8 +254,11 @@ class Dumper(object):
             logger.error('Fail to parse XML')
             return False
 
+        if well_formed_only:
+            return True
+
         try:
-            result = self.doaj_schema.assertValid(xml_doc)
+            result = self._schema().assertValid(xml_doc)
             logger.debug('XML is valid')
             return True
         except Exception as e:
@@ -178,11 +266,30 @@ class Dumper(object):
             logger.error('Fail to parse XML')
             return False
 
+    def reauthenticate(self, stale_session):
+        """
+        Renova a sessão autenticada compartilhada entre as threads de envio.
+        Apenas a primeira thread que detectar a sessão expirada realiza o
+        login, as demais reutilizam a nova sessão.
+        """
+
+        with self._session_lock:
+            if self.session is stale_session:
+                self.session = self.authenticated_session()
+
+            return self.session
+
     def send_xml(self, file_name, file_data):
         files = {'file': (file_name, file_data)}
+        session = self.session
 
+        if not session:
+            logger.error('Document not Sent, there is no authenticated session')
+            return False
+
+        self._upload_limiter.wait()
         try:
-            response = self.session.post(
+            response = session.post(
                 'https://doaj.org/publisher/uploadfile',
                 data={'schema': 'doaj'},
                 files=files
@@ -195,14 +302,134 @@ class Dumper(object):
             logger.info('Document Sent')
             return True
         else:
-            self.authenticated_session()
+            self.reauthenticate(session)
             logger.error('Document not Sent: %s' % response.status_code)
             return False
 
-    def run(self):
-        if not self.session:
+    def lookup(self, document):
+        """
+        Estágio de identificação: descarta documentos já disponíveis no DOAJ.
+        """
+        logger.info('Reading document: %s_%s' % (document.publisher_id, document.collection_acronym))
+
+        if document.data.get('doaj_id', None):
+            logger.debug('Document already available in DOAJ: %s_%s' % (document.publisher_id, document.collection_acronym))
+            return None
+
+        doaj_id = self._doaj_id(document)
+
+        if doaj_id:
+            logger.debug('Document already available in DOAJ, setting id on Article Meta for: %s_%s' % (document.publisher_id, document.collection_acronym))
+            self._articlemeta.set_doaj_id(document.publisher_id, document.collection_acronym, doaj_id)
             return None
 
+        return document
+
+    def fetch(self, document):
+        """
+        Estágio de obtenção e validação do XML no formato DOAJ.
+        """
+        self._fetch_limiter.wait()
+        try:
+            xml = self._articlemeta.document(document.publisher_id, document.collection_acronym, fmt='xmldoaj')
+        except Exception as e:
+            logger.exception(e)
+            logger.error('Fail to read document: %s_%s' % (document.publisher_id, document.collection_acronym))
+            xml = u''
+
+        # No modo em lote a validação pelo schema é feita uma única vez sobre
+        # o documento agrupado.
+        if not self.xml_is_valid(xml, well_formed_only=bool(self.batch_size)):
+            logger.error('Fail to parse xml document: %s_%s' % (document.publisher_id, document.collection_acronym))
+            return None
+
+        filename = '%s_%s.xml' % (document.publisher_id, document.collection_acronym)
+
+        return (filename, xml)
+
+    def upload(self, item):
+        """
+        Estágio de envio do XML para o DOAJ.
+        """
+        filename, xml = item
+        logger.info('Sending document: %s' % filename)
+        self.send_xml(filename, xml)
+
+    def batch_upload(self, item):
+        """
+        Estágio de envio em lote: acumula os registros até atingir
+        ``batch_size`` registros ou ``batch_bytes`` bytes (UTF-8). O lote é
+        enviado antes de incluir um registro que excederia ``batch_bytes``.
+        """
+        filename, xml = item
+        size = len(xml if isinstance(xml, bytes) else xml.encode('utf-8'))
+        batches = []
+
+        with self._batch_lock:
+            if self._batch and self._batch_length + size > self.batch_bytes:
+                batches.append(self.pop_batch())
+            self._batch.append((filename, xml))
+            self._batch_length += size
+            if len(self._batch) >= self.batch_size or self._batch_length >= self.batch_bytes:
+                batches.append(self.pop_batch())
+
+        for number, batch in batches:
+            self.send_batch(batch, number)
+
+    def pop_batch(self):
+        """
+        Retorna o número e os registros do lote corrente e inicia um novo
+        lote. Deve ser chamado com ``_batch_lock``.
+        """
+        batch = self._batch
+        self._batch = []
+        self._batch_length = 0
+        self._batch_count += 1
+
+        return self._batch_count, batch
+
+    def send_batch(self, batch, number):
+        """
+        Valida o documento agrupado contra o schema do DOAJ e o envia em uma
+        única requisição. Caso o agrupamento seja inválido, os registros são
+        validados individualmente e apenas os válidos são reenviados.
+        """
+        if not batch:
+            return
+
+        filename = '%s_%s_%d.xml' % (
+            self.collection, datetime.now().strftime('%Y%m%d%H%M%S'), number)
+
+        try:
+            merged = merge_records([xml for name, xml in batch])
+        except Exception as e:
+            logger.exception(e)
+            logger.error('Fail to merge batch: %s' % filename)
+            merged = None
+
+        if merged is not None and self._schema().validate(merged):
+            logger.info('Sending batch: %s (%d documents)' % (filename, len(batch)))
+            self.send_xml(filename, etree.tostring(
+                merged, encoding='utf-8', xml_declaration=True))
+            return
+
+        logger.warning('Invalid batch, validating documents one by one: %s' % filename)
+        valid = []
+        for name, xml in batch:
+            if self.xml_is_valid(xml):
+                valid.append((name, xml))
+                continue
+            logger.error('Fail to parse xml document: %s' % name)
+
+        if len(valid) < len(batch):
+            self.send_batch(valid, number)
+            return
+
+        for name, xml in valid:
+            self.send_xml(name, xml)
+
+    def documents(self):
+
         extra_filter = json.dumps(
             {
                 'doaj_id': {'$exists': 0}
@@ -213,34 +440,27 @@ class Dumper(object):
             for document in self._articlemeta.documents(
                     collection=self.collection, issn=issn,
                     from_date=self.from_date, extra_filter=extra_filter):
-                logger.info('Reading document: %s_%s' % (document.publisher_id, document.collection_acronym))
-
-                if document.data.get('doaj_id', None):
-                    logger.debug('Document already available in DOAJ: %s_%s' % (document.publisher_id, document.collection_acronym))
-                    continue
-
-                doaj_id = self._doaj_id(document)
-
-                if doaj_id:
-                    logger.debug('Document already available in DOAJ, setting id on Article Meta for: %s_%s' % (document.publisher_id, document.collection_acronym))
-                    self._articlemeta.set_doaj_id(document.publisher_id, document.collection_acronym, doaj_id)
-                    continue
+                yield document
 
-                try:
-                    xml = self._articlemeta.document(document.publisher_id, document.collection_acronym, fmt='xmldoaj')
-                except Exception as e:
-                    logger.exception(e)
-                    logger.error('Fail to read document: %s_%s' % (document.publisher_id, document.collection_acronym))
-                    xml = u''
+    def run(self):
+        if not self.session:
+            return None
 
-                if not self.xml_is_valid(xml):
-                    logger.error('Fail to parse xml document: %s_%s' % (document.publisher_id, document.collection_acronym))
-                    continue
+        upload = self.batch_upload if self.batch_size else self.upload
 
-                logger.info('Sending document: %s_%s' % (document.publisher_id, document.collection_acronym))
-                filename = '%s_%s.xml' % (document.publisher_id, document.collection_acronym)
+        utils.run_pipeline(
+            self.documents(),
+            [
+                ('lookup', self.lookup, self.lookup_workers),
+                ('fetch', self.fetch, self.fetch_workers),
+                ('upload', upload, self.upload_workers)
+            ]
+        )
 
-                self.send_xml(filename, xml)
+        if self.batch_size:
+            with self._batch_lock:
+                number, batch = self.pop_batch()
+            self.send_batch(batch, number)
 
 
 def main():
@@ -289,6 +509,69 @@ def main():
         help='ISO date like %s' % FROM
     )
 
+    parser.add_argument(
+        '--lookup_workers',
+        type=int,
+        default=LOOKUP_WORKERS,
+        help='Number of threads querying the DOAJ search API'
+    )
+
+    parser.add_argument(
+        '--fetch_workers',
+        type=int,
+        default=FETCH_WORKERS,
+        help='Number of threads fetching and validating XML from ArticleMeta'
+    )
+
+    parser.add_argument(
+        '--upload_workers',
+        type=int,
+        default=UPLOAD_WORKERS,
+        help='Number of threads uploading XML to DOAJ'
+    )
+
+    parser.add_argument(
+        '--lookup_rate',
+        type=float,
+        default=LOOKUP_RATE,
+        help='Max DOAJ search requests per second, 0 to disable'
+    )
+
+    parser.add_argument(
+        '--fetch_rate',
+        type=float,
+        default=FETCH_RATE,
+        help='Max ArticleMeta requests per second, 0 to disable'
+    )
+
+    parser.add_argument(
+        '--upload_rate',
+        type=float,
+        default=UPLOAD_RATE,
+        help='Max DOAJ uploads per second, 0 to disable'
+    )
+
+    parser.add_argument(
+        '--doaj_index',
+        default=None,
+        help='Full path to a local DOAJ index (see processing_export_doaj_index) used instead of the DOAJ search API'
+    )
+
+    parser.add_argument(
+        '--batch_size',
+        '-b',
+        type=int,
+        default=BATCH_SIZE,
+        help='Number of documents sent per upload, 0 to send one document per upload'
+    )
+
+    parser.add_argument(
+        '--batch_bytes',
+        type=int,
+        default=BATCH_BYTES,
+        help='Max size in bytes of each batch upload'
+    )
+
     parser.add_argument(
         '--logging_file',
         '-o',
@@ -323,6 +606,10 @@ def main():
 
     dumper = Dumper(
         args.collection, issns, from_date=args.from_date, user=args.user,
-        password=args.password)
+        password=args.password, lookup_workers=args.lookup_workers,
+        fetch_workers=args.fetch_workers, upload_workers=args.upload_workers,
+        lookup_rate=args.lookup_rate, fetch_rate=args.fetch_rate,
+        upload_rate=args.upload_rate, batch_size=args.batch_size,
+        batch_bytes=args.batch_bytes, doaj_index=args.doaj_index)
 
     dumper.run()
@@ -7,8 +7,8 @@ Formato de saída:
 """
 import argparse
 import logging
-import codecs
 
+import output
 import utils
 
 logger = logging.getLogger(__name__)
@@ -43,14 +43,14 @@ def _config_logging(logging_level='INFO', logging_file=None):
 
 class Dumper(object):
 
-    def __init__(self, collection, issns=None, output_file=None):
+    def __init__(self, collection, issns=None, output_file=None, source=None, shard=None):
 
         self._ratchet = utils.ratchet_server()
-        self._articlemeta = utils.articlemeta_server()
+        self._articlemeta = utils.articlemeta_server(source, shard)
         self._publicationstats = utils.publicationstats_server()
         self.collection = collection
         self.issns = issns
-        self.output_file = codecs.open(output_file, 'w', encoding='utf-8') if output_file else output_file
+        self.writer = output.CSVWriter(output_file)
         header = [
             u"Título do Periódico (publication_title)",
             u"ISSN impresso (print_identifier)",
@@ -80,7 +80,7 @@ class Dumper(object):
 
         ]
 
-        self.write(u','.join([u'"%s"' % i.replace(u'"', u'""') for i in header]))
+        self.write(header)
 
     def _first_included_document_by_journal(self, issn, collection):
 
@@ -113,14 +113,12 @@ class Dumper(object):
         return document
 
     def write(self, line):
-        if not self.output_file:
-            print(line.encode('utf-8'))
-        else:
-            self.output_file.write('%s\r\n' % line)
+        self.writer.write(line)
 
     def run(self):
         for item in self.items():
             self.write(item)
+        self.writer.close()
 
     def items(self):
 
@@ -172,9 +170,7 @@ class Dumper(object):
         line.append('')  # preceding_publication_title_id
         line.append('F')  # access_type
 
-        joined_line = ','.join(['"%s"' % i.replace('"', '""') for i in line])
-
-        return joined_line
+        return line
 
 
 def main():
@@ -201,6 +197,20 @@ def main():
         help='File to receive the dumped data'
     )
 
+    parser.add_argument(
+        '--source',
+        '-s',
+        default=None,
+        help='Read ArticleMeta records from a local snapshot, ex: snapshot:/path/to/scl.db'
+    )
+
+    parser.add_argument(
+        '--shard',
+        type=utils.parse_shard,
+        default=None,
+        help='Process only the journals of partition K of N (stable hash of the ISSN SciELO), ex: 2/4'
+    )
+
     parser.add_argument(
         '--logging_file',
         '-o',
@@ -223,6 +233,6 @@ def main():
     if len(args.issns) > 0:
         issns = utils.ckeck_given_issns(args.issns)
 
-    dumper = Dumper(args.collection, issns, args.output_file)
+    dumper = Dumper(args.collection, issns, args.output_file, source=args.source, shard=args.shard)
 
     dumper.run()
@@ -3,6 +3,9 @@
 Este processamento realiza a geração de chaves naturais dos artigos para fins de
 de teste de exportação dos XML para o SciELO Manager.
 
+Os documentos são lidos, formatados e gravados um a um, a memória utilizada
+não depende do tamanho da coleção.
+
 Formato de saída:
 "pid","issn scielo","volume","número","first page","last page","e-location"
 """
@@ -10,16 +13,32 @@ Formato de saída:
 import os
 import argparse
 import logging
-import codecs
 import json
 
 from io import StringIO
 
-from legendarium.urlegendarium import URLegendarium
+import matchkeys
+import output
 import utils
 
 logger = logging.getLogger(__name__)
 
+# campos de Dumper.fields no formato json
+FIELDS = [
+    'collection_acronym',
+    'publisher_id',
+    'journal_title',
+    'journal_acronym',
+    'volume',
+    'number',
+    'supplement',
+    'publication_year',
+    'first_page',
+    'first_page_seq',
+    'last_page',
+    'elocation'
+]
+
 
 def _config_logging(logging_level='INFO', logging_file=None):
 
@@ -50,40 +69,51 @@ def _config_logging(logging_level='INFO', logging_file=None):
 
 class Dumper(object):
 
-    def __init__(self, collection, issns=None, output_file=None):
+    # partes opcionais dos documentos utilizadas (ver projection)
+    DOCUMENT_FIELDS = []
+
+    def __init__(self, collection, issns=None, output_file=None, source=None, shard=None):
 
-        self._articlemeta = utils.articlemeta_server()
+        self._articlemeta = utils.articlemeta_server(source, shard)
         self.collection = collection
         self.issns = issns or [None]
-        self.output_file = codecs.open(output_file, 'w', encoding='utf-8') if output_file else output_file
+        self.writer = output.CSVWriter(output_file)
 
     def write(self, line):
-        if not self.output_file:
-            print(line.encode('utf-8'))
-        else:
-            self.output_file.write('%s\r\n' % line)
+        self.writer.write(line)
+
+    def fields(self, data):
+        """
+        Campos do documento na ordem do csv, lidos uma única vez do xylose
+        (as propriedades do xylose são recalculadas a cada acesso).
+        """
+        journal = data.journal
+        issue = data.issue
+
+        return [
+            data.collection_acronym,
+            data.publisher_id,
+            journal.title,
+            journal.acronym,
+            issue.volume,
+            issue.number,
+            (issue.supplement_volume or '') + (issue.supplement_number or ''),
+            data.publication_date[:4],
+            data.start_page or '',
+            data.start_page_sequence or '',
+            data.end_page or '',
+            data.elocation or ''
+        ]
 
     def fmt_json(self, data):
 
-        item = {
-            'collection_acronym': data.collection_acronym,
-            'publisher_id': data.publisher_id,
-            'journal_title': data.journal.title,
-            'journal_acronym': data.journal.acronym,
-            'volume': data.issue.volume,
-            'number': data.issue.number,
-            'supplement': (data.issue.supplement_volume or '') + (data.issue.supplement_number or ''),
-            'publication_year': data.publication_date[:4],
-            'first_page': data.start_page or '',
-            'first_page_seq': data.start_page_sequence or '',
-            'last_page': data.end_page or '',
-            'elocation': data.elocation or '',
-            'doi': data.doi or '',
-            'order': data.internal_sequence_id or ''
-        }
+        line = self.fields(data)
+        item = dict(zip(FIELDS, line))
+        item['doi'] = data.doi or ''
+        item['order'] = data.internal_sequence_id or ''
 
         # legendarium natural_url
-        natural_url = URLegendarium(
+        natural_url = matchkeys.url_article(
             item['journal_acronym'],
             item['publication_year'],
             item['volume'],
@@ -95,7 +125,7 @@ class Dumper(object):
             item['supplement'],
             item['doi'],
             item['order']
-        ).url_article
+        )
 
         natural_key = self.build_key([
             item['journal_acronym'],
@@ -116,53 +146,36 @@ class Dumper(object):
 
     def fmt_csv(self, data):
 
-        line = [
-            data.collection_acronym,
-            data.publisher_id,
-            data.journal.title,
-            data.journal.acronym,
-            data.issue.volume,
-            data.issue.number,
-            (data.issue.supplement_volume or '') + (data.issue.supplement_number or ''),
-            data.publication_date[:4],
-            data.start_page or '',
-            data.start_page_sequence or '',
-            data.end_page or '',
-            data.elocation or ''
-        ]
+        line = self.fields(data)
 
         # legendarium natural_url
-        natural_url = URLegendarium(
-            data.journal.acronym,
-            data.publication_date[:4],
-            data.issue.volume,
-            data.issue.number,
-            data.start_page or '',
-            data.start_page_sequence or '',
-            data.end_page or '',
-            data.elocation or '',
-            (data.issue.supplement_volume or '') + (data.issue.supplement_number or ''),
-        ).url_article
+        natural_url = matchkeys.url_article(
+            line[3],
+            line[7],
+            line[4],
+            line[5],
+            line[8],
+            line[9],
+            line[10],
+            line[11],
+            line[6],
+        )
 
         natural_key = self.build_key(line[3:])
 
         line.append(natural_key)
         line.append(natural_url)
 
-        joined_line = ','.join(['"%s"' % i.replace('"', '""') for i in line])
-
-        return joined_line
+        return line
 
     def build_key(self, data):
 
-        values = (i for i in data)
-        text_values = (value if value else 'none' for value in values)
-        joined_values = '_'.join(text_values)
-
-        return utils.slugify(joined_values)
-
-    def run(self, output_fmt='json'):
+        return utils.slugify('_'.join([value or 'none' for value in data]))
 
+    def set_format(self, output_fmt='json'):
+        """
+        Define o formato de saída, o cabeçalho é gravado apenas no formato csv.
+        """
         if output_fmt == 'csv':
             header = [
                 u"coleção",
@@ -180,23 +193,33 @@ class Dumper(object):
                 u"chave natural",
                 u"url natural"
             ]
-            self.write(
-                u','.join([u'"%s"' % i.replace(u'"', u'""') for i in header])
-            )
-
-        if output_fmt == 'csv':
-            output_fmt = self.fmt_csv
+            self.write(header)
+            self.fmt = self.fmt_csv
         else:
-            output_fmt = self.fmt_json
+            self.fmt = self.fmt_json
+
+    def document_lines(self, document):
+        """
+        Linhas de saída de um documento.
+        """
+        return [self.fmt(document)]
+
+    def run(self, output_fmt='json'):
+
+        self.set_format(output_fmt)
 
         for issn in self.issns:
             for document in self._articlemeta.documents(
-                collection=self.collection, issn=issn
+                collection=self.collection, issn=issn,
+                fields=self.DOCUMENT_FIELDS
             ):
 
                 logger.debug('Reading document: %s' % document.publisher_id)
 
-                self.write(output_fmt(document))
+                for line in self.document_lines(document):
+                    self.write(line)
+
+        self.writer.close()
 
 
 def main():
@@ -231,6 +254,20 @@ def main():
         help='File to receive the dumped data'
     )
 
+    parser.add_argument(
+        '--source',
+        '-s',
+        default=None,
+        help='Read ArticleMeta records from a local snapshot, ex: snapshot:/path/to/scl.db'
+    )
+
+    parser.add_argument(
+        '--shard',
+        type=utils.parse_shard,
+        default=None,
+        help='Process only the journals of partition K of N (stable hash of the ISSN SciELO), ex: 2/4'
+    )
+
     parser.add_argument(
         '--logging_file',
         '-o',
@@ -253,6 +290,6 @@ def main():
     if len(args.issns) > 0:
         issns = utils.ckeck_given_issns(args.issns)
 
-    dumper = Dumper(args.collection, issns, args.output_file)
+    dumper = Dumper(args.collection, issns, args.output_file, source=args.source, shard=args.shard)
 
     dumper.run(args.format)
@@ -1,12 +1,14 @@
 # coding: utf-8
 """
 Este processamento gera uma tabulação de afiliações para normalização.
+Os documentos são lidos, formatados e gravados um a um, a memória utilizada
+não depende do tamanho da coleção.
 Formato de saída:
 "coleção","PID","ano de publicação","tipo de documento","título","número","normalizado","id de afiliação","instituição original","paises original","instituição normalizada","país normalizado ISO-3661","código de país normalizado ISO-3166","estado normalizado ISO-3166","código de estado normalizado ISO-3166"
 """
 import argparse
 import logging
-import codecs
+import output
 import utils
 from choices import ISO_3166_COUNTRY_AS_KEY
 
@@ -41,10 +43,13 @@ def _config_logging(logging_level='INFO', logging_file=None):
 
 class Dumper(object):
 
-    def __init__(self, collection, issns=None, output_file=None, not_normalized=True):
+    # partes opcionais dos documentos utilizadas (ver projection)
+    DOCUMENT_FIELDS = ['affiliations']
+
+    def __init__(self, collection, issns=None, output_file=None, not_normalized=True, source=None, shard=None):
 
         self._ratchet = utils.ratchet_server()
-        self._articlemeta = utils.articlemeta_server()
+        self._articlemeta = utils.articlemeta_server(source, shard)
         self.collection = collection
         self.issns = issns
         self.output_file = output_file
@@ -57,20 +62,11 @@ class Dumper(object):
         if not self.issns:
             self.issns = [None]
 
-        if not self.output_file:
-            print('%s\r\n' % ','.join(header))
-            for issn in self.issns:
-                for data in self.get_data(issn=issn):
-                    for item in self.fmt_csv(data):
-                        print(item)
-            exit()
-
-        with codecs.open(self.output_file, 'w', encoding='utf-8') as f:
-            f.write('%s\r\n' % ','.join(header))
+        with output.CSVWriter(self.output_file) as writer:
+            writer.writerow(header)
             for issn in self.issns:
                 for data in self.get_data(issn=issn):
-                    for item in self.fmt_csv(data):
-                        f.write('%s\r\n' % item)
+                    writer.writerows(self.fmt_csv(data))
 
     def fmt_csv(self, data):
 
@@ -87,23 +83,29 @@ class Dumper(object):
             issue_label
         ]
 
-        if len(data.mixed_affiliations) == 0:
-            joined_line = ','.join(['"%s"' % i.replace('"', '""') for i in line+['0']])
-            yield joined_line
-
+        # data.mixed_affiliations lê novamente as afiliações originais e
+        # normalizadas a cada acesso, o status é obtido dos índices. Assim
+        # como em mixed_affiliations, as afiliações são agrupadas por índice:
+        # um índice repetido produz uma única linha, com os dados da última
+        # afiliação (original e normalizada) com esse índice, e afiliações
+        # normalizadas sem original correspondente são ignoradas.
         original_aff = {aff['index']:aff for aff in data.affiliations or []}
         normalized_aff = {aff['index']:aff for aff in data.normalized_affiliations or []}
 
-        for mx_aff in data.mixed_affiliations:
+        if len(original_aff) == 0:
+            yield line+['0']
+
+        for index, original in original_aff.items():
             aff_line = []
 
-            status = '1' if mx_aff['normalized'] else '0'
+            status = '1' if index in normalized_aff else '0'
 
-            normalized_institution = normalized_aff.get(mx_aff['index'], {}).get('institution', '')
-            normalized_country = normalized_aff.get(mx_aff['index'], {}).get('country', '')
-            normalized_state = normalized_aff.get(mx_aff['index'], {}).get('state', '')
-            original_institution = original_aff.get(mx_aff['index'], {}).get('institution', '')
-            original_country = original_aff.get(mx_aff['index'], {}).get('country', '')
+            normalized = normalized_aff.get(index, {})
+            normalized_institution = normalized.get('institution', '')
+            normalized_country = normalized.get('country', '')
+            normalized_state = normalized.get('state', '')
+            original_institution = original.get('institution', '')
+            original_country = original.get('country', '')
 
             if normalized_institution == '' or normalized_country == '' or ISO_3166_COUNTRY_AS_KEY.get(normalized_country, '') == '':
                 status = '0'
@@ -113,7 +115,7 @@ class Dumper(object):
 
             aff_line = [
                 status,
-                mx_aff['index'],
+                index,
                 original_institution,
                 original_country,
                 normalized_institution,
@@ -122,11 +124,10 @@ class Dumper(object):
                 normalized_state
             ]
 
-            joined_line = ','.join(['"%s"' % i.replace('"', '""') for i in line+aff_line])
-            yield joined_line
+            yield line+aff_line
 
     def get_data(self, issn):
-        for document in self._articlemeta.documents(collection=self.collection, issn=issn):
+        for document in self._articlemeta.documents(collection=self.collection, issn=issn, fields=self.DOCUMENT_FIELDS):
             logger.debug('Reading document: %s' % document.publisher_id)
             yield document
 
@@ -162,6 +163,20 @@ def main():
         help='File to receive the dumped data'
     )
 
+    parser.add_argument(
+        '--source',
+        '-s',
+        default=None,
+        help='Read ArticleMeta records from a local snapshot, ex: snapshot:/path/to/scl.db'
+    )
+
+    parser.add_argument(
+        '--shard',
+        type=utils.parse_shard,
+        default=None,
+        help='Process only the journals of partition K of N (stable hash of the ISSN SciELO), ex: 2/4'
+    )
+
     parser.add_argument(
         '--logging_file',
         '-o',
@@ -184,6 +199,6 @@ def main():
     if len(args.issns) > 0:
         issns = utils.ckeck_given_issns(args.issns)
 
-    dumper = Dumper(args.collection, issns, args.output_file, args.not_normalized)
+    dumper = Dumper(args.collection, issns, args.output_file, args.not_normalized, source=args.source, shard=args.shard)
 
     dumper.run()
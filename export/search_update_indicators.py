@@ -0,0 +1,246 @@
+# coding: utf-8
+"""
+Este processamento atualiza os indicadores de acessos e citações recebidas dos
+documentos no índice do search.scielo.org.
+
+Os totais de acessos são obtidos do AccessStats em uma única consulta agregada
+por periódico e os totais de citações do relatório pré-produzido do Citedby.
+Apenas os valores alterados desde a última execução são enviados ao Solr, os
+valores enviados são registrados em um snapshot local.
+"""
+import argparse
+import logging
+import sqlite3
+
+import utils
+from clients.search import Search, BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FILE = 'search_indicators.db'
+
+
+def _config_logging(logging_level='INFO', logging_file=None):
+
+    allowed_levels = {
+        'DEBUG': logging.DEBUG,
+        'INFO': logging.INFO,
+        'WARNING': logging.WARNING,
+        'ERROR': logging.ERROR,
+        'CRITICAL': logging.CRITICAL
+    }
+
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    logger.setLevel(allowed_levels.get(logging_level, 'INFO'))
+
+    if logging_file:
+        hl = logging.FileHandler(logging_file, mode='a')
+    else:
+        hl = logging.StreamHandler()
+
+    hl.setFormatter(formatter)
+    hl.setLevel(allowed_levels.get(logging_level, 'INFO'))
+
+    logger.addHandler(hl)
+
+    return logger
+
+
+def search_doc_id(pid, collection):
+    """
+    input:
+        'S0021-25712009000400007', 'spa'
+    output:
+        'S0021-25712009000400007-spa'
+    """
+    return '%s-%s' % (pid, collection)
+
+
+def _zeroed(indicators):
+    """
+    Indicadores com os valores ausentes como '0'.
+    """
+    return tuple(value or '0' for value in indicators)
+
+
+class IndicatorsSnapshot(object):
+    """
+    Registro local dos últimos indicadores enviados ao índice para cada
+    documento.
+    """
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS indicators '
+            '(id TEXT PRIMARY KEY, citations TEXT, accesses TEXT)'
+        )
+
+    def get(self, doc_id):
+        row = self.connection.execute(
+            'SELECT citations, accesses FROM indicators WHERE id = ?', (doc_id,)
+        ).fetchone()
+
+        return tuple(row) if row else None
+
+    def update(self, docs):
+        """
+        Recebe os documentos de um lote enviado ao Solr.
+        """
+        for doc in docs:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO indicators (id, citations, accesses) VALUES (?, ?, ?)',
+                (
+                    doc['id'],
+                    doc.get('total_received', {}).get('set', None),
+                    doc.get('total_access', {}).get('set', None)
+                )
+            )
+
+        self.connection.commit()
+
+
+class Dumper(object):
+
+    def __init__(self, collection, issns=None, snapshot_file=SNAPSHOT_FILE,
+                 batch_size=BATCH_SIZE, citedby_rpc_fallback=False, source=None, shard=None):
+
+        self._articlemeta = utils.articlemeta_server(source, shard)
+        self._accessstats = utils.accessstats_server()
+        self._citedby = utils.citedby_server()
+        self.collection = collection
+        self.issns = issns or [None]
+        self.citedby_rpc_fallback = citedby_rpc_fallback
+        self.snapshot = IndicatorsSnapshot(snapshot_file)
+        self._search = Search(batch_size=batch_size, on_flush=self.snapshot.update)
+
+    def changed_indicators(self, journal):
+        """
+        Produz (doc_id, citações, acessos) para os documentos do periódico
+        cujos indicadores diferem dos registrados no snapshot.
+        """
+        pids = [
+            i.code for i in self._articlemeta.documents(
+                collection=self.collection, issn=journal.scielo_issn,
+                only_identifiers=True)
+        ]
+
+        accesses = self._accessstats.documents_access_total(
+            journal.scielo_issn, self.collection)
+        citations = self._citedby.citations_received(
+            pids, rpc_fallback=self.citedby_rpc_fallback)
+
+        for pid in pids:
+            doc_id = search_doc_id(pid, self.collection)
+            current = (
+                str(citations[pid]) if citations.get(pid) else None,
+                str(accesses[pid]) if accesses.get(pid) else None
+            )
+            previous = self.snapshot.get(doc_id) or (None, None)
+
+            if _zeroed(current) == _zeroed(previous):
+                continue
+
+            # os indicadores que deixaram de existir são zerados no índice
+            current = tuple(
+                '0' if value is None and old not in (None, '0') else value
+                for value, old in zip(current, previous)
+            )
+
+            yield (doc_id, current[0], current[1])
+
+    def run(self):
+        count = 0
+
+        for issn in self.issns:
+            for journal in self._articlemeta.journals(collection=self.collection, issn=issn):
+                logger.info('Reading journal: %s' % journal.scielo_issn)
+                for doc_id, citations, accesses in self.changed_indicators(journal):
+                    self._search.update_document_indicators(doc_id, citations, accesses)
+                    count += 1
+
+        self._search.deploy()
+        logger.info('%d documents with changed indicators' % count)
+
+
+def main():
+
+    parser = argparse.ArgumentParser(
+        description='Update accesses and citations indicators at search.scielo.org'
+    )
+
+    parser.add_argument(
+        'issns',
+        nargs='*',
+        help='ISSN\'s separated by spaces'
+    )
+
+    parser.add_argument(
+        '--collection',
+        '-c',
+        help='Collection Acronym'
+    )
+
+    parser.add_argument(
+        '--snapshot_file',
+        default=SNAPSHOT_FILE,
+        help='Full path to the file keeping the last values sent to the index'
+    )
+
+    parser.add_argument(
+        '--batch_size',
+        '-b',
+        type=int,
+        default=BATCH_SIZE,
+        help='Number of documents per update request'
+    )
+
+    parser.add_argument(
+        '--citedby_rpc_fallback',
+        action='store_true',
+        help='Query the Citedby API for documents missing in the citations report'
+    )
+
+    parser.add_argument(
+        '--source',
+        '-s',
+        default=None,
+        help='Read ArticleMeta records from a local snapshot, ex: snapshot:/path/to/scl.db'
+    )
+
+    parser.add_argument(
+        '--shard',
+        type=utils.parse_shard,
+        default=None,
+        help='Process only the journals of partition K of N (stable hash of the ISSN SciELO), ex: 2/4'
+    )
+
+    parser.add_argument(
+        '--logging_file',
+        '-o',
+        help='Full path to the log file'
+    )
+
+    parser.add_argument(
+        '--logging_level',
+        '-l',
+        default='DEBUG',
+        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'],
+        help='Logggin level'
+    )
+
+    args = parser.parse_args()
+    _config_logging(args.logging_level, args.logging_file)
+    logger.info('Updating indicators for: %s' % args.collection)
+
+    issns = None
+    if len(args.issns) > 0:
+        issns = utils.ckeck_given_issns(args.issns)
+
+    dumper = Dumper(
+        args.collection, issns, snapshot_file=args.snapshot_file,
+        batch_size=args.batch_size,
+        citedby_rpc_fallback=args.citedby_rpc_fallback, source=args.source, shard=args.shard)
+
+    dumper.run()
@@ -0,0 +1,244 @@
+# coding: utf-8
+"""
+Instrumentação das chamadas aos serviços remotos (thrift e HTTP).
+
+Para cada serviço e método são registrados o número de chamadas, os erros, o
+histograma de latência e o volume de bytes recebidos.
+
+Variáveis de ambiente:
+    PROCESSING_RPC_SUMMARY: quando definida, imprime o resumo das chamadas
+        na saída de erro ao final do processamento.
+    PROCESSING_RPC_TEXTFILE: caminho do arquivo que receberá as métricas no
+        formato texto do Prometheus (node_exporter textfile collector) ao
+        final do processamento.
+"""
+from __future__ import absolute_import
+import os
+import sys
+import atexit
+import threading
+import time
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+METRIC_PREFIX = 'processing_rpc'
+
+
+class MethodStats(object):
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.payload_bytes = 0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def record(self, seconds, payload_bytes=0, error=False):
+        self.calls += 1
+        self.errors += 1 if error else 0
+        self.seconds += seconds
+        self.payload_bytes += payload_bytes
+        for i, limit in enumerate(LATENCY_BUCKETS):
+            if seconds <= limit:
+                self.buckets[i] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+
+    def quantile(self, q):
+        """
+        Estimativa do quantil pelo limite superior do bucket do histograma.
+        """
+        if not self.calls:
+            return 0
+
+        target = q * self.calls
+        total = 0
+        for limit, count in zip(LATENCY_BUCKETS + (float('inf'),), self.buckets):
+            total += count
+            if total >= target:
+                return limit
+
+
+class RPCStats(object):
+    """
+    Estatísticas das chamadas remotas por (serviço, método), compartilhadas
+    entre threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._methods = {}
+
+    def record(self, service, method, seconds, payload_bytes=0, error=False):
+        with self._lock:
+            stats = self._methods.get((service, method), None)
+            if stats is None:
+                stats = self._methods[(service, method)] = MethodStats()
+            stats.record(seconds, payload_bytes, error)
+
+    def reset(self):
+        with self._lock:
+            self._methods = {}
+
+    def items(self):
+        with self._lock:
+            return sorted(self._methods.items())
+
+    def summary(self):
+        lines = ['%-45s %8s %7s %10s %9s %9s %12s' % (
+            'service.method', 'calls', 'errors', 'seconds', 'p50_ms', 'p95_ms', 'bytes')]
+
+        for (service, method), stats in self.items():
+            lines.append('%-45s %8d %7d %10.3f %9.1f %9.1f %12d' % (
+                '%s.%s' % (service, method), stats.calls, stats.errors,
+                stats.seconds, stats.quantile(0.5) * 1000,
+                stats.quantile(0.95) * 1000, stats.payload_bytes
+            ))
+
+        return '\n'.join(lines)
+
+    def prometheus(self, job=None):
+        """
+        Métricas no formato texto do Prometheus.
+        """
+        job = job or os.path.basename(sys.argv[0] or 'processing')
+
+        def labels(service, method, **extra):
+            items = [('job', job), ('service', service), ('method', method)]
+            items += sorted(extra.items())
+            return '{%s}' % ','.join(['%s="%s"' % (k, v) for k, v in items])
+
+        counters = [
+            ('requests_total', 'Remote calls.', lambda s: s.calls),
+            ('errors_total', 'Remote calls that failed.', lambda s: s.errors),
+            ('payload_bytes_total', 'Bytes received from remote calls.', lambda s: s.payload_bytes),
+        ]
+
+        items = self.items()
+        lines = []
+        for name, description, value in counters:
+            lines.append('# HELP %s_%s %s' % (METRIC_PREFIX, name, description))
+            lines.append('# TYPE %s_%s counter' % (METRIC_PREFIX, name))
+            for (service, method), stats in items:
+                lines.append('%s_%s%s %d' % (
+                    METRIC_PREFIX, name, labels(service, method), value(stats)))
+
+        name = '%s_duration_seconds' % METRIC_PREFIX
+        lines.append('# HELP %s Remote calls latency.' % name)
+        lines.append('# TYPE %s histogram' % name)
+        for (service, method), stats in items:
+            total = 0
+            for limit, count in zip(LATENCY_BUCKETS + ('+Inf',), stats.buckets):
+                total += count
+                lines.append('%s_bucket%s %d' % (
+                    name, labels(service, method, le=limit), total))
+            lines.append('%s_sum%s %f' % (name, labels(service, method), stats.seconds))
+            lines.append('%s_count%s %d' % (name, labels(service, method), stats.calls))
+
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path, job=None):
+        """
+        Grava as métricas em um arquivo temporário e o renomeia, para que o
+        coletor nunca leia um arquivo incompleto.
+        """
+        tmp = '%s.%d.tmp' % (path, os.getpid())
+        with open(tmp, 'w') as f:
+            f.write(self.prometheus(job))
+        os.rename(tmp, path)
+
+
+stats = RPCStats()
+
+
+def payload_size(data):
+    if isinstance(data, (bytes, bytearray)):
+        return len(data)
+
+    try:
+        return len(data.encode('utf-8'))
+    except AttributeError:
+        return 0
+
+
+class Call(object):
+
+    def __init__(self):
+        self.payload_bytes = 0
+        self.error = False
+
+    def result(self, data):
+        self.payload_bytes += payload_size(data)
+
+    def response(self, response):
+        """
+        Registra uma resposta do requests, respostas com status >= 400 são
+        contabilizadas como erro.
+        """
+        if response is None:
+            self.error = True
+            return
+
+        self.payload_bytes += len(response.content or b'')
+        self.error = response.status_code >= 400
+
+
+@contextmanager
+def timer(service, method):
+    """
+    with timer('analytics', 'impact_factor_chart') as call:
+        response = requests.get(url)
+        call.response(response)
+    """
+    call = Call()
+    start = time.time()
+    try:
+        yield call
+    except Exception:
+        call.error = True
+        raise
+    finally:
+        stats.record(service, method, time.time() - start, call.payload_bytes, call.error)
+
+
+class InstrumentedClient(object):
+    """
+    Envolve um cliente thrift registrando cada chamada de método.
+    """
+
+    def __init__(self, client, service):
+        self._client = client
+        self._service = service
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+
+        if not callable(attr) or name.startswith('_') or name == 'close':
+            return attr
+
+        def wrapper(*args, **kwargs):
+            with timer(self._service, name) as call:
+                result = attr(*args, **kwargs)
+                call.result(result)
+
+            return result
+
+        return wrapper
+
+
+def instrument(client, service):
+
+    return InstrumentedClient(client, service)
+
+
+def _dump_at_exit():
+    if os.environ.get('PROCESSING_RPC_SUMMARY', None) and stats.items():
+        sys.stderr.write(stats.summary() + '\n')
+
+    textfile = os.environ.get('PROCESSING_RPC_TEXTFILE', None)
+    if textfile:
+        stats.write_prometheus(textfile)
+
+
+atexit.register(_dump_at_exit)
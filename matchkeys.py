@@ -0,0 +1,189 @@
+# coding: utf-8
+"""
+Chaves derivadas dos metadados dos documentos: a URL natural do legendarium e
+as chaves de correspondência com os acessos registrados no Ratchet.
+
+Os segmentos de periódico e fascículo da URL natural são memorizados por
+(acrônimo, ano, volume, número, suplemento), sendo compartilhados por todos os
+documentos do fascículo. As chaves de correspondência podem ser gravadas no
+snapshot da coleção (processing_snapshot --match_keys), evitando o cálculo nas
+execuções seguintes.
+"""
+from __future__ import absolute_import
+import re
+import logging
+
+from legendarium.urlegendarium import URLegendarium
+
+logger = logging.getLogger(__name__)
+
+REGEX_PDF_PATH = re.compile(r'/pdf.*\.pdf$')
+REGEX_PID = re.compile(r'^S[0-9]{4}-[0-9]{3}[0-9X][0-9]{13}$')
+REGEX_FBPE = re.compile(r'^S[0-9]{4}-[0-9]{3}[0-9X]\([0-9]{2}\)[0-9]{9}$')
+KEY_TYPES = ('pid', 'fbpe', 'doi', 'pdf', 'legendarium')
+ISSUE_CACHE_SIZE = 50000
+
+_issue_urls = {}
+
+
+def issue_url(acron, year_pub, volume, number, suppl_number):
+    """
+    Segmentos de periódico e fascículo da URL natural, ex: 'abcd/2009.v22n3'.
+    Levanta ValueError nos mesmos casos do URLegendarium.
+    """
+    key = (acron, year_pub, volume, number, suppl_number)
+
+    try:
+        url, error = _issue_urls[key]
+    except KeyError:
+        url, error = None, None
+        try:
+            url = URLegendarium(
+                acron=acron,
+                year_pub=year_pub,
+                volume=volume,
+                number=number,
+                suppl_number=suppl_number
+            ).url_issue
+        except ValueError as e:
+            error = e.args[0] if e.args else ''
+
+        if len(_issue_urls) >= ISSUE_CACHE_SIZE:
+            _issue_urls.clear()
+        _issue_urls[key] = (url, error)
+
+    if error is not None:
+        raise ValueError(error)
+
+    return url
+
+
+def url_article(acron='', year_pub='', volume='', number='', fpage='',
+                fpage_sequence='', lpage='', article_id='', suppl_number='',
+                doi='', order=''):
+    """
+    Equivalente a URLegendarium(...).url_article, com os segmentos de
+    periódico e fascículo memorizados.
+    """
+    article = URLegendarium(
+        fpage=fpage,
+        fpage_sequence=fpage_sequence,
+        lpage=lpage,
+        article_id=article_id,
+        doi=doi,
+        order=order
+    ).get_article_seg()
+
+    return u'%s/%s' % (
+        issue_url(acron, year_pub, volume, number, suppl_number), article)
+
+
+def pdf_keys(fulltexts):
+
+    keys = []
+
+    if not 'pdf' in fulltexts:
+        return keys
+
+    for language, url in fulltexts['pdf'].items():
+        path = REGEX_PDF_PATH.search(url)
+        if path:
+            keys.append(path.group().upper())
+
+    return keys
+
+
+def fbpe_key(code):
+    """
+    input:
+        'S0102-67202009000300001'
+    output:
+        'S0102-6720(09)000300001'
+    """
+
+    begin = code[0:10]
+    year = code[12:14]
+    end = code[14:]
+
+    return '%s(%s)%s' % (begin, year, end)
+
+
+def key_type(key):
+    """
+    Tipo de uma chave produzida por eligible_match_keys, um de KEY_TYPES.
+    """
+    if REGEX_PID.match(key):
+        return 'pid'
+
+    if REGEX_FBPE.match(key):
+        return 'fbpe'
+
+    if key.startswith('/PDF') and key.endswith('.PDF'):
+        return 'pdf'
+
+    if key.startswith('/'):
+        return 'legendarium'
+
+    return 'doi'
+
+
+def eligible_match_keys(document):
+
+    keys = []
+    keys.append(document.publisher_id)
+    keys.append(fbpe_key(document.publisher_id))
+    if document.doi:
+        keys.append(document.doi)
+
+    keys += pdf_keys(document.fulltexts())
+
+    issue = document.issue
+    suppl = ''.join([issue.supplement_volume or '', issue.supplement_number or '']).strip()
+
+    try:
+        url = url_article(
+            acron=document.journal.acronym,
+            year_pub=document.publication_date[:4],
+            volume=issue.volume,
+            number=issue.number,
+            fpage=document.start_page,
+            fpage_sequence=document.start_page_sequence,
+            lpage=document.end_page,
+            article_id=document.elocation,
+            suppl_number=suppl,
+            doi=document.doi,
+            order=issue.order
+        )
+    except ValueError as e:
+        logger.error(
+            'Fail to build legendarium eligible match key for %s_%s',
+            document.collection_acronym, document.publisher_id
+        )
+        logger.exception(e)
+        url = ''
+
+    if url:
+        keys.append(('/%s/' % url).upper())
+
+    return keys
+
+
+class MatchKeys(object):
+    """
+    Chaves de correspondência dos documentos. Quando ``source`` é um snapshot
+    as chaves gravadas para a mesma data de processamento do documento são
+    reutilizadas.
+    """
+
+    def __init__(self, source=None):
+        self._store = source if hasattr(source, 'match_keys') else None
+
+    def keys(self, document):
+        if self._store is not None:
+            keys = self._store.match_keys(
+                document.collection_acronym, document.publisher_id,
+                document.processing_date)
+            if keys is not None:
+                return keys
+
+        return eligible_match_keys(document)
@@ -0,0 +1,140 @@
+# coding: utf-8
+"""
+Este processamento junta as saídas de um processamento executado em partições
+(--shard K/N) em um único arquivo.
+
+Os arquivos são concatenados na ordem informada. O cabeçalho, primeira linha
+de cada arquivo, é gravado uma única vez e deve ser igual em todos os
+arquivos, arquivos vazios são ignorados. Arquivos .gz e .zst são lidos e
+gravados com compressão.
+"""
+from __future__ import absolute_import
+import argparse
+import logging
+import shutil
+
+import output
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def _config_logging(logging_level='INFO', logging_file=None):
+
+    allowed_levels = {
+        'DEBUG': logging.DEBUG,
+        'INFO': logging.INFO,
+        'WARNING': logging.WARNING,
+        'ERROR': logging.ERROR,
+        'CRITICAL': logging.CRITICAL
+    }
+
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    logger.setLevel(allowed_levels.get(logging_level, 'INFO'))
+
+    if logging_file:
+        hl = logging.FileHandler(logging_file, mode='a')
+    else:
+        hl = logging.StreamHandler()
+
+    hl.setFormatter(formatter)
+    hl.setLevel(allowed_levels.get(logging_level, 'INFO'))
+
+    logger.addHandler(hl)
+
+    return logger
+
+
+class LastByte(object):
+    """
+    Repassa as gravações para ``stream`` guardando o último byte gravado.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self.last = None
+
+    def write(self, data):
+        if data:
+            self.last = data[-1:]
+        self._stream.write(data)
+
+
+def merge(input_files, output_file=None, header=True):
+    """
+    Concatena ``input_files`` em ``output_file`` (saída padrão quando não
+    informado). Retorna o número de arquivos lidos.
+    """
+    stream = output.open_output(output_file)
+    target = LastByte(stream)
+    expected_header = None
+
+    try:
+        for input_file in input_files:
+            logger.info('Reading: %s' % input_file)
+            with output.open_input(input_file) as source:
+                if header:
+                    first_line = source.readline()
+                    if not first_line:
+                        continue
+                    if expected_header is None:
+                        expected_header = first_line
+                        target.write(first_line)
+                    elif first_line != expected_header:
+                        raise ValueError('header of %s differs from the header of %s' % (
+                            input_file, input_files[0]))
+
+                shutil.copyfileobj(source, target, CHUNK_SIZE)
+
+            if target.last not in (None, b'\n'):
+                target.write(output.LINE_TERMINATOR.encode('ascii'))
+    finally:
+        output.close_output(stream, output_file)
+
+    return len(input_files)
+
+
+def main():
+
+    parser = argparse.ArgumentParser(
+        description='Merge the outputs of a processing run in shards into a single file'
+    )
+
+    parser.add_argument(
+        'input_files',
+        nargs='+',
+        help='Shard outputs, in the order they must be merged'
+    )
+
+    parser.add_argument(
+        '--output_file',
+        '-r',
+        help='File to receive the merged data'
+    )
+
+    parser.add_argument(
+        '--no_header',
+        action='store_true',
+        help='The inputs have no header line (ex: json lines)'
+    )
+
+    parser.add_argument(
+        '--logging_file',
+        '-o',
+        help='Full path to the log file'
+    )
+
+    parser.add_argument(
+        '--logging_level',
+        '-l',
+        default='DEBUG',
+        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'],
+        help='Logggin level'
+    )
+
+    args = parser.parse_args()
+    _config_logging(args.logging_level, args.logging_file)
+
+    merge(args.input_files, args.output_file, header=not args.no_header)
@@ -0,0 +1,163 @@
+# coding: utf-8
+"""
+Saída dos processamentos.
+
+Os registros são formatados pelo módulo csv (todos os campos entre aspas,
+linhas terminadas em \\r\\n) e gravados em UTF-8 com buffer de escrita. Os
+arquivos terminados em .gz ou .zst são comprimidos durante a gravação
+(zstd depende do pacote zstandard). Sem arquivo de saída os registros são
+gravados na saída padrão.
+"""
+from __future__ import absolute_import
+import io
+import sys
+import csv
+import gzip
+
+PY2 = sys.version_info[0] == 2
+
+BUFFER_SIZE = 1024 * 1024
+LINE_TERMINATOR = '\r\n'
+COMPRESSION_EXTENSIONS = {
+    '.gz': 'gzip',
+    '.zst': 'zstd'
+}
+
+
+def compression_by_extension(output_file):
+    for extension, compression in COMPRESSION_EXTENSIONS.items():
+        if output_file and output_file.endswith(extension):
+            return compression
+
+
+def open_output(output_file=None, compression=None, buffer_size=BUFFER_SIZE):
+    """
+    Retorna um arquivo binário para a gravação da saída.
+    """
+    if not output_file:
+        return getattr(sys.stdout, 'buffer', sys.stdout)
+
+    compression = compression or compression_by_extension(output_file)
+    raw = io.open(output_file, 'wb', buffering=buffer_size)
+
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6)
+
+    if compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raw.close()
+            raise ValueError('zstd compression requires the zstandard package')
+        return zstandard.ZstdCompressor().stream_writer(raw)
+
+    if compression:
+        raw.close()
+        raise ValueError('unknown compression: %s' % compression)
+
+    return raw
+
+
+def close_output(stream, output_file=None):
+    """
+    Fecha o arquivo retornado por open_output, a saída padrão é apenas
+    descarregada.
+    """
+    if not output_file:
+        stream.flush()
+        return
+
+    fileobj = getattr(stream, 'fileobj', None)
+    stream.close()
+    if fileobj is not None:
+        fileobj.close()
+
+
+def open_input(input_file, compression=None):
+    """
+    Retorna um arquivo binário para a leitura de uma saída gravada com
+    open_output.
+    """
+    compression = compression or compression_by_extension(input_file)
+
+    if compression == 'gzip':
+        return gzip.open(input_file, 'rb')
+
+    if compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError('zstd compression requires the zstandard package')
+        return zstandard.ZstdDecompressor().stream_reader(io.open(input_file, 'rb'), closefd=True)
+
+    if compression:
+        raise ValueError('unknown compression: %s' % compression)
+
+    return io.open(input_file, 'rb')
+
+
+class CSVWriter(object):
+
+    def __init__(self, output_file=None, compression=None, buffer_size=BUFFER_SIZE):
+        self.output_file = output_file
+        self._stream = open_output(output_file, compression, buffer_size)
+        self._closed = False
+
+        if PY2:
+            self._text = self._stream
+        else:
+            self._text = io.TextIOWrapper(
+                self._stream, encoding='utf-8', newline='', write_through=False)
+            self._text._CHUNK_SIZE = buffer_size
+
+        self._writer = csv.writer(
+            self._text, quoting=csv.QUOTE_ALL, lineterminator=LINE_TERMINATOR)
+
+    def writerow(self, row):
+        if PY2:
+            row = [i.encode('utf-8') if isinstance(i, unicode) else i for i in row]
+
+        self._writer.writerow(row)
+
+    def writerows(self, rows):
+        for row in rows:
+            self.writerow(row)
+
+    def writeline(self, line):
+        """
+        Grava uma linha já formatada (ex: JSON).
+        """
+        if PY2 and isinstance(line, unicode):
+            line = line.encode('utf-8')
+
+        self._text.write(line + LINE_TERMINATOR)
+
+    def write(self, item):
+        """
+        Listas e tuplas são gravadas como registros CSV, textos como linhas.
+        """
+        if isinstance(item, (list, tuple)):
+            self.writerow(item)
+        else:
+            self.writeline(item)
+
+    def flush(self):
+        self._text.flush()
+
+    def close(self):
+        if self._closed:
+            return
+
+        self._closed = True
+        self.flush()
+
+        if not PY2:
+            self._text.detach()
+
+        close_output(self._stream, self.output_file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,88 @@
+# coding: utf-8
+"""
+Projeção dos registros de documentos do ArticleMeta.
+
+As partes volumosas do registro que poucos processamentos utilizam
+(referências, resumos, afiliações, autores e palavras-chave) são opcionais.
+Cada processamento declara as partes que utiliza (Dumper.DOCUMENT_FIELDS) e
+os documentos são entregues sem as demais, os outros metadados são sempre
+mantidos. ``fields=None`` mantém o registro completo.
+
+Nos snapshots (processing_snapshot) as referências são gravadas à parte e
+lidas apenas quando solicitadas. O ArticleMeta não oferece projeção, os
+registros lidos por thrift são reduzidos após a leitura.
+"""
+from __future__ import absolute_import
+from collections import OrderedDict
+
+# parte opcional: chaves no registro, (chave,) ou (chave, campo)
+DOCUMENT_FIELDS = OrderedDict([
+    ('citations', [('citations',), ('citations_keys',)]),
+    ('abstracts', [('article', 'v83')]),
+    ('affiliations', [('article', 'v70'), ('article', 'v240')]),
+    ('authors', [('article', 'v10'), ('article', 'v11')]),
+    ('keywords', [('article', 'v85')]),
+])
+
+CITATION_KEYS = [i[0] for i in DOCUMENT_FIELDS['citations']]
+
+
+def check_fields(fields):
+    if fields is None:
+        return
+
+    for field in fields:
+        if field not in DOCUMENT_FIELDS:
+            raise ValueError('unknown document field: %s' % field)
+
+
+def project(record, fields=None):
+    """
+    Retorna o registro sem as partes opcionais ausentes de ``fields``. O
+    registro informado não é alterado.
+    """
+    if fields is None:
+        return record
+
+    result = dict(record)
+    article = None
+
+    for field, paths in DOCUMENT_FIELDS.items():
+        if field in fields:
+            continue
+        for path in paths:
+            if len(path) == 1:
+                result.pop(path[0], None)
+                continue
+            if path[1] not in result.get(path[0], {}):
+                continue
+            if article is None:
+                article = result[path[0]] = dict(result[path[0]])
+            article.pop(path[1], None)
+
+    return result
+
+
+def project_document(document, fields=None):
+    """
+    Aplica a projeção ao registro de um documento do xylose.
+    """
+    if fields is not None:
+        document.data = project(document.data, fields)
+
+    return document
+
+
+def merge_fields(fields_list):
+    """
+    Campos que atendem a todos os processamentos, ``None`` quando algum
+    deles utiliza o registro completo.
+    """
+    result = set()
+
+    for fields in fields_list:
+        if fields is None:
+            return None
+        result.update(fields)
+
+    return sorted(result)
@@ -5,11 +5,11 @@ coleção SciELO.
 """
 import argparse
 import logging
-import codecs
-import datetime
 
+import output
 import utils
 import choices
+from document_record import DocumentRecord
 
 logger = logging.getLogger(__name__)
 
@@ -43,13 +43,16 @@ def _config_logging(logging_level='INFO', logging_file=None):
 
 class Dumper(object):
 
-    def __init__(self, collection, issns=None, output_file=None):
+    # partes opcionais dos documentos utilizadas (ver projection)
+    DOCUMENT_FIELDS = ['affiliations']
+
+    def __init__(self, collection, issns=None, output_file=None, source=None, shard=None):
 
         self._ratchet = utils.ratchet_server()
-        self._articlemeta = utils.articlemeta_server()
+        self._articlemeta = utils.articlemeta_server(source, shard)
         self.collection = collection
         self.issns = issns
-        self.output_file = codecs.open(output_file, 'w', encoding='utf-8') if output_file else output_file
+        self.writer = output.CSVWriter(output_file)
         header = []
         header.append(u"extraction date")
         header.append(u"study unit")
@@ -72,22 +75,21 @@ class Dumper(object):
         header.append(u"document affiliation state")
         header.append(u"document affiliation city")
 
-        self.write(u','.join([u'"%s"' % i.replace(u'"', u'""') for i in header]))
-
-    def write(self, lines):
+        self.write(header)
 
-        if isinstance(lines, unicode):
-            lines = [lines]
+    def write(self, line):
+        self.writer.write(line)
 
-        for line in lines:
-            if not self.output_file:
-                print(line.encode('utf-8'))
-            else:
-                self.output_file.write('%s\r\n' % line)
+    def document_lines(self, data):
+        """
+        Linhas de saída de um documento.
+        """
+        return list(self.fmt_csv(data))
 
     def run(self):
         for item in self.items():
             self.write(item)
+        self.writer.close()
         logger.info('Export finished')
 
     def items(self):
@@ -96,51 +98,28 @@ class Dumper(object):
             self.issns = [None]
 
         for issn in self.issns:
-            for data in self._articlemeta.documents(collection=self.collection, issn=issn):
+            for data in self._articlemeta.documents(collection=self.collection, issn=issn, fields=self.DOCUMENT_FIELDS):
                 logger.debug('Reading document: %s' % data.publisher_id)
                 for item in self.fmt_csv(data):
                     yield item
 
-    def join_line(self, line):
-        return ','.join(['"%s"' % i.replace('"', '""') for i in line])
-
     def fmt_csv(self, data):
-        issns = []
-        if data.journal.print_issn:
-            issns.append(data.journal.print_issn)
-        if data.journal.electronic_issn:
-            issns.append(data.journal.electronic_issn)
-
-        line = []
-        line.append(datetime.datetime.now().isoformat()[0:10])
-        line.append(u'document')
-        line.append(data.collection_acronym)
-        line.append(data.journal.scielo_issn)
-        line.append(u';'.join(issns))
-        line.append(data.journal.title)
-        line.append(u';'.join(data.journal.subject_areas or []))
-        for area in choices.THEMATIC_AREAS:
-            if area.lower() in [i.lower() for i in data.journal.subject_areas or []]:
-                line.append(u'1')
-            else:
-                line.append(u'0')
-        line.append('1' if len(data.journal.subject_areas or []) > 2 else '0')
-        line.append(data.journal.current_status)
-        line.append(data.publisher_id)
-        line.append(data.publication_date[0:4])
-        line.append(data.document_type)
-        line.append(u'1' if data.document_type.lower() in choices.CITABLE_DOCUMENT_TYPES else '0')
-        if data.mixed_affiliations:
-            for aff in data.mixed_affiliations:
+        record = DocumentRecord.of(data)
+        data = record.document
+        line = record.columns()
+        line.append(record.document_type)
+        line.append(u'1' if record.citable else '0')
+        if record.mixed_affiliations:
+            for aff in record.mixed_affiliations:
                 aff_line = []
                 aff_line.append(aff.get('institution', '')),
                 aff_line.append(aff.get('country', '')),
                 aff_line.append(aff.get('country_iso_3166', '')),
                 aff_line.append(aff.get('state', '')),
                 aff_line.append(aff.get('city', ''))
-                yield self.join_line(line+aff_line)
+                yield line+aff_line
         else:
-            yield self.join_line(line)
+            yield line
 
 
 def main():
@@ -167,6 +146,20 @@ def main():
         help='File to receive the dumped data'
     )
 
+    parser.add_argument(
+        '--source',
+        '-s',
+        default=None,
+        help='Read ArticleMeta records from a local snapshot, ex: snapshot:/path/to/scl.db'
+    )
+
+    parser.add_argument(
+        '--shard',
+        type=utils.parse_shard,
+        default=None,
+        help='Process only the journals of partition K of N (stable hash of the ISSN SciELO), ex: 2/4'
+    )
+
     parser.add_argument(
         '--logging_file',
         '-o',
@@ -189,6 +182,6 @@ def main():
     if len(args.issns) > 0:
         issns = utils.ckeck_given_issns(args.issns)
 
-    dumper = Dumper(args.collection, issns, args.output_file)
+    dumper = Dumper(args.collection, issns, args.output_file, source=args.source, shard=args.shard)
 
     dumper.run()
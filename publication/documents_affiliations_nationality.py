@@ -5,11 +5,11 @@ da coleção SciELO.
 """
 import argparse
 import logging
-import codecs
-import datetime
 
+import output
 import utils
 import choices
+from document_record import DocumentRecord
 
 logger = logging.getLogger(__name__)
 
@@ -43,14 +43,17 @@ def _config_logging(logging_level='INFO', logging_file=None):
 
 class Dumper(object):
 
-    def __init__(self, home_nationality, collection, issns=None, output_file=None):
+    # partes opcionais dos documentos utilizadas (ver projection)
+    DOCUMENT_FIELDS = ['affiliations']
+
+    def __init__(self, home_nationality, collection, issns=None, output_file=None, source=None, shard=None):
 
         self._ratchet = utils.ratchet_server()
-        self._articlemeta = utils.articlemeta_server()
+        self._articlemeta = utils.articlemeta_server(source, shard)
         self.collection = collection
         self.home_nationality = home_nationality.upper()
         self.issns = issns
-        self.output_file = codecs.open(output_file, 'w', encoding='utf-8') if output_file else output_file
+        self.writer = output.CSVWriter(output_file)
         header = []
         header.append(u"extraction date")
         header.append(u"study unit")
@@ -74,17 +77,21 @@ class Dumper(object):
         header.append(u"undefined")
         header.append(u"empty")
 
-        self.write(u','.join([u'"%s"' % i.replace(u'"', u'""') for i in header]))
+        self.write(header)
 
     def write(self, line):
-        if not self.output_file:
-            print(line.encode('utf-8'))
-        else:
-            self.output_file.write('%s\r\n' % line)
+        self.writer.write(line)
+
+    def document_lines(self, data):
+        """
+        Linhas de saída de um documento.
+        """
+        return [self.fmt_csv(data)]
 
     def run(self):
         for item in self.items():
             self.write(item)
+        self.writer.close()
 
     def items(self):
 
@@ -92,48 +99,28 @@ class Dumper(object):
             self.issns = [None]
 
         for issn in self.issns:
-            for data in self._articlemeta.documents(collection=self.collection, issn=issn):
+            for data in self._articlemeta.documents(collection=self.collection, issn=issn, fields=self.DOCUMENT_FIELDS):
                 logger.debug(u'Reading document: %s' % data.publisher_id)
                 yield self.fmt_csv(data)
 
     def fmt_csv(self, data):
+        record = DocumentRecord.of(data)
+        data = record.document
         know_languages = set([u'pt', u'es', u'en'])
-        languages = set(data.languages())
-
-        issns = []
-        if data.journal.print_issn:
-            issns.append(data.journal.print_issn)
-        if data.journal.electronic_issn:
-            issns.append(data.journal.electronic_issn)
-
-        line = []
-        line.append(datetime.datetime.now().isoformat()[0:10])
-        line.append(u'document')
-        line.append(data.collection_acronym)
-        line.append(data.journal.scielo_issn)
-        line.append(u';'.join(issns))
-        line.append(data.journal.title)
-        line.append(u';'.join(data.journal.subject_areas or []))
-        for area in choices.THEMATIC_AREAS:
-            if area.lower() in [i.lower() for i in data.journal.subject_areas or []]:
-                line.append(u'1')
-            else:
-                line.append(u'0')
-        line.append('1' if len(data.journal.subject_areas or []) > 2 else '0')
-        line.append(data.journal.current_status)
-        line.append(data.publisher_id)
-        line.append(data.publication_date[0:4])
-        line.append(u'1' if data.document_type.lower() in choices.CITABLE_DOCUMENT_TYPES else '0')
-        line.append(data.document_type)
+        languages = set(record.languages())
+
+        line = record.columns()
+        line.append(u'1' if record.citable else '0')
+        line.append(record.document_type)
         line.append(self.home_nationality)
-        line.append(str(len(data.mixed_affiliations)) if data.mixed_affiliations else '0')
+        line.append(str(len(record.mixed_affiliations)) if record.mixed_affiliations else '0')
 
         national = 0
         foreign = 0
         undefined = 0
         empty = 0
-        if data.mixed_affiliations:
-            for aff in data.mixed_affiliations:
+        if record.mixed_affiliations:
+            for aff in record.mixed_affiliations:
                 aff_value = aff.get('country_iso_3166', '').upper()
 
                 if aff_value == '':
@@ -157,9 +144,7 @@ class Dumper(object):
         line.append(str(undefined))
         line.append(str(empty))
 
-        joined_line = ','.join(['"%s"' % i.replace('"', '""') for i in line])
-
-        return joined_line
+        return line
 
 
 def main():
@@ -193,6 +178,20 @@ def main():
         help='File to receive the dumped data'
     )
 
+    parser.add_argument(
+        '--source',
+        '-s',
+        default=None,
+        help='Read ArticleMeta records from a local snapshot, ex: snapshot:/path/to/scl.db'
+    )
+
+    parser.add_argument(
+        '--shard',
+        type=utils.parse_shard,
+        default=None,
+        help='Process only the journals of partition K of N (stable hash of the ISSN SciELO), ex: 2/4'
+    )
+
     parser.add_argument(
         '--logging_file',
         '-o',
@@ -215,6 +214,6 @@ def main():
     if len(args.issns) > 0:
         issns = utils.ckeck_given_issns(args.issns)
 
-    dumper = Dumper(args.home_nationality, args.collection, issns, args.output_file)
+    dumper = Dumper(args.home_nationality, args.collection, issns, args.output_file, source=args.source, shard=args.shard)
 
     dumper.run()
@@ -6,11 +6,11 @@ elementos do artigo: total de autores, total de citações, total de páginas
 
 import argparse
 import logging
-import codecs
-import datetime
 
+import output
 import utils
 import choices
+from document_record import DocumentRecord
 
 logger = logging.getLogger(__name__)
 
@@ -57,13 +57,16 @@ def pages(first, last):
 
 class Dumper(object):
 
-    def __init__(self, collection, issns=None, output_file=None):
+    # partes opcionais dos documentos utilizadas (ver projection)
+    DOCUMENT_FIELDS = ['citations', 'authors']
+
+    def __init__(self, collection, issns=None, output_file=None, source=None, shard=None):
 
         self._ratchet = utils.ratchet_server()
-        self._articlemeta = utils.articlemeta_server()
+        self._articlemeta = utils.articlemeta_server(source, shard)
         self.collection = collection
         self.issns = issns
-        self.output_file = codecs.open(output_file, 'w', encoding='utf-8') if output_file else output_file
+        self.writer = output.CSVWriter(output_file)
         header = []
         header.append(u"extraction date")
         header.append(u"study unit")
@@ -91,17 +94,21 @@ class Dumper(object):
         header.append(u"pages")
         header.append(u"references")
 
-        self.write(u','.join([u'"%s"' % i.replace(u'"', u'""') for i in header]))
+        self.write(header)
 
     def write(self, line):
-        if not self.output_file:
-            print(line.encode('utf-8'))
-        else:
-            self.output_file.write('%s\r\n' % line)
+        self.writer.write(line)
+
+    def document_lines(self, data):
+        """
+        Linhas de saída de um documento.
+        """
+        return [self.fmt_csv(data)]
 
     def run(self):
         for item in self.items():
             self.write(item)
+        self.writer.close()
         logger.info('Export finished')
 
     def items(self):
@@ -110,44 +117,19 @@ class Dumper(object):
             self.issns = [None]
 
         for issn in self.issns:
-            for data in self._articlemeta.documents(collection=self.collection, issn=issn):
+            for data in self._articlemeta.documents(collection=self.collection, issn=issn, fields=self.DOCUMENT_FIELDS):
                 logger.debug('Reading document: %s' % data.publisher_id)
                 yield self.fmt_csv(data)
 
     def fmt_csv(self, data):
-        countries = set()
-
-        if data.normalized_affiliations:
-            countries = set([i['country'].lower() for i in data.normalized_affiliations if 'country' in i and i['country'] != 'undefined'])
-
-        tot_authors = len(data.authors or [])
-
-        issns = []
-        if data.journal.print_issn:
-            issns.append(data.journal.print_issn)
-        if data.journal.electronic_issn:
-            issns.append(data.journal.electronic_issn)
-
-        line = []
-        line.append(datetime.datetime.now().isoformat()[0:10])
-        line.append(u'document')
-        line.append(data.collection_acronym)
-        line.append(data.journal.scielo_issn)
-        line.append(u';'.join(issns))
-        line.append(data.journal.title)
-        line.append(u';'.join(data.journal.subject_areas or []))
-        for area in choices.THEMATIC_AREAS:
-            if area.lower() in [i.lower() for i in data.journal.subject_areas or []]:
-                line.append(u'1')
-            else:
-                line.append(u'0')
-        line.append('1' if len(data.journal.subject_areas or []) > 2 else '0')
-        line.append(data.journal.current_status)
-        line.append(data.publisher_id)
-        line.append(data.publication_date[0:4])
-        line.append(data.document_type)
-        line.append(u'1' if data.document_type.lower() in choices.CITABLE_DOCUMENT_TYPES else '0')
-        line.append(unicode(tot_authors))
+        record = DocumentRecord.of(data)
+        data = record.document
+        tot_authors = len(record.authors or [])
+
+        line = record.columns()
+        line.append(record.document_type)
+        line.append(u'1' if record.citable else '0')
+        line.append(str(tot_authors))
         line.append(u'1' if tot_authors == 0 else u'0')  # total de autores
         line.append(u'1' if tot_authors == 1 else u'0')  # total de autores
         line.append(u'1' if tot_authors == 2 else u'0')  # total de autores
@@ -155,12 +137,10 @@ class Dumper(object):
         line.append(u'1' if tot_authors == 4 else u'0')  # total de autores
         line.append(u'1' if tot_authors == 5 else u'0')  # total de autores
         line.append(u'1' if tot_authors >= 6 else u'0')  # total de autores
-        line.append(unicode(pages(data.start_page, data.end_page))),  # total de páginas
-        line.append(unicode(len(data.citations or [])))  # total de citações
+        line.append(str(pages(data.start_page, data.end_page))),  # total de páginas
+        line.append(str(len(data.citations or [])))  # total de citações
 
-        joined_line = u','.join([u'"%s"' % i.replace(u'"', u'""') for i in line])
-
-        return joined_line
+        return line
 
 
 def main():
@@ -187,6 +167,20 @@ def main():
         help='File to receive the dumped data'
     )
 
+    parser.add_argument(
+        '--source',
+        '-s',
+        default=None,
+        help='Read ArticleMeta records from a local snapshot, ex: snapshot:/path/to/scl.db'
+    )
+
+    parser.add_argument(
+        '--shard',
+        type=utils.parse_shard,
+        default=None,
+        help='Process only the journals of partition K of N (stable hash of the ISSN SciELO), ex: 2/4'
+    )
+
     parser.add_argument(
         '--logging_file',
         '-o',
@@ -209,6 +203,6 @@ def main():
     if len(args.issns) > 0:
         issns = utils.ckeck_given_issns(args.issns)
 
-    dumper = Dumper(args.collection, issns, args.output_file)
+    dumper = Dumper(args.collection, issns, args.output_file, source=args.source, shard=args.shard)
 
     dumper.run()
@@ -5,6 +5,8 @@ import logging
 import codecs
 
 import utils
+import projection
+from document_record import DocumentRecord
 
 from publication import (
     documents_counts,
@@ -49,21 +51,21 @@ def _config_logging(logging_level='INFO', logging_file=None):
 
 class Dumper(object):
 
-    def __init__(self, collection, home_nationality=None, issns=None):
+    def __init__(self, collection, home_nationality=None, issns=None, source=None, shard=None):
 
         self._ratchet = utils.ratchet_server()
-        self._articlemeta = utils.articlemeta_server()
+        self._articlemeta = utils.articlemeta_server(source, shard)
         self.collection = collection
         self.issns = issns
         self.home_nationality = home_nationality
-        self.documents_counts = documents_counts.Dumper(collection, output_file='documents_counts.csv')
-        self.documents_affiliations = documents_affiliations.Dumper(collection, output_file='documents_affiliations.csv')
-        self.documents_languages = documents_languages.Dumper(collection, output_file='documents_languages.csv')
-        self.documents_licenses = documents_licenses.Dumper(collection, output_file='documents_licenses.csv')
-        self.documents_authors = documents_authors.Dumper(collection, output_file='documents_authors.csv')
-        self.documents_dates = documents_dates.Dumper(collection, output_file='documents_dates.csv')
+        self.documents_counts = documents_counts.Dumper(collection, output_file='documents_counts.csv', source=source)
+        self.documents_affiliations = documents_affiliations.Dumper(collection, output_file='documents_affiliations.csv', source=source)
+        self.documents_languages = documents_languages.Dumper(collection, output_file='documents_languages.csv', source=source)
+        self.documents_licenses = documents_licenses.Dumper(collection, output_file='documents_licenses.csv', source=source)
+        self.documents_authors = documents_authors.Dumper(collection, output_file='documents_authors.csv', source=source)
+        self.documents_dates = documents_dates.Dumper(collection, output_file='documents_dates.csv', source=source)
         if self.home_nationality:
-            self.documents_affiliations_nationality = documents_affiliations_nationality.Dumper(home_nationality, collection, output_file='documents_affiliation_nationality.csv')
+            self.documents_affiliations_nationality = documents_affiliations_nationality.Dumper(home_nationality, collection, output_file='documents_affiliation_nationality.csv', source=source)
 
     def run(self):
 
@@ -71,19 +73,42 @@ class Dumper(object):
             self.issns = [None]
 
         for issn in self.issns:
-            for data in self._articlemeta.documents(collection=self.collection, issn=issn):
+            for data in self._articlemeta.documents(
+                    collection=self.collection, issn=issn,
+                    fields=projection.merge_fields([i.DOCUMENT_FIELDS for i in self.dumpers()])):
                 logger.debug('Reading document: %s' % data.publisher_id)
+                data = DocumentRecord(data)
                 self.documents_counts.write(self.documents_counts.fmt_csv(data))
-                self.documents_affiliations.write(self.documents_affiliations.fmt_csv(data))
+                for line in self.documents_affiliations.fmt_csv(data):
+                    self.documents_affiliations.write(line)
                 self.documents_languages.write(self.documents_languages.fmt_csv(data))
                 self.documents_licenses.write(self.documents_licenses.fmt_csv(data))
-                self.documents_authors.write(self.documents_authors.fmt_csv(data))
+                for line in self.documents_authors.fmt_csv(data):
+                    self.documents_authors.write(line)
                 self.documents_dates.write(self.documents_dates.fmt_csv(data))
                 if self.home_nationality:
                     self.documents_affiliations_nationality.write(self.documents_affiliations_nationality.fmt_csv(data))
 
+        for dumper in self.dumpers():
+            dumper.writer.close()
+
         logger.info('Export finished')
 
+    def dumpers(self):
+        dumpers = [
+            self.documents_counts,
+            self.documents_affiliations,
+            self.documents_languages,
+            self.documents_licenses,
+            self.documents_authors,
+            self.documents_dates
+        ]
+
+        if self.home_nationality:
+            dumpers.append(self.documents_affiliations_nationality)
+
+        return dumpers
+
 
 def main():
 
@@ -109,6 +134,20 @@ def main():
         help='ISO 3166 two letters country code which will be considered as the home nationality.'
     )
 
+    parser.add_argument(
+        '--source',
+        '-s',
+        default=None,
+        help='Read ArticleMeta records from a local snapshot, ex: snapshot:/path/to/scl.db'
+    )
+
+    parser.add_argument(
+        '--shard',
+        type=utils.parse_shard,
+        default=None,
+        help='Process only the journals of partition K of N (stable hash of the ISSN SciELO), ex: 2/4'
+    )
+
     parser.add_argument(
         '--logging_file',
         '-o',
@@ -131,6 +170,6 @@ def main():
     if len(args.issns) > 0:
         issns = utils.ckeck_given_issns(args.issns)
 
-    dumper = Dumper(args.collection, home_nationality=args.home_nationality, issns=issns)
+    dumper = Dumper(args.collection, home_nationality=args.home_nationality, issns=issns, source=args.source, shard=args.shard)
 
     dumper.run()
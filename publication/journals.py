@@ -6,9 +6,9 @@ elementos do artigo: total de autores, total de citações, total de páginas
 
 import argparse
 import logging
-import codecs
 import datetime
 
+import output
 import utils
 import choices
 
@@ -63,15 +63,15 @@ def interruption_status(history):
 
 class Dumper(object):
 
-    def __init__(self, collection, issns=None, output_file=None, years=6):
-        self._articlemeta = utils.articlemeta_server()
+    def __init__(self, collection, issns=None, output_file=None, years=6, source=None, shard=None):
+        self._articlemeta = utils.articlemeta_server(source, shard)
         self._publicationstats = utils.publicationstats_server()
         self._analytics = Analytics()
         self.collection = collection
         self.issns = issns
         self._years = years
         self._lines = []
-        self.output_file = codecs.open(output_file, 'w', encoding='utf-8') if output_file else output_file
+        self.writer = output.CSVWriter(output_file)
         now = datetime.date.today().year
         self.years_range = [i for i in range(now, now-self._years, -1)]
         header = []
@@ -124,7 +124,7 @@ class Dumper(object):
         for year in self.years_range:
             header.append(u'google scholar m5 %s ' % year)
 
-        self.write(u','.join([u'"%s"' % i.replace(u'"', u'""') for i in header]))
+        self.write(header)
 
     def _documents_languages_by_year(self, issn, collection, years=None):
 
@@ -200,14 +200,12 @@ class Dumper(object):
         return itens
 
     def write(self, line):
-        if not self.output_file:
-            print(line.encode('utf-8'))
-        else:
-            self.output_file.write('%s\r\n' % line)
+        self.writer.write(line)
 
     def run(self):
         for item in self.items():
             self.write(item)
+        self.writer.close()
         logger.info('Export finished')
 
     def items(self):
@@ -267,7 +265,7 @@ class Dumper(object):
         line.append(last_document.issue.volume or u'' if last_document and last_document.issue else u'')
         line.append(last_document.issue.number or u'' if last_document and last_document.issue else u'')
 
-        line.append(unicode(self._number_of_issues_by_year(
+        line.append(str(self._number_of_issues_by_year(
             data.scielo_issn,
             data.collection_acronym,
             years=0
@@ -281,9 +279,9 @@ class Dumper(object):
         )
 
         for issue in issues:
-            line.append(unicode(issue[1]))
+            line.append(str(issue[1]))
 
-        line.append(unicode(self._number_of_issues_by_year(
+        line.append(str(self._number_of_issues_by_year(
             data.scielo_issn,
             data.collection_acronym,
             years=0,
@@ -299,7 +297,7 @@ class Dumper(object):
         )
 
         for issue in regular_issues:
-            line.append(unicode(issue[1]))
+            line.append(str(issue[1]))
 
         line.append(str(self._number_of_articles_by_year(
             data.scielo_issn,
@@ -314,7 +312,7 @@ class Dumper(object):
         )
 
         for document in documents:
-            line.append(unicode(document[1]))
+            line.append(str(document[1]))
 
         line.append(str(self._number_of_articles_by_year(
             data.scielo_issn,
@@ -331,7 +329,7 @@ class Dumper(object):
         )]
 
         for document in documents:
-            line.append(unicode(document))
+            line.append(str(document))
 
         languages = self._documents_languages_by_year(
             data.scielo_issn,
@@ -340,13 +338,13 @@ class Dumper(object):
         )
 
         for years, values in sorted(languages.items(), reverse=True):
-            line.append(unicode(values['pt']))
+            line.append(str(values['pt']))
         for years, values in sorted(languages.items(), reverse=True):
-            line.append(unicode(values['es']))
+            line.append(str(values['es']))
         for years, values in sorted(languages.items(), reverse=True):
-            line.append(unicode(values['en']))
+            line.append(str(values['en']))
         for years, values in sorted(languages.items(), reverse=True):
-            line.append(unicode(values['other']))
+            line.append(str(values['other']))
 
         for year in self.years_range:
             h5 = h5m5.get(data.scielo_issn, str(year))
@@ -358,9 +356,7 @@ class Dumper(object):
             m5 = m5.get('m5', None) if m5 else None
             line.append(m5 or '')
 
-        joined_line = u','.join([u'"%s"' % i.replace(u'"', u'""') for i in line])
-
-        return joined_line
+        return line
 
 
 def main():
@@ -387,6 +383,20 @@ def main():
         help='File to receive the dumped data'
     )
 
+    parser.add_argument(
+        '--source',
+        '-s',
+        default=None,
+        help='Read ArticleMeta records from a local snapshot, ex: snapshot:/path/to/scl.db'
+    )
+
+    parser.add_argument(
+        '--shard',
+        type=utils.parse_shard,
+        default=None,
+        help='Process only the journals of partition K of N (stable hash of the ISSN SciELO), ex: 2/4'
+    )
+
     parser.add_argument(
         '--logging_file',
         '-o',
@@ -409,6 +419,6 @@ def main():
     if len(args.issns) > 0:
         issns = utils.ckeck_given_issns(args.issns)
 
-    dumper = Dumper(args.collection, issns, args.output_file)
+    dumper = Dumper(args.collection, issns, args.output_file, source=args.source, shard=args.shard)
 
     dumper.run()
@@ -0,0 +1,272 @@
+# coding: utf-8
+"""
+Este processamento produz vários relatórios de documentos com uma única
+leitura dos documentos da coleção no ArticleMeta.
+
+Cada documento lido é entregue aos formatadores de todos os relatórios
+solicitados. O enriquecimento remoto dos relatórios (Ratchet, Citedby) é
+executado em paralelo e a gravação é feita por uma única thread. Cada
+relatório é gravado em <output_dir>/<relatório>.csv, com o mesmo conteúdo do
+processamento correspondente, porém a ordem das linhas pode variar quando
+executado com mais de uma thread.
+"""
+from __future__ import absolute_import
+import os
+import argparse
+import logging
+import importlib
+from collections import OrderedDict
+
+import utils
+import projection
+from document_record import DocumentRecord
+
+logger = logging.getLogger(__name__)
+
+WORKERS = 8
+
+# relatório: módulo com a classe Dumper
+REPORTS = OrderedDict([
+    ('documents_counts', 'publication.documents_counts'),
+    ('documents_affiliations', 'publication.documents_affiliations'),
+    ('documents_affiliations_nationality', 'publication.documents_affiliations_nationality'),
+    ('documents_authors', 'publication.documents_authors'),
+    ('documents_languages', 'publication.documents_languages'),
+    ('documents_licenses', 'publication.documents_licenses'),
+    ('documents_dates', 'publication.documents_dates'),
+    ('citedby_document', 'bibliometric.citedby_document'),
+    ('accesses_dumpdata', 'accesses.dumpdata'),
+    ('natural_keys', 'export.natural_keys'),
+])
+
+COMPRESSION_EXTENSIONS = {
+    'gzip': '.gz',
+    'zstd': '.zst'
+}
+
+
+def _config_logging(logging_level='INFO', logging_file=None):
+
+    allowed_levels = {
+        'DEBUG': logging.DEBUG,
+        'INFO': logging.INFO,
+        'WARNING': logging.WARNING,
+        'ERROR': logging.ERROR,
+        'CRITICAL': logging.CRITICAL
+    }
+
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    logger.setLevel(allowed_levels.get(logging_level, 'INFO'))
+
+    if logging_file:
+        hl = logging.FileHandler(logging_file, mode='a')
+    else:
+        hl = logging.StreamHandler()
+
+    hl.setFormatter(formatter)
+    hl.setLevel(allowed_levels.get(logging_level, 'INFO'))
+
+    logger.addHandler(hl)
+
+    return logger
+
+
+def report_dumper(name, collection, output_file, source=None, home_nationality=None):
+    """
+    Instancia o Dumper do relatório com saída em csv.
+    """
+    module = importlib.import_module(REPORTS[name])
+
+    if name == 'documents_affiliations_nationality':
+        if not home_nationality:
+            raise ValueError('%s requires the home nationality' % name)
+        return module.Dumper(
+            home_nationality, collection, output_file=output_file, source=source)
+
+    dumper = module.Dumper(collection, output_file=output_file, source=source)
+
+    if name == 'natural_keys':
+        dumper.set_format('csv')
+
+    return dumper
+
+
+def report_file(output_dir, name, compression=None):
+
+    return os.path.join(
+        output_dir, '%s.csv%s' % (name, COMPRESSION_EXTENSIONS.get(compression, '')))
+
+
+class Runner(object):
+
+    def __init__(self, collection, reports, issns=None, output_dir='.',
+                 source=None, workers=WORKERS, compression=None,
+                 home_nationality=None, shard=None):
+
+        self._articlemeta = utils.articlemeta_server(source, shard)
+        self.collection = collection
+        self.issns = issns or [None]
+        self.workers = workers
+        self.dumpers = OrderedDict()
+
+        for name in reports:
+            self.dumpers[name] = report_dumper(
+                name, collection, report_file(output_dir, name, compression),
+                source=source, home_nationality=home_nationality)
+
+    def documents(self):
+        fields = projection.merge_fields([
+            getattr(dumper, 'DOCUMENT_FIELDS', None) for dumper in self.dumpers.values()])
+
+        for issn in self.issns:
+            for document in self._articlemeta.documents(
+                    collection=self.collection, issn=issn, fields=fields):
+                logger.debug('Reading document: %s' % document.publisher_id)
+                yield document
+
+    def document_lines(self, document):
+        """
+        Linhas de saída do documento para cada relatório. A falha de um
+        relatório descarta apenas as linhas daquele relatório.
+        """
+        result = []
+
+        # metadados comuns lidos uma única vez para todos os relatórios
+        try:
+            document = DocumentRecord(document)
+        except Exception as e:
+            logger.debug('Fail to read the document record: %s' % e)
+
+        for name, dumper in self.dumpers.items():
+            try:
+                result.append((dumper, dumper.document_lines(document)))
+            except Exception as e:
+                logger.error('Fail to produce %s for: %s', name, document.publisher_id)
+                logger.exception(e)
+
+        return result
+
+    def write(self, result):
+        for dumper, lines in result:
+            for line in lines:
+                dumper.write(line)
+
+    def run(self):
+        try:
+            utils.run_pipeline(self.documents(), [
+                ('document_lines', self.document_lines, self.workers),
+                ('write', self.write, 1)
+            ])
+        finally:
+            for dumper in self.dumpers.values():
+                dumper.writer.close()
+
+        logger.info('Reports finished: %s' % ', '.join(self.dumpers.keys()))
+
+
+def main():
+
+    parser = argparse.ArgumentParser(
+        description='Dump several document reports reading the collection documents once'
+    )
+
+    parser.add_argument(
+        'issns',
+        nargs='*',
+        help='ISSN\'s separated by spaces'
+    )
+
+    parser.add_argument(
+        '--collection',
+        '-c',
+        help='Collection Acronym'
+    )
+
+    parser.add_argument(
+        '--report',
+        '-R',
+        action='append',
+        choices=list(REPORTS.keys()),
+        dest='reports',
+        help='Report to produce, may be given several times, default all'
+    )
+
+    parser.add_argument(
+        '--output_dir',
+        '-d',
+        default='.',
+        help='Directory to receive one <report>.csv file for each report'
+    )
+
+    parser.add_argument(
+        '--compression',
+        choices=list(COMPRESSION_EXTENSIONS.keys()),
+        default=None,
+        help='Compress the output files'
+    )
+
+    parser.add_argument(
+        '--home_nationality',
+        default=None,
+        help='Home country, required by documents_affiliations_nationality'
+    )
+
+    parser.add_argument(
+        '--workers',
+        '-w',
+        type=int,
+        default=WORKERS,
+        help='Number of threads producing the report lines (remote enrichment)'
+    )
+
+    parser.add_argument(
+        '--source',
+        '-s',
+        default=None,
+        help='Read ArticleMeta records from a local snapshot, ex: snapshot:/path/to/scl.db'
+    )
+
+    parser.add_argument(
+        '--shard',
+        type=utils.parse_shard,
+        default=None,
+        help='Process only the journals of partition K of N (stable hash of the ISSN SciELO), ex: 2/4'
+    )
+
+    parser.add_argument(
+        '--logging_file',
+        '-o',
+        help='Full path to the log file'
+    )
+
+    parser.add_argument(
+        '--logging_level',
+        '-l',
+        default='DEBUG',
+        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'],
+        help='Logggin level'
+    )
+
+    args = parser.parse_args()
+    _config_logging(args.logging_level, args.logging_file)
+
+    reports = args.reports or list(REPORTS.keys())
+    if 'documents_affiliations_nationality' in reports and not args.home_nationality:
+        if args.reports:
+            parser.error('documents_affiliations_nationality requires --home_nationality')
+        reports.remove('documents_affiliations_nationality')
+
+    logger.info('Dumping %s for: %s' % (', '.join(reports), args.collection))
+
+    issns = None
+    if len(args.issns) > 0:
+        issns = utils.ckeck_given_issns(args.issns)
+
+    runner = Runner(
+        args.collection, reports, issns, output_dir=args.output_dir,
+        source=args.source, workers=args.workers,
+        compression=args.compression, home_nationality=args.home_nationality,
+        shard=args.shard)
+
+    runner.run()
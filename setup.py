@@ -63,9 +63,15 @@ setup(
     processing_export_crossref=export.crossref:main
     processing_export_doaj=export.exdoaj:main
     processing_export_doaj_journals=export.doaj_journals:main
+    processing_export_doaj_index=export.doaj_index:main
     processing_export_kbart=export.kbart:main
     processing_export_dumparticles=export.dump_articles:main
     processing_export_search_update_indicators=export.search_update_indicators:main
+    processing_snapshot=snapshot.store:main
+    processing_benchmark=benchmarks.run:main
+    processing_benchmark_ratchet=benchmarks.ratchet:main
+    processing_run=runner:main
+    processing_merge=merge:main
     processing_bibliometric_citedby_document=bibliometric.citedby_document:main
     processing_bibliometric_citedby_journal=bibliometric.citedby_journal:main
     processing_bibliometric_impact_factor=bibliometric.impact_factor:main
@@ -0,0 +1,408 @@
+# coding: utf-8
+"""
+Este processamento grava os periódicos e documentos de uma coleção do
+ArticleMeta em um arquivo local (SQLite com registros JSON comprimidos),
+indexado por PID, ISSN e DOI.
+
+Os processamentos que aceitam o parâmetro ``--source snapshot:PATH`` leem os
+registros deste arquivo no lugar do ArticleMeta.
+
+As referências dos documentos são gravadas à parte e lidas apenas quando
+solicitadas (ver projection).
+
+Com ``--match_keys`` as chaves de correspondência de acessos dos documentos
+(ver matchkeys) também são gravadas e reutilizadas por accesses.dumpdata.
+"""
+import argparse
+import logging
+import json
+import sqlite3
+import threading
+import zlib
+from collections import namedtuple
+
+from xylose.scielodocument import Article, Journal
+
+import utils
+from matchkeys import eligible_match_keys
+from projection import project, check_fields, CITATION_KEYS
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_PREFIX = 'snapshot:'
+COMMIT_EVERY = 1000
+FETCH_SIZE = 500
+
+Identifier = namedtuple('Identifier', ['code', 'collection', 'processing_date'])
+
+
+def _config_logging(logging_level='INFO', logging_file=None):
+
+    allowed_levels = {
+        'DEBUG': logging.DEBUG,
+        'INFO': logging.INFO,
+        'WARNING': logging.WARNING,
+        'ERROR': logging.ERROR,
+        'CRITICAL': logging.CRITICAL
+    }
+
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    logger.setLevel(allowed_levels.get(logging_level, 'INFO'))
+
+    if logging_file:
+        hl = logging.FileHandler(logging_file, mode='a')
+    else:
+        hl = logging.StreamHandler()
+
+    hl.setFormatter(formatter)
+    hl.setLevel(allowed_levels.get(logging_level, 'INFO'))
+
+    logger.addHandler(hl)
+
+    return logger
+
+
+def encode(data):
+    return sqlite3.Binary(zlib.compress(json.dumps(data).encode('utf-8')))
+
+
+def decode(data):
+    return json.loads(zlib.decompress(bytes(data)).decode('utf-8'))
+
+
+class SnapshotStore(object):
+    """
+    Armazena os registros brutos do ArticleMeta e os disponibiliza com a
+    mesma interface de leitura do cliente thrift (journals, documents e
+    document), retornando objetos do xylose.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._citations_column = None
+
+    @property
+    def connection(self):
+        if not hasattr(self._local, 'connection'):
+            self._local.connection = sqlite3.connect(self.path)
+
+        return self._local.connection
+
+    def create(self):
+        cursor = self.connection.cursor()
+        cursor.execute(
+            'CREATE TABLE IF NOT EXISTS journals '
+            '(collection TEXT, issn TEXT, data BLOB, PRIMARY KEY (collection, issn))'
+        )
+        cursor.execute(
+            'CREATE TABLE IF NOT EXISTS documents '
+            '(collection TEXT, pid TEXT, issn TEXT, doi TEXT, processing_date TEXT, '
+            'data BLOB, citations BLOB, PRIMARY KEY (collection, pid))'
+        )
+        columns = [i[1] for i in cursor.execute('PRAGMA table_info(documents)')]
+        if 'citations' not in columns:
+            # snapshots anteriores mantêm as referências em data
+            cursor.execute('ALTER TABLE documents ADD COLUMN citations BLOB')
+        self._citations_column = None
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS documents_issn ON documents (collection, issn)'
+        )
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS documents_doi ON documents (doi)'
+        )
+        cursor.execute(
+            'CREATE TABLE IF NOT EXISTS match_keys '
+            '(collection TEXT, pid TEXT, processing_date TEXT, keys TEXT, '
+            'PRIMARY KEY (collection, pid))'
+        )
+        self.connection.commit()
+
+    def add_journal(self, journal):
+        self.connection.execute(
+            'INSERT OR REPLACE INTO journals (collection, issn, data) VALUES (?, ?, ?)',
+            (journal.collection_acronym, journal.scielo_issn, encode(journal.data))
+        )
+
+    def add_document(self, document):
+        data = dict(document.data)
+        citations = dict(
+            (key, data.pop(key)) for key in CITATION_KEYS if key in data)
+
+        self.connection.execute(
+            'INSERT OR REPLACE INTO documents '
+            '(collection, pid, issn, doi, processing_date, data, citations) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (
+                document.collection_acronym,
+                document.publisher_id,
+                document.journal.scielo_issn,
+                (document.doi or '').upper() or None,
+                document.processing_date,
+                encode(data),
+                encode(citations) if citations else None
+            )
+        )
+
+    def _columns(self, fields):
+        if self._citations_column is None:
+            self._citations_column = 'citations' in [
+                i[1] for i in self.connection.execute('PRAGMA table_info(documents)')]
+
+        if self._citations_column and (fields is None or 'citations' in fields):
+            return 'data, citations'
+
+        return 'data, NULL'
+
+    @staticmethod
+    def _article(row, fields):
+        data = decode(row[0])
+        if row[1] is not None:
+            data.update(decode(row[1]))
+
+        return Article(project(data, fields))
+
+    def add_match_keys(self, document, keys):
+        self.connection.execute(
+            'INSERT OR REPLACE INTO match_keys '
+            '(collection, pid, processing_date, keys) VALUES (?, ?, ?, ?)',
+            (
+                document.collection_acronym,
+                document.publisher_id,
+                document.processing_date,
+                json.dumps(keys)
+            )
+        )
+
+    def match_keys(self, collection, pid, processing_date):
+        """
+        Chaves de correspondência gravadas para o documento, ``None`` quando
+        ausentes ou calculadas para outra data de processamento.
+        """
+        try:
+            row = self.connection.execute(
+                'SELECT processing_date, keys FROM match_keys WHERE collection = ? AND pid = ?',
+                (collection, pid)
+            ).fetchone()
+        except sqlite3.OperationalError:
+            return None
+
+        if not row or row[0] != processing_date:
+            return None
+
+        return json.loads(row[1])
+
+    def update_match_keys(self, collection=None):
+        """
+        Calcula as chaves de correspondência dos documentos sem chaves ou com
+        chaves de outra data de processamento.
+        """
+        self.create()
+
+        where, params = self._where([('d.collection = ?', collection)])
+        query = (
+            'SELECT d.collection, d.pid FROM documents d LEFT JOIN match_keys m '
+            'ON m.collection = d.collection AND m.pid = d.pid' + where +
+            (' AND ' if where else ' WHERE ') +
+            '(m.pid IS NULL OR m.processing_date IS NOT d.processing_date)'
+        )
+
+        # os identificadores são lidos antes da gravação das chaves e cada
+        # registro é lido em seguida, a consulta envolve a tabela alterada
+        pending = self.connection.execute(query, params).fetchall()
+
+        count = 0
+        for collection_acronym, pid in pending:
+            row = self.connection.execute(
+                'SELECT data FROM documents WHERE collection = ? AND pid = ?',
+                (collection_acronym, pid)
+            ).fetchone()
+            document = Article(decode(row[0]))
+            try:
+                keys = eligible_match_keys(document)
+            except Exception as e:
+                logger.error('Fail to build match keys for: %s_%s', collection_acronym, pid)
+                logger.exception(e)
+                continue
+            self.add_match_keys(document, keys)
+            count += 1
+            if count % COMMIT_EVERY == 0:
+                self.commit()
+        self.commit()
+
+        logger.info('%d documents with updated match keys' % count)
+
+        return count
+
+    def commit(self):
+        self.connection.commit()
+
+    def build(self, articlemeta, collection, issns=None, from_date=None):
+        """
+        Copia os periódicos e documentos da coleção a partir do ArticleMeta.
+        Com ``from_date`` apenas os documentos processados a partir da data
+        são atualizados.
+        """
+        self.create()
+
+        count = 0
+        for issn in issns or [None]:
+            for journal in articlemeta.journals(collection=collection, issn=issn):
+                logger.info('Reading journal: %s' % journal.scielo_issn)
+                self.add_journal(journal)
+                for document in articlemeta.documents(
+                        collection=collection, issn=journal.scielo_issn,
+                        from_date=from_date):
+                    logger.debug('Reading document: %s' % document.publisher_id)
+                    self.add_document(document)
+                    count += 1
+                    if count % COMMIT_EVERY == 0:
+                        self.commit()
+                self.commit()
+
+        logger.info('%d documents stored' % count)
+
+        return count
+
+    def _rows(self, query, params):
+        cursor = self.connection.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                yield row
+
+    @staticmethod
+    def _where(filters):
+        clauses = [clause for clause, value in filters if value]
+        params = [value for clause, value in filters if value]
+        where = ' WHERE ' + ' AND '.join(clauses) if clauses else ''
+
+        return where, params
+
+    def journals(self, collection=None, issn=None, **kwargs):
+        where, params = self._where([
+            ('collection = ?', collection),
+            ('issn = ?', issn)
+        ])
+
+        for row in self._rows('SELECT data FROM journals' + where, params):
+            yield Journal(decode(row[0]))
+
+    def documents(self, collection=None, issn=None, from_date=None,
+                  until_date=None, only_identifiers=False, fields=None, **kwargs):
+
+        if kwargs.get('extra_filter'):
+            logger.warning('extra_filter is not supported by snapshots and will be ignored')
+
+        check_fields(fields)
+
+        where, params = self._where([
+            ('collection = ?', collection),
+            ('issn = ?', issn),
+            ('processing_date >= ?', from_date),
+            ('processing_date <= ?', until_date)
+        ])
+
+        if only_identifiers:
+            query = 'SELECT pid, collection, processing_date FROM documents' + where
+            for row in self._rows(query, params):
+                yield Identifier(*row)
+            return
+
+        query = 'SELECT %s FROM documents' % self._columns(fields)
+        for row in self._rows(query + where, params):
+            yield self._article(row, fields)
+
+    def document(self, code, collection=None, fmt='xylose', fields=None, **kwargs):
+        """
+        Recupera um documento pelo PID ou pelo DOI. Apenas o formato xylose
+        está disponível nos snapshots.
+        """
+
+        if fmt != 'xylose':
+            logger.error('Format %s is not available in snapshots' % fmt)
+            return None
+
+        where, params = self._where([
+            ('collection = ?', collection),
+            ('(pid = ? OR doi = ?)', code)
+        ])
+        if code:
+            params.append(code.upper())
+
+        row = self.connection.execute(
+            'SELECT %s FROM documents' % self._columns(fields) + where, params).fetchone()
+
+        if not row:
+            logger.info('Document not found for: %s_%s', collection, code)
+            return None
+
+        return self._article(row, fields)
+
+
+def main():
+
+    parser = argparse.ArgumentParser(
+        description='Store a local snapshot of an ArticleMeta collection'
+    )
+
+    parser.add_argument(
+        'snapshot_file',
+        help='Full path to the snapshot file'
+    )
+
+    parser.add_argument(
+        'issns',
+        nargs='*',
+        help='ISSN\'s separated by spaces'
+    )
+
+    parser.add_argument(
+        '--collection',
+        '-c',
+        help='Collection Acronym'
+    )
+
+    parser.add_argument(
+        '--from_date',
+        '-f',
+        default=None,
+        help='Update only documents processed since the given ISO date'
+    )
+
+    parser.add_argument(
+        '--match_keys',
+        action='store_true',
+        help='Also store the accesses match keys of the documents'
+    )
+
+    parser.add_argument(
+        '--logging_file',
+        '-o',
+        help='Full path to the log file'
+    )
+
+    parser.add_argument(
+        '--logging_level',
+        '-l',
+        default='DEBUG',
+        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'],
+        help='Logggin level'
+    )
+
+    args = parser.parse_args()
+    _config_logging(args.logging_level, args.logging_file)
+    logger.info('Storing snapshot for: %s' % args.collection)
+
+    issns = None
+    if len(args.issns) > 0:
+        issns = utils.ckeck_given_issns(args.issns)
+
+    store = SnapshotStore(args.snapshot_file)
+    store.build(utils.articlemeta_server(), args.collection, issns, args.from_date)
+
+    if args.match_keys:
+        store.update_match_keys(args.collection)
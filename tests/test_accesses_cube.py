@@ -0,0 +1,91 @@
+# coding: utf-8
+import os
+import shutil
+import tempfile
+import unittest
+
+from accesses.cube import AccessCube, Axis
+
+
+class AxisTest(unittest.TestCase):
+
+    def test_index(self):
+        axis = Axis()
+
+        self.assertEqual([axis.index(i) for i in ['b', 'a', 'b', 'c']], [0, 1, 0, 2])
+        self.assertEqual(axis.values, ['b', 'a', 'c'])
+        self.assertEqual(len(axis), 3)
+
+
+class AccessCubeTest(unittest.TestCase):
+
+    def cube(self):
+        cube = AccessCube('scl')
+        cube.add('0001-0001', 'Journal 1', '2012', {
+            '2012-01': {'html': 1, 'pdf': 2},
+            '2012-02': {'abstract': 3},
+            '2013-01': {'readcube': 4}
+        })
+        cube.add('0001-0001', 'Journal 1', '2012', {
+            '2012-01-10': {'html': 5},
+            '2012-01-11': {'html': 1}
+        })
+        cube.add('0002-0002', 'Journal 2', '2013', {
+            '2013-05': {'pdf': 7}
+        })
+
+        return cube
+
+    def test_journal_rollup(self):
+
+        self.assertEqual(sorted(self.cube().journal_rollup()), [
+            ('0001-0001', '2012', '2012', [7, 3, 2, 0]),
+            ('0001-0001', '2012', '2013', [0, 0, 0, 4]),
+            ('0002-0002', '2013', '2013', [0, 0, 7, 0]),
+        ])
+
+    def test_collection_rollup(self):
+
+        self.assertEqual(sorted(self.cube().collection_rollup()), [
+            ('2012', '2012', [7, 3, 2, 0]),
+            ('2012', '2013', [0, 0, 0, 4]),
+            ('2013', '2013', [0, 0, 7, 0]),
+        ])
+
+    def test_sparse_cells(self):
+        cube = AccessCube('scl')
+
+        # 100 periódicos, cada um com um ano de publicação e um mês de acesso
+        # distintos, o cubo denso teria 100 x 100 x 100 células
+        for i in range(100):
+            cube.add('%04d-0001' % i, 'Journal', str(1900 + i), {
+                '2000-01-01': {'html': 1}, '%d-01-01' % (1900 + i): {'pdf': 1},
+                '2001-01': {'html': 0}
+            })
+        self.assertEqual(len(cube.cells), 200)
+
+        # os acessos de células existentes não incluem novas células
+        for i in range(100):
+            cube.add('%04d-0001' % i, 'Journal', str(1900 + i), {'2000-01-02': {'html': 1}})
+        self.assertEqual(len(cube.cells), 200)
+        self.assertEqual(list(cube.cells[(0, 0, 0)]), [0, 2, 0, 0])
+
+    def test_write_rollups(self):
+        workdir = tempfile.mkdtemp()
+        try:
+            journals_file = os.path.join(workdir, 'journals.csv')
+            collection_file = os.path.join(workdir, 'collection.csv')
+            self.cube().write_rollups(journals_file, collection_file)
+
+            with open(journals_file) as f:
+                lines = f.read().splitlines()
+            self.assertEqual(len(lines), 4)
+            self.assertTrue(lines[1].endswith(
+                '"journal","scl","0001-0001","Journal 1","2012","2012","7","3","2","0","12"'))
+
+            with open(collection_file) as f:
+                lines = f.read().splitlines()
+            self.assertEqual(len(lines), 4)
+            self.assertTrue(lines[3].endswith('"collection","scl","2013","2013","0","0","7","0","7"'))
+        finally:
+            shutil.rmtree(workdir)
@@ -1,7 +1,10 @@
 # coding: utf-8
+import os
+import tempfile
 import unittest
 
 from accesses import dumpdata
+from thrift.ratchet import load_ratchet_thrift, record_periods, window_record
 from xylose.scielodocument import Article
 
 
@@ -42,7 +45,7 @@ class DumpDataTest(unittest.TestCase):
 
         self.assertEqual(result, 'S0102-6720(09)000300001')
 
-    def test_join_accesses(self):
+    def test_join_periods(self):
         record_1 = {
             "abstract": {
                 "total": 4,
@@ -158,7 +161,9 @@ class DumpDataTest(unittest.TestCase):
 
         data = [record_1, record_2]
 
-        result = dumpdata.join_accesses('S0102-67202009000300001', data, '1500-01-01', '2014-01-01', False)
+        result = dumpdata.join_periods(
+            period for item in data for period in record_periods(
+                window_record({'objects': [item]}, '1500-01-01', '2014-01-01', 'monthly'), 'monthly'))
 
         expected = {
             '2012-01': {
@@ -183,7 +188,7 @@ class DumpDataTest(unittest.TestCase):
         self.assertEqual(sorted(result), sorted(expected))
 
 
-    def test_join_accesses_dayly(self):
+    def test_join_periods_dayly(self):
         record_1 = {
             "abstract": {
                 "total": 4,
@@ -299,7 +304,9 @@ class DumpDataTest(unittest.TestCase):
 
         data = [record_1, record_2]
 
-        result = dumpdata.join_accesses('S0102-67202009000300001', data, '1500-01-01', '2014-01-01', True)
+        result = dumpdata.join_periods(
+            period for item in data for period in record_periods(
+                window_record({'objects': [item]}, '1500-01-01', '2014-01-01', 'daily'), 'daily'))
 
         expected = {
             '2012-01-08': {
@@ -367,3 +374,150 @@ class DumpDataTest(unittest.TestCase):
             }
 
         self.assertEqual(sorted([k+str(v) for k, v in expected.items()]), sorted([k+str(v) for k, v in result.items()]))
+
+    def test_join_metadata_with_accesses_shared_metadata(self):
+
+        from tests.fixtures import articlemeta
+
+        article = Article(articlemeta.document)
+        metadata = dumpdata.document_metadata(article)
+        keys = sorted(metadata.keys())
+
+        first = dumpdata.join_metadata_with_accesses(article, '2012-01', {'html': 1}, metadata)
+        second = dumpdata.join_metadata_with_accesses(article, '2012-02', {'pdf': 2}, metadata)
+
+        self.assertEqual(first, dumpdata.join_metadata_with_accesses(article, '2012-01', {'html': 1}))
+        self.assertEqual(second['access_date'], '2012-02-01T00:00:00')
+        self.assertEqual(second['access_total'], 2)
+        self.assertEqual(sorted(metadata.keys()), keys)
+
+    def test_get_date_timestamp(self):
+
+        self.assertEqual(dumpdata.get_date_timestamp('2012-01'), '2012-01-01T00:00:00')
+        self.assertEqual(dumpdata.get_date_timestamp('2012-01-08'), '2012-01-08T00:00:00')
+        self.assertEqual(dumpdata.get_date_timestamp('2012-01'), '2012-01-01T00:00:00')
+        self.assertEqual(dumpdata.get_date_timestamp('invalid'), 'invalid')
+
+    def test_access_periods(self):
+
+        self.assertEqual(
+            dumpdata.access_periods('2012-11-20', '2013-02-01'),
+            ['2012-11', '2012-12', '2013-01', '2013-02'])
+        self.assertEqual(
+            dumpdata.access_periods('2012-02-28', '2012-03-01', True),
+            ['2012-02-28', '2012-02-29', '2012-03-01'])
+
+    def test_access_periods_partial_dates(self):
+
+        self.assertEqual(
+            dumpdata.access_periods('2012-11', '2013'),
+            ['2012-%02d' % i for i in range(11, 13)] + ['2013-%02d' % i for i in range(1, 13)])
+        self.assertEqual(
+            dumpdata.access_periods('2012', '2012-02', True)[-1], '2012-02-29')
+        self.assertEqual(
+            dumpdata.access_periods('2012-02', '2012-02', True)[0], '2012-02-01')
+
+
+class LayoutTest(unittest.TestCase):
+
+    periods = [
+        ({}, '2012-02', {'html': 3}),
+        ({}, '2012-01', {'abstract': 1, 'readcube': 2}),
+    ]
+
+    def dumper(self, layout):
+        dumper = dumpdata.Dumper.__new__(dumpdata.Dumper)
+        dumper.layout = layout
+        dumper.periods = dumpdata.access_periods('2012-01-01', '2012-03-31')
+        dumper._period_columns = dict(
+            (period, i * 4) for i, period in enumerate(dumper.periods))
+
+        return dumper
+
+    def test_wide_accesses(self):
+        dumper = self.dumper('wide')
+
+        self.assertEqual(dumper.accesses_header()[:5], [
+            u'access to abstract 2012-01', u'access to html 2012-01',
+            u'access to pdf 2012-01', u'access to epdf 2012-01',
+            u'access to abstract 2012-02'])
+        self.assertEqual(len(dumper.accesses_header()), 13)
+        self.assertEqual(
+            dumper.csv_wide_accesses(self.periods),
+            ['1', '0', '0', '2', '0', '3', '0', '0', '0', '0', '0', '0', '6'])
+
+    def test_sparse_accesses(self):
+        dumper = self.dumper('sparse')
+
+        self.assertEqual(dumper.accesses_header(), [
+            u'access to abstract', u'access to html', u'access to pdf',
+            u'access to epdf', u'access total'])
+        self.assertEqual(
+            dumper.csv_sparse_accesses(self.periods),
+            [u'2012-01:1', u'2012-02:3', u'', u'2012-01:2', '6'])
+
+
+class WindowRatchet(object):
+    """
+    Ratchet que restringe os períodos comparando as datas como texto, assim
+    como o servidor, e registra os limites recebidos.
+    """
+
+    def __init__(self, periods):
+        self.periods = periods
+        self.calls = []
+
+    def document_periods(self, code, begin_date, end_date, granularity):
+        self.calls.append((begin_date, end_date, granularity))
+        size = 10 if granularity == 'daily' else 7
+        period_accesses = load_ratchet_thrift().PeriodAccesses
+
+        return [
+            period_accesses(period=period[:size], access_html=count)
+            for period, count in self.periods
+            if begin_date[:size] <= period[:size] <= end_date[:size]
+        ]
+
+
+class PartialDatesTest(unittest.TestCase):
+
+    periods = [('2011-12-31', 1), ('2012-01-01', 2), ('2013-05-31', 4), ('2014-01-01', 8)]
+
+    def dumper(self, from_date, until_date, dayly_granularity=False):
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        dumper = dumpdata.Dumper(
+            'scl', from_date=from_date, until_date=until_date,
+            dayly_granularity=dayly_granularity, output_file=path, layout='wide')
+        dumper.writer.close()
+        dumper._ratchet = WindowRatchet(self.periods)
+
+        return dumper
+
+    def wide_accesses(self, dumper):
+        joined = dumpdata.join_periods(dumper.ratchet_periods('S0102-67202009000300001'))
+
+        return dumper.csv_wide_accesses(
+            [({}, adate, adata) for adate, adata in joined.items()])
+
+    def test_year_bounds(self):
+        dumper = self.dumper('2012', '2013')
+
+        result = self.wide_accesses(dumper)
+
+        self.assertEqual(dumper._ratchet.calls, [('2012-01-01', '2013-12-31', 'monthly')])
+        self.assertEqual(len(result), 24 * 4 + 1)
+        self.assertEqual(result[-1], '6')
+        self.assertEqual(result[1], '2')
+        self.assertEqual(result[(12 + 4) * 4 + 1], '4')
+
+    def test_month_bounds_daily(self):
+        dumper = self.dumper('2013-05', '2013-05', dayly_granularity=True)
+
+        result = self.wide_accesses(dumper)
+
+        self.assertEqual(dumper._ratchet.calls, [('2013-05-01', '2013-05-31', 'daily')])
+        self.assertEqual(len(result), 31 * 4 + 1)
+        self.assertEqual(result[30 * 4 + 1], '4')
+        self.assertEqual(result[-1], '4')
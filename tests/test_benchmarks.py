@@ -0,0 +1,100 @@
+# coding: utf-8
+import os
+import json
+import shutil
+import unittest
+
+from benchmarks import stubs
+from benchmarks.run import Benchmark
+from clients.search import Search
+from thrift.articlemeta import ArticleMeta
+from thrift.accessstats import AccessStats
+
+
+class SyntheticDocumentsTest(unittest.TestCase):
+
+    def test_synthetic_documents(self):
+
+        result = stubs.synthetic_documents(journals=2, documents=3)
+
+        self.assertEqual(len(result), 6)
+        self.assertEqual(len(set([i['code'] for i in result])), 6)
+        self.assertEqual(result[3]['title']['v400'], [{'_': '1001-1001'}])
+
+    def test_aggregations(self):
+
+        dataset = stubs.Dataset.synthetic(journals=1, documents=2)
+        aggs = {
+            'publication_year': {
+                'terms': {'field': 'publication_year'},
+                'aggs': {'access_total': {'sum': {'field': 'access_total'}}}
+            },
+            'pid': {'terms': {'field': 'pid'}}
+        }
+
+        result = stubs.aggregations(aggs, dataset)
+
+        self.assertEqual(len(result['publication_year']['buckets']), stubs.TERMS_SIZE)
+        self.assertEqual(result['publication_year']['buckets'][0]['access_total'], {'value': 2})
+        self.assertEqual([i['key'] for i in result['pid']['buckets']], dataset.pids())
+
+
+class StandInsTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.dataset = stubs.Dataset.synthetic(journals=2, documents=3)
+        cls.servers = stubs.StandIns(cls.dataset).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.servers.stop()
+
+    def setUp(self):
+        self.servers.reset()
+
+    def test_articlemeta_documents(self):
+        client = ArticleMeta(self.servers.settings()['articlemeta_thriftserver'])
+
+        result = [i.publisher_id for i in client.documents(collection='scl', issn='1000-1000')]
+
+        self.assertEqual(result, self.dataset.pids()[:3])
+        self.assertEqual(self.servers.counts()['articlemeta.get_article'], 3)
+
+    def test_accessstats_search(self):
+        client = AccessStats(self.servers.settings()['accessstats_thriftserver'])
+
+        result = client.documents_access_total('1000-1000', 'scl')
+
+        self.assertEqual(sorted(result.keys()), sorted(self.dataset.pids()))
+        self.assertEqual(self.servers.counts(), {'accessstats.search': 1})
+
+    def test_solr_update(self):
+        search = Search(
+            update_endpoint='http://%s/solr/search-scielo/update' % (
+                self.servers.settings()['solr_search_scielo_org']),
+            batch_size=2)
+
+        for pid in self.dataset.pids()[:3]:
+            search.update_document_indicators(pid, '1', '2')
+        search.flush()
+
+        self.assertEqual(self.servers.counts(), {'solr.update': 2, 'solr.documents': 3})
+
+
+class BenchmarkTest(unittest.TestCase):
+
+    def test_run_job(self):
+        benchmark = Benchmark(stubs.Dataset.synthetic(journals=1, documents=2))
+
+        result = list(benchmark.run(['publication_documents_dates']))
+        peak_rss_file = os.path.exists(benchmark.peak_rss_file('publication_documents_dates'))
+        shutil.rmtree(benchmark.workdir)
+
+        self.assertEqual(len(result), 1)
+        self.assertEqual(result[0]['status'], 'ok')
+        self.assertEqual(result[0]['rows'], 3)
+        self.assertEqual(result[0]['rpc']['articlemeta.get_article'], 2)
+        self.assertTrue(result[0]['peak_rss_kb'] > 0)
+        self.assertTrue(peak_rss_file)
+        json.dumps(result)
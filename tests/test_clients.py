@@ -379,4 +379,129 @@ class ThirftClientsTest(unittest.TestCase):
 
         result = accessstats._compute_access_lifetime(query_result)
 
-        self.assertEqual(sorted(expected), result)
\ No newline at end of file
+        self.assertEqual(sorted(expected), result)
+
+    def test_compute_documents_access_total(self):
+        accessstats = accessstats_server()
+
+        query_result = {
+            "hits": {
+                "hits": [],
+                "total": 3020,
+                "max_score": 0
+            },
+            "aggregations": {
+                "pid": {
+                    "buckets": [
+                        {
+                            "access_total": {
+                                "value": 120.0
+                            },
+                            "key": "S0100-879X1998000800006",
+                            "doc_count": 40
+                        },
+                        {
+                            "access_total": {
+                                "value": 3.0
+                            },
+                            "key": "S0100-879X1998000800011",
+                            "doc_count": 2
+                        }
+                    ],
+                    "doc_count_error_upper_bound": 0,
+                    "sum_other_doc_count": 0
+                }
+            }
+        }
+
+        expected = {
+            "S0100-879X1998000800006": 120,
+            "S0100-879X1998000800011": 3
+        }
+
+        result = accessstats._compute_documents_access_total(query_result)
+
+        self.assertEqual(expected, result)
+
+
+class ArticleMetaPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        from benchmarks.stubs import Dataset, ArticleMetaHandler, StubServer
+        from thrift.articlemeta import load_articlemeta_thrift
+
+        dataset = Dataset.synthetic(1, 1)
+        self.servers = [
+            StubServer(load_articlemeta_thrift().ArticleMeta,
+                       ArticleMetaHandler(dataset)).start()
+            for _ in range(2)
+        ]
+
+    def tearDown(self):
+        for server in self.servers:
+            server.stop()
+
+    def test_parse_endpoints(self):
+        from thrift.articlemeta import parse_endpoints
+
+        endpoints = parse_endpoints('am1:11720, am2:11721 am3')
+
+        self.assertEqual(
+            [(i.address, i.port) for i in endpoints],
+            [('am1', 11720), ('am2', 11721), ('am3', 11620)]
+        )
+        with self.assertRaises(ValueError):
+            parse_endpoints(' , ')
+
+    def test_balance_and_reuse_connections(self):
+        from thrift.articlemeta import ArticleMeta
+
+        client = ArticleMeta(','.join([i.address for i in self.servers]))
+
+        for _ in range(6):
+            client.getInterfaceVersion()
+
+        self.assertEqual(
+            [i.handler.counter.counts()['getInterfaceVersion'] for i in self.servers],
+            [3, 3]
+        )
+        self.assertEqual([len(i.idle) for i in client.endpoints], [1, 1])
+        self.assertEqual([i.outstanding for i in client.endpoints], [0, 0])
+
+    def test_eject_unavailable_endpoint(self):
+        from benchmarks.stubs import free_port
+        from thrift.articlemeta import ArticleMeta
+
+        down = '127.0.0.1:%d' % free_port()
+        client = ArticleMeta(
+            '%s,%s' % (down, self.servers[0].address), timeout=500, max_failures=2)
+
+        for _ in range(6):
+            client.getInterfaceVersion()
+
+        self.assertEqual(self.servers[0].handler.counter.counts()['getInterfaceVersion'], 6)
+        self.assertEqual(client.endpoints[0].failures, 2)
+        self.assertGreater(client.endpoints[0].ejected_until, 0)
+
+    def test_readmit_endpoint(self):
+        from thrift.articlemeta import ArticleMeta
+
+        client = ArticleMeta(
+            ','.join([i.address for i in self.servers]), eject_seconds=0)
+        client.endpoints[0].failures = 3
+        client.endpoints[0].ejected_until = 1
+
+        for _ in range(2):
+            client.getInterfaceVersion()
+
+        self.assertEqual(client.endpoints[0].failures, 0)
+        self.assertEqual(client.endpoints[0].ejected_until, 0)
+
+    def test_thriftpy_idl(self):
+        from thrift.articlemeta import ArticleMeta, load_articlemeta_thrift
+
+        client = ArticleMeta(self.servers[0].address)
+
+        self.assertIs(client.ARTICLEMETA_THRIFT, load_articlemeta_thrift())
+        self.assertEqual(
+            client.client.getInterfaceVersion(), load_articlemeta_thrift().VERSION)
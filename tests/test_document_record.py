@@ -0,0 +1,56 @@
+# coding: utf-8
+import unittest
+
+from xylose.scielodocument import Article
+
+import choices
+from document_record import DocumentRecord
+from tests.fixtures import articlemeta
+
+
+class DocumentRecordTest(unittest.TestCase):
+
+    def setUp(self):
+        self.document = Article(articlemeta.document)
+
+    def test_record(self):
+        record = DocumentRecord(self.document)
+
+        self.assertEqual(record.collection, u'scl')
+        self.assertEqual(record.publisher_id, u'S0102-67202009000300001')
+        self.assertEqual(record.scielo_issn, u'0102-6720')
+        self.assertEqual(record.issns, [u'0102-6720'])
+        self.assertEqual(record.subject_areas, [u'Health Sciences'])
+        self.assertEqual(record.publication_year, u'2009')
+        self.assertEqual(record.document_type, u'research-article')
+        self.assertTrue(record.citable)
+        self.assertFalse(record.multidisciplinary)
+        self.assertEqual(
+            record.area_flags,
+            [u'1' if i.lower() == 'health sciences' else u'0' for i in choices.THEMATIC_AREAS])
+        self.assertFalse(hasattr(record, '__dict__'))
+
+    def test_columns(self):
+        columns = DocumentRecord(self.document).columns()
+
+        self.assertEqual(columns[1:7], [
+            u'document', u'scl', u'0102-6720', u'0102-6720',
+            self.document.journal.title, u'Health Sciences'])
+        self.assertEqual(columns[-4:], [u'0', u'current', u'S0102-67202009000300001', u'2009'])
+        self.assertEqual(len(columns), 11 + len(choices.THEMATIC_AREAS))
+
+    def test_document_attributes(self):
+        record = DocumentRecord(self.document)
+
+        self.assertEqual(record.languages(), self.document.languages())
+        self.assertEqual(record.authors, self.document.authors)
+        self.assertEqual(record.original_title(), self.document.original_title())
+        self.assertEqual(record.start_page, self.document.start_page)
+        with self.assertRaises(AttributeError):
+            record.unknown_attribute
+
+    def test_of(self):
+        record = DocumentRecord(self.document)
+
+        self.assertIs(DocumentRecord.of(record), record)
+        self.assertIs(DocumentRecord.of(self.document).document, self.document)
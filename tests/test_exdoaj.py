@@ -0,0 +1,162 @@
+# coding: utf-8
+import threading
+import unittest
+
+from lxml import etree
+
+import utils
+
+try:
+    from export import exdoaj
+except ImportError:
+    exdoaj = None
+
+RECORD = u'<record><journalTitle>Revista</journalTitle><title>%s</title></record>'
+
+
+class FakeResponse(object):
+
+    def __init__(self, text, status_code=200):
+        self.text = text
+        self.status_code = status_code
+
+
+class FakeSession(object):
+
+    def __init__(self, text=u'File uploaded and waiting to be processed'):
+        self.text = text
+        self.uploads = []
+        self._lock = threading.Lock()
+
+    def post(self, url, data=None, files=None):
+        with self._lock:
+            self.uploads.append(files['file'])
+
+        return FakeResponse(self.text)
+
+
+class FakeSchema(object):
+    """
+    Considera inválidos os registros com o título 'invalid'.
+    """
+
+    def validate(self, tree):
+        return 'invalid' not in [i.text for i in tree.getroot().iter('title')]
+
+    def assertValid(self, tree):
+        if not self.validate(tree):
+            raise ValueError('invalid record')
+
+
+def uploaded_titles(upload):
+    name, data = upload
+    if not isinstance(data, bytes):
+        data = data.encode('utf-8')
+
+    return [i.text for i in etree.fromstring(data).iter('title')]
+
+
+@unittest.skipIf(exdoaj is None, 'doaj_client is not installed')
+class ExDOAJTest(unittest.TestCase):
+
+    def dumper(self, batch_size=0, batch_bytes=None):
+        dumper = exdoaj.Dumper.__new__(exdoaj.Dumper)
+        dumper.collection = 'scl'
+        dumper.batch_size = batch_size
+        dumper.batch_bytes = batch_bytes or exdoaj.BATCH_BYTES
+        dumper._batch = []
+        dumper._batch_length = 0
+        dumper._batch_lock = threading.Lock()
+        dumper._batch_count = 0
+        dumper._session_lock = threading.Lock()
+        dumper._upload_limiter = utils.RateLimiter(None)
+        dumper._main_thread = threading.current_thread()
+        dumper._local = threading.local()
+        dumper.doaj_schema = FakeSchema()
+        # o schema do DOAJ importa definições remotas, as threads utilizam o
+        # mesmo schema substituto
+        dumper._schema = lambda: dumper.doaj_schema
+        dumper.session = FakeSession()
+
+        return dumper
+
+    def test_merge_records(self):
+        xmls = [
+            RECORD % u'a',
+            (u'<records>%s%s</records>' % (RECORD % u'b', RECORD % u'c')).encode('utf-8')
+        ]
+
+        result = exdoaj.merge_records(xmls)
+
+        self.assertEqual(result.getroot().tag, 'records')
+        self.assertEqual([i.findtext('title') for i in result.getroot()], [u'a', u'b', u'c'])
+
+    def test_batch_upload_by_size(self):
+        dumper = self.dumper(batch_size=2)
+
+        dumper.batch_upload(('a.xml', RECORD % u'a'))
+        self.assertEqual(dumper.session.uploads, [])
+
+        dumper.batch_upload(('b.xml', RECORD % u'b'))
+
+        self.assertEqual(len(dumper.session.uploads), 1)
+        self.assertTrue(dumper.session.uploads[0][0].endswith('_1.xml'))
+        self.assertEqual(uploaded_titles(dumper.session.uploads[0]), [u'a', u'b'])
+
+    def test_batch_upload_flushes_before_overflow(self):
+        records = [RECORD % u'ação', RECORD % u'eleição', RECORD % u'b']
+        sizes = [len(i.encode('utf-8')) for i in records]
+        # o limite comporta os dois primeiros registros contados em
+        # caracteres, mas não em bytes
+        dumper = self.dumper(batch_size=10, batch_bytes=sizes[0] + sizes[1] - 1)
+
+        for i, xml in enumerate(records):
+            dumper.batch_upload(('%d.xml' % i, xml))
+        number, batch = dumper.pop_batch()
+        dumper.send_batch(batch, number)
+
+        self.assertEqual(
+            [uploaded_titles(i) for i in dumper.session.uploads],
+            [[u'ação'], [u'eleição', u'b']])
+        self.assertEqual(
+            [i[0].rsplit('_', 1)[1] for i in dumper.session.uploads], ['1.xml', '2.xml'])
+
+    def test_batch_numbers_are_unique(self):
+        dumper = self.dumper(batch_size=1)
+        threads = [
+            threading.Thread(
+                target=dumper.batch_upload, args=(('%d.xml' % i, RECORD % i),))
+            for i in range(20)
+        ]
+
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        names = [name for name, data in dumper.session.uploads]
+        self.assertEqual(len(names), 20)
+        self.assertEqual(len(set(names)), 20)
+
+    def test_send_batch_discards_invalid_records(self):
+        dumper = self.dumper(batch_size=10)
+        batch = [('a.xml', RECORD % u'a'), ('x.xml', RECORD % u'invalid'), ('b.xml', RECORD % u'b')]
+
+        dumper.send_batch(batch, 1)
+
+        self.assertEqual(len(dumper.session.uploads), 1)
+        self.assertEqual(uploaded_titles(dumper.session.uploads[0]), [u'a', u'b'])
+
+    def test_send_xml_reauthenticates(self):
+        dumper = self.dumper()
+        stale = dumper.session = FakeSession(text=u'Login required')
+        renewed = FakeSession()
+        dumper.authenticated_session = lambda: renewed
+
+        result = dumper.send_xml('a.xml', RECORD % u'a')
+
+        self.assertFalse(result)
+        self.assertEqual(len(stale.uploads), 1)
+        self.assertIs(dumper.session, renewed)
+        self.assertTrue(dumper.send_xml('a.xml', RECORD % u'a'))
+        self.assertEqual(len(renewed.uploads), 1)
@@ -0,0 +1,136 @@
+# coding: utf-8
+import os
+import json
+import tempfile
+import unittest
+
+from export import doaj_index
+
+
+RECORDS = [
+    {
+        'id': 'doaj1',
+        'bibjson': {
+            'title': u'Análise de <i>dados</i>',
+            'year': '2009',
+            'identifier': [
+                {'type': 'doi', 'id': '10.1590/S0102-67202009000300001'},
+                {'type': 'pissn', 'id': '0102-6720'}
+            ]
+        }
+    },
+    {
+        'id': 'doaj2',
+        'bibjson': {
+            'title': u'Editorial',
+            'year': '2010',
+            'journal': {'issns': ['0102-6720']}
+        }
+    },
+    {
+        'id': 'doaj3',
+        'bibjson': {
+            'title': u'Editorial',
+            'year': '2010',
+            'journal': {'issns': ['0102-6720']}
+        }
+    },
+    {
+        'id': 'doaj4',
+        'bibjson': {
+            'title': u'Estudo clínico: parte 1',
+            'year': '2011',
+            'identifier': [{'type': 'doi', 'id': '10.1590/S0102-67202011000100001'}],
+            'journal': {'issns': ['0102-6720']}
+        }
+    },
+    {
+        'id': 'doaj5',
+        'bibjson': {
+            'title': u'Estudo clínico: parte 2',
+            'year': '2011',
+            'identifier': [{'type': 'doi', 'id': 'https://doi.org/10.1590/S0102-67202011000100001'}],
+            'journal': {'issns': ['0102-6720']}
+        }
+    }
+]
+
+
+class DOAJIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        self.index = doaj_index.DOAJIndex(self.path)
+        self.index.build(RECORDS)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_normalize_doi(self):
+
+        result = doaj_index.normalize_doi('https://doi.org/10.1590/S0102-67202009000300001')
+
+        self.assertEqual(result, '10.1590/s0102-67202009000300001')
+
+    def test_normalize_title(self):
+
+        result = doaj_index.normalize_title(u'Análise  de <i>dados</i>: um estudo')
+
+        self.assertEqual(result, u'analise de dados um estudo')
+
+    def test_normalize_title_keeps_digits(self):
+
+        result = doaj_index.normalize_title(u'Estudo\tclínico: 2ª  parte, 1999')
+
+        self.assertEqual(result, u'estudo clinico 2a parte 1999')
+
+    def test_doaj_id_by_doi(self):
+
+        result = self.index.doaj_id_by_doi('10.1590/s0102-67202009000300001')
+
+        self.assertEqual(result, 'doaj1')
+
+    def test_doaj_id_by_doi_ambiguous(self):
+
+        result = self.index.doaj_id_by_doi('10.1590/S0102-67202011000100001')
+
+        self.assertIsNone(result)
+
+    def test_doaj_id_by_doi_not_found(self):
+
+        result = self.index.doaj_id_by_doi('10.1590/xxx')
+
+        self.assertIsNone(result)
+
+    def test_doaj_id_by_meta(self):
+
+        result = self.index.doaj_id_by_meta(
+            [None, '0102-6720'], '2009', u'ANÁLISE DE DADOS')
+
+        self.assertEqual(result, 'doaj1')
+
+    def test_doaj_id_by_meta_numbered_titles(self):
+
+        result = [
+            self.index.doaj_id_by_meta(['0102-6720'], '2011', u'Estudo clínico: parte %d' % i)
+            for i in [1, 2]
+        ]
+
+        self.assertEqual(result, ['doaj4', 'doaj5'])
+
+    def test_doaj_id_by_meta_ambiguous(self):
+
+        result = self.index.doaj_id_by_meta(['0102-6720'], '2010', u'Editorial')
+
+        self.assertIsNone(result)
+
+    def test_read_dump_json(self):
+        fd, path = tempfile.mkstemp(suffix='.json')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(RECORDS, f)
+
+        result = [i['id'] for i in doaj_index.read_dump(path)]
+        os.remove(path)
+
+        self.assertEqual(result, ['doaj1', 'doaj2', 'doaj3', 'doaj4', 'doaj5'])
@@ -0,0 +1,175 @@
+# coding: utf-8
+import json
+import threading
+import time
+import unittest
+
+import requests
+
+try:
+    from export import doaj_journals
+except ImportError:
+    doaj_journals = None
+
+
+class FakeResponse(object):
+
+    def __init__(self, status_code=200, data=None):
+        self.status_code = status_code
+        self.content = json.dumps(data).encode('utf-8') if data is not None else b'invalid'
+
+    def json(self):
+        return json.loads(self.content.decode('utf-8'))
+
+
+class FakeSession(object):
+    """
+    Responde as requisições na ordem de ``responses``, as exceções são
+    levantadas.
+    """
+
+    def __init__(self, responses=None, data=None):
+        self.responses = list(responses or [])
+        self.data = data or {}
+        self.urls = []
+        self._lock = threading.Lock()
+
+    def get(self, url, timeout=None):
+        with self._lock:
+            self.urls.append(url)
+            response = self.responses.pop(0) if self.responses else None
+
+        if isinstance(response, Exception):
+            raise response
+
+        if response is None:
+            issn = url.rsplit(':', 1)[1]
+            # respostas fora de ordem entre as threads
+            time.sleep(0.01 * (int(issn[-1]) % 3))
+            response = FakeResponse(200, self.data.get(issn, {'results': []}))
+
+        return response
+
+
+class FakeTime(object):
+
+    def __init__(self):
+        self.sleeps = []
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+
+
+class FakeJournal(object):
+
+    def __init__(self, issn, print_issn=None, electronic_issn=None):
+        self.collection_acronym = 'scl'
+        self.scielo_issn = issn
+        self.print_issn = print_issn
+        self.electronic_issn = electronic_issn
+        self.title = 'Journal %s' % issn
+
+
+def doaj_result(doaj_id, active=True):
+
+    return {'results': [{'id': doaj_id, 'bibjson': {'active': active, 'provider': 'SciELO'}}]}
+
+
+@unittest.skipIf(doaj_journals is None, 'doaj_client is not installed')
+class RequestAPITest(unittest.TestCase):
+
+    def setUp(self):
+        self.time = doaj_journals.time
+        doaj_journals.time = FakeTime()
+
+    def tearDown(self):
+        doaj_journals.time = self.time
+
+    def test_retry_with_backoff(self):
+        session = FakeSession([
+            requests.ConnectionError(), FakeResponse(503), FakeResponse(429),
+            FakeResponse(200, {'results': []})
+        ])
+
+        result = doaj_journals.request_api('http://doaj/issn:1', session=session, backoff=1)
+
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(len(session.urls), 4)
+        self.assertEqual(doaj_journals.time.sleeps, [1, 2, 4])
+
+    def test_max_backoff(self):
+        session = FakeSession([FakeResponse(500)] * 10)
+
+        result = doaj_journals.request_api(
+            'http://doaj/issn:1', session=session, attempts=10, backoff=1)
+
+        self.assertIsNone(result)
+        self.assertEqual(len(session.urls), 10)
+        self.assertEqual(
+            doaj_journals.time.sleeps,
+            [1, 2, 4, 8, 16, doaj_journals.MAX_BACKOFF, doaj_journals.MAX_BACKOFF,
+             doaj_journals.MAX_BACKOFF, doaj_journals.MAX_BACKOFF])
+
+    def test_client_error_is_not_retried(self):
+        session = FakeSession([FakeResponse(404), FakeResponse(200)])
+
+        result = doaj_journals.request_api('http://doaj/issn:1', session=session)
+
+        self.assertIsNone(result)
+        self.assertEqual(len(session.urls), 1)
+        self.assertEqual(doaj_journals.time.sleeps, [])
+
+
+@unittest.skipIf(doaj_journals is None, 'doaj_client is not installed')
+class DumperTest(unittest.TestCase):
+
+    def dumper(self, session, journals=None, workers=1):
+        dumper = doaj_journals.Dumper.__new__(doaj_journals.Dumper)
+        dumper.collection = 'scl'
+        dumper.issns = None
+        dumper.workers = workers
+        dumper.timeout = 1
+        dumper.attempts = 1
+        dumper.session = session
+        dumper._cache = {}
+        dumper.journals = lambda: iter(journals or [])
+
+        return dumper
+
+    def test_doaj_journal_by_issn_cache(self):
+        session = FakeSession(data={'0001-0001': doaj_result('a')})
+        dumper = self.dumper(session)
+
+        first = dumper.doaj_journal_by_issn('0001-0001')
+        second = dumper.doaj_journal_by_issn('0001-0001')
+
+        self.assertEqual(first['results'][0]['id'], 'a')
+        self.assertIs(first, second)
+        self.assertEqual(session.urls, [doaj_journals.DOAJ_JOURNAL_API_URL % '0001-0001'])
+
+    def test_doaj_journal_by_issn_cache_failures(self):
+        session = FakeSession([FakeResponse(404)])
+        dumper = self.dumper(session)
+
+        self.assertIsNone(dumper.doaj_journal_by_issn('0001-0001'))
+        self.assertIsNone(dumper.doaj_journal_by_issn('0001-0001'))
+        self.assertEqual(len(session.urls), 1)
+
+    def test_get_doaj_journal(self):
+        session = FakeSession(data={'0001-0002': doaj_result('b', active=False)})
+        dumper = self.dumper(session)
+
+        result = dumper.get_doaj_journal(['0001-0001', '0001-0002'])
+
+        self.assertEqual(result, {'id': 'b', 'provider': 'SciELO', 'active': 'reapplication'})
+
+    def test_items_keep_journal_order(self):
+        journals = [FakeJournal('0001-%04d' % i) for i in range(30)]
+        data = dict(('0001-%04d' % i, doaj_result('id%d' % i)) for i in range(0, 30, 2))
+        dumper = self.dumper(FakeSession(data=data), journals, workers=8)
+
+        result = list(dumper.items())
+
+        self.assertEqual([i[1] for i in result], ['0001-%04d' % i for i in range(30)])
+        self.assertEqual([i[5] for i in result], [
+            'id%d' % i if i % 2 == 0 else '' for i in range(30)])
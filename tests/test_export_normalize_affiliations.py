@@ -0,0 +1,95 @@
+# coding: utf-8
+import copy
+import unittest
+
+from xylose.scielodocument import Article
+
+from export.normalize_affiliations import Dumper
+from tests.fixtures import articlemeta
+
+
+def document(originals, normalized):
+    data = copy.deepcopy(articlemeta.document)
+    data['article']['v70'] = originals
+    data['article']['v240'] = normalized
+
+    return Article(data)
+
+
+def legacy_rows(data):
+    """
+    Status, índice e dados das afiliações segundo data.mixed_affiliations,
+    utilizado antes da leitura das afiliações por índice.
+    """
+    original_aff = dict((aff['index'], aff) for aff in data.affiliations or [])
+    normalized_aff = dict((aff['index'], aff) for aff in data.normalized_affiliations or [])
+
+    rows = []
+    for mx_aff in data.mixed_affiliations:
+        normalized = normalized_aff.get(mx_aff['index'], {})
+        rows.append([
+            '1' if mx_aff['normalized'] else '0',
+            mx_aff['index'],
+            original_aff.get(mx_aff['index'], {}).get('institution', ''),
+            normalized.get('institution', ''),
+            normalized.get('country', '')
+        ])
+
+    return rows
+
+
+class NormalizeAffiliationsTest(unittest.TestCase):
+
+    def dumper(self, not_normalized=False):
+        dumper = Dumper.__new__(Dumper)
+        dumper.not_normalized = not_normalized
+
+        return dumper
+
+    def rows(self, data, not_normalized=False):
+
+        return sorted(
+            [line[6], line[7], line[8], line[10], line[11]]
+            for line in self.dumper(not_normalized).fmt_csv(data)
+        )
+
+    def test_fmt_csv_repeated_indexes(self):
+        data = document([
+            {'_': u'Universidade A', 'i': 'aff1', 'p': 'Brasil'},
+            {'_': u'Universidade B', 'i': 'AFF1', 'p': 'Brasil'},
+            {'_': u'Universidade C', 'i': 'AFF2'},
+            {'_': u'Universidade D'}
+        ], [
+            {'_': u'Universidade de São Paulo', 'i': 'AFF1', 'p': 'BR'},
+            {'_': u'Universidade Estadual Paulista', 'i': 'aff1', 'p': 'BR'},
+            {'_': u'Universidad de Chile', 'i': 'AFF9', 'p': 'CL'}
+        ])
+
+        result = self.rows(data)
+
+        self.assertEqual(result, [
+            ['0', '', u'Universidade D', '', ''],
+            ['0', 'AFF2', u'Universidade C', '', ''],
+            ['1', 'AFF1', u'Universidade B', u'Universidade Estadual Paulista', u'Brazil']
+        ])
+        self.assertEqual(result, sorted(legacy_rows(data)))
+
+    def test_fmt_csv_not_normalized(self):
+        data = document([
+            {'_': u'Universidade A', 'i': 'AFF1'},
+            {'_': u'Universidade C', 'i': 'AFF2'}
+        ], [
+            {'_': u'Universidade de São Paulo', 'i': 'AFF1', 'p': 'BR'},
+        ])
+
+        self.assertEqual(self.rows(data, not_normalized=True), [
+            ['0', 'AFF2', u'Universidade C', '', '']
+        ])
+
+    def test_fmt_csv_without_affiliations(self):
+        data = document([], [{'_': u'Universidade de São Paulo', 'i': 'AFF1', 'p': 'BR'}])
+
+        result = list(self.dumper().fmt_csv(data))
+
+        self.assertEqual(len(result), 1)
+        self.assertEqual(result[0][-1], '0')
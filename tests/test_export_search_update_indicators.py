@@ -0,0 +1,130 @@
+# coding: utf-8
+import os
+import tempfile
+import unittest
+
+from export import search_update_indicators
+
+
+class FakeDocument(object):
+
+    def __init__(self, code):
+        self.code = code
+
+
+class FakeJournal(object):
+
+    scielo_issn = '0001-0001'
+
+
+class FakeArticleMeta(object):
+
+    def __init__(self, pids):
+        self.pids = pids
+
+    def documents(self, collection=None, issn=None, only_identifiers=False):
+        for pid in self.pids:
+            yield FakeDocument(pid)
+
+
+class FakeAccessStats(object):
+
+    def __init__(self, totals):
+        self.totals = totals
+
+    def documents_access_total(self, issn, collection):
+        return self.totals
+
+
+class FakeCitedby(object):
+
+    def __init__(self, totals):
+        self.totals = totals
+
+    def citations_received(self, pids, rpc_fallback=False):
+        return self.totals
+
+
+class SearchUpdateIndicatorsTest(unittest.TestCase):
+
+    def test_search_doc_id(self):
+
+        result = search_update_indicators.search_doc_id('S0021-25712009000400007', 'spa')
+
+        self.assertEqual(result, 'S0021-25712009000400007-spa')
+
+    def snapshot(self):
+        fd, path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+
+        return search_update_indicators.IndicatorsSnapshot(path)
+
+    def dumper(self, snapshot, pids, citations, accesses):
+        dumper = search_update_indicators.Dumper.__new__(search_update_indicators.Dumper)
+        dumper.collection = 'scl'
+        dumper.citedby_rpc_fallback = False
+        dumper.snapshot = snapshot
+        dumper._articlemeta = FakeArticleMeta(pids)
+        dumper._citedby = FakeCitedby(citations)
+        dumper._accessstats = FakeAccessStats(accesses)
+
+        return dumper
+
+    def test_changed_indicators(self):
+        snapshot = self.snapshot()
+        snapshot.update([
+            {'id': 'S1-scl', 'total_received': {'set': '2'}, 'total_access': {'set': '10'}},
+            {'id': 'S2-scl', 'total_access': {'set': '5'}}
+        ])
+        dumper = self.dumper(
+            snapshot, ['S1', 'S2', 'S3', 'S4'], {'S1': 2, 'S3': 1}, {'S1': 10, 'S2': 6})
+
+        result = list(dumper.changed_indicators(FakeJournal()))
+
+        self.assertEqual(result, [('S2-scl', None, '6'), ('S3-scl', '1', None)])
+
+    def test_changed_indicators_unset(self):
+        snapshot = self.snapshot()
+        snapshot.update([
+            {'id': 'S1-scl', 'total_received': {'set': '2'}, 'total_access': {'set': '10'}},
+            {'id': 'S2-scl', 'total_access': {'set': '5'}}
+        ])
+        dumper = self.dumper(snapshot, ['S1', 'S2'], {}, {'S1': 10})
+
+        result = list(dumper.changed_indicators(FakeJournal()))
+
+        self.assertEqual(result, [('S1-scl', '0', '10'), ('S2-scl', None, '0')])
+
+    def test_changed_indicators_zeroed_once(self):
+        snapshot = self.snapshot()
+        snapshot.update([
+            {'id': 'S1-scl', 'total_received': {'set': '0'}, 'total_access': {'set': '0'}},
+            {'id': 'S2-scl', 'total_received': {'set': '3'}}
+        ])
+        dumper = self.dumper(snapshot, ['S1', 'S2'], {'S2': 3}, {})
+
+        self.assertEqual(list(dumper.changed_indicators(FakeJournal())), [])
+
+    def test_snapshot_replaces_values(self):
+        snapshot = self.snapshot()
+
+        snapshot.update([{'id': 'S1-scl', 'total_received': {'set': '2'}, 'total_access': {'set': '10'}}])
+        snapshot.update([{'id': 'S1-scl', 'total_access': {'set': '0'}}])
+
+        self.assertEqual(snapshot.get('S1-scl'), (None, '0'))
+
+    def test_snapshot(self):
+        fd, path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        snapshot = search_update_indicators.IndicatorsSnapshot(path)
+
+        snapshot.update([
+            {'id': 'S1-scl', 'total_received': {'set': '2'}, 'total_access': {'set': '10'}},
+            {'id': 'S2-scl', 'total_access': {'set': '5'}}
+        ])
+
+        self.assertEqual(snapshot.get('S1-scl'), ('2', '10'))
+        self.assertEqual(snapshot.get('S2-scl'), (None, '5'))
+        self.assertIsNone(snapshot.get('S3-scl'))
+        os.remove(path)
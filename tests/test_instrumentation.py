@@ -0,0 +1,89 @@
+# coding: utf-8
+import os
+import shutil
+import tempfile
+import unittest
+
+import instrumentation
+from benchmarks import stubs
+from thrift.articlemeta import ArticleMeta
+
+
+class FakeClient(object):
+
+    def get_article(self, code):
+        return u'{"code": "%s"}' % code
+
+    def fail(self):
+        raise ValueError('fail')
+
+
+class RPCStatsTest(unittest.TestCase):
+
+    def setUp(self):
+        instrumentation.stats.reset()
+
+    def test_record(self):
+        stats = instrumentation.RPCStats()
+
+        stats.record('articlemeta', 'get_article', 0.003, 10)
+        stats.record('articlemeta', 'get_article', 0.02, 5, error=True)
+
+        result = dict(stats.items())[('articlemeta', 'get_article')]
+
+        self.assertEqual(result.calls, 2)
+        self.assertEqual(result.errors, 1)
+        self.assertEqual(result.payload_bytes, 15)
+        self.assertEqual(result.quantile(0.5), 0.005)
+        self.assertEqual(result.quantile(0.95), 0.025)
+
+    def test_prometheus(self):
+        stats = instrumentation.RPCStats()
+        stats.record('ratchet', 'general', 60)
+
+        result = stats.prometheus(job='test').splitlines()
+
+        self.assertIn(
+            'processing_rpc_requests_total{job="test",service="ratchet",method="general"} 1',
+            result)
+        self.assertIn(
+            'processing_rpc_duration_seconds_bucket{job="test",service="ratchet",method="general",le="30"} 0',
+            result)
+        self.assertIn(
+            'processing_rpc_duration_seconds_bucket{job="test",service="ratchet",method="general",le="+Inf"} 1',
+            result)
+
+    def test_write_prometheus(self):
+        workdir = tempfile.mkdtemp()
+        path = os.path.join(workdir, 'processing.prom')
+        stats = instrumentation.RPCStats()
+        stats.record('ratchet', 'general', 0.1)
+
+        stats.write_prometheus(path, job='test')
+
+        self.assertEqual(os.listdir(workdir), ['processing.prom'])
+        shutil.rmtree(workdir)
+
+    def test_instrumented_client(self):
+        client = instrumentation.instrument(FakeClient(), 'fake')
+
+        client.get_article('S0102-67202009000300001')
+        with self.assertRaises(ValueError):
+            client.fail()
+
+        result = dict(instrumentation.stats.items())
+
+        self.assertEqual(result[('fake', 'get_article')].payload_bytes, 35)
+        self.assertEqual(result[('fake', 'fail')].errors, 1)
+
+    def test_articlemeta_calls(self):
+        dataset = stubs.Dataset.synthetic(journals=1, documents=2)
+
+        with stubs.StandIns(dataset) as servers:
+            client = ArticleMeta(servers.settings()['articlemeta_thriftserver'])
+            list(client.documents(collection='scl'))
+
+        result = dict(instrumentation.stats.items())
+
+        self.assertEqual(result[('articlemeta', 'get_article')].calls, 2)
+        self.assertTrue(result[('articlemeta', 'get_article')].payload_bytes > 0)
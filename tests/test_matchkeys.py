@@ -0,0 +1,110 @@
+# coding: utf-8
+import os
+import copy
+import tempfile
+import unittest
+
+from legendarium.urlegendarium import URLegendarium
+from xylose.scielodocument import Article
+
+import matchkeys
+from snapshot.store import SnapshotStore
+from tests.fixtures import articlemeta
+
+
+class FakeArticleMeta(object):
+
+    def __init__(self, documents):
+        self._documents = documents
+
+    def journals(self, collection=None, issn=None):
+        return [self._documents[0].journal]
+
+    def documents(self, collection=None, issn=None, from_date=None):
+        return self._documents
+
+
+class URLArticleTest(unittest.TestCase):
+
+    def test_url_article_as_legendarium(self):
+        cases = [
+            ('abcd', '2009', '22', '3', '10', '', '15', '', '', '', ''),
+            ('abcd', '2009', '22', '', '', '', '', 'e1234', '1', '', ''),
+            ('abcd', '2009', '', '', '', '', '', '', '', '10.1590/x', '3'),
+            ('abcd', '', '22', '3', '10', '2', '', '', '', '', ''),
+        ]
+
+        for case in cases:
+            self.assertEqual(matchkeys.url_article(*case), URLegendarium(*case).url_article)
+            # segunda chamada com os segmentos do fascículo memorizados
+            self.assertEqual(matchkeys.url_article(*case), URLegendarium(*case).url_article)
+
+    def test_url_article_invalid_year(self):
+
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                matchkeys.url_article('abcd', '09', '22', '3', '10')
+
+    def test_url_article_without_acronym(self):
+
+        with self.assertRaises(ValueError):
+            matchkeys.url_article('', '2009', '22', '3', '10')
+
+
+class MatchKeysTest(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        self.document = Article(articlemeta.document)
+        self.store = SnapshotStore(self.path)
+        self.store.build(FakeArticleMeta([self.document]), 'scl')
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_eligible_match_keys(self):
+
+        result = matchkeys.eligible_match_keys(self.document)
+
+        self.assertEqual(result[:2], ['S0102-67202009000300001', 'S0102-6720(09)000300001'])
+        self.assertEqual(result[-1], '/ABCD/2009.V22N3/137-142/')
+
+    def test_key_type(self):
+
+        result = [
+            matchkeys.key_type(i) for i in matchkeys.eligible_match_keys(self.document)]
+
+        self.assertEqual(result[:2], ['pid', 'fbpe'])
+        self.assertEqual(result[-1], 'legendarium')
+        self.assertEqual(matchkeys.key_type('10.1590/S0102-67202009000300001'), 'doi')
+        self.assertEqual(matchkeys.key_type('/PDF/ABCD/V22N3/A01V22N3.PDF'), 'pdf')
+
+    def test_keys_without_snapshot(self):
+
+        result = matchkeys.MatchKeys(None).keys(self.document)
+
+        self.assertEqual(result, matchkeys.eligible_match_keys(self.document))
+
+    def test_keys_from_snapshot(self):
+
+        self.assertEqual(self.store.update_match_keys('scl'), 1)
+        self.assertEqual(self.store.update_match_keys('scl'), 0)
+        self.store.add_match_keys(self.document, ['STORED'])
+        self.store.commit()
+
+        result = matchkeys.MatchKeys(self.store).keys(self.document)
+
+        self.assertEqual(result, ['STORED'])
+
+    def test_keys_from_snapshot_other_processing_date(self):
+        self.store.add_match_keys(self.document, ['STORED'])
+        self.store.commit()
+        data = copy.deepcopy(articlemeta.document)
+        data['processing_date'] = '2030-01-01'
+        document = Article(data)
+
+        result = matchkeys.MatchKeys(self.store).keys(document)
+
+        self.assertEqual(result, matchkeys.eligible_match_keys(document))
+        self.assertEqual(self.store.update_match_keys('scl'), 0)
@@ -0,0 +1,64 @@
+# coding: utf-8
+import os
+import gzip
+import shutil
+import tempfile
+import unittest
+
+import merge
+
+
+class MergeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir)
+
+    def path(self, name):
+        return os.path.join(self.workdir, name)
+
+    def shard(self, name, data):
+        opener = gzip.open if name.endswith('.gz') else open
+        with opener(self.path(name), 'wb') as f:
+            f.write(data)
+        return self.path(name)
+
+    def read(self, name):
+        with open(self.path(name), 'rb') as f:
+            return f.read()
+
+    def test_merge_single_header(self):
+        inputs = [
+            self.shard('1.csv', b'"a","b"\r\n"1","2"\r\n'),
+            self.shard('2.csv.gz', b'"a","b"\r\n"3","4"\r\n"5","6"\r\n'),
+            self.shard('3.csv', b''),
+            self.shard('4.csv', b'"a","b"\r\n')
+        ]
+
+        merge.merge(inputs, self.path('merged.csv'))
+
+        self.assertEqual(
+            self.read('merged.csv'),
+            b'"a","b"\r\n"1","2"\r\n"3","4"\r\n"5","6"\r\n'
+        )
+
+    def test_merge_different_headers(self):
+        inputs = [
+            self.shard('1.csv', b'"a","b"\r\n"1","2"\r\n'),
+            self.shard('2.csv', b'"a","c"\r\n"3","4"\r\n')
+        ]
+
+        with self.assertRaises(ValueError):
+            merge.merge(inputs, self.path('merged.csv'))
+
+    def test_merge_without_header(self):
+        inputs = [
+            self.shard('1.json', b'{"a": 1}'),
+            self.shard('2.json', b'{"a": 2}\r\n')
+        ]
+
+        merge.merge(inputs, self.path('merged.json'), header=False)
+
+        self.assertEqual(self.read('merged.json'), b'{"a": 1}\r\n{"a": 2}\r\n')
@@ -0,0 +1,166 @@
+# coding: utf-8
+import os
+import time
+import sqlite3
+import tempfile
+import unittest
+
+from accesses.negative_cache import BloomFilter, NegativeCache, MIN_SAMPLES
+from accesses.dumpdata import Dumper
+
+
+class BloomFilterTest(unittest.TestCase):
+
+    def test_contains(self):
+        bloom = BloomFilter(1000, 0.01)
+        keys = ['S0102-6720(09)%09d' % i for i in range(1000)]
+        for key in keys:
+            bloom.add(key)
+
+        self.assertTrue(all(key in bloom for key in keys))
+        false_positives = sum(1 for i in range(10000) if 'other %d' % i in bloom)
+        self.assertLess(false_positives, 300)
+
+
+class NegativeCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_empty_keys_persisted(self):
+        cache = NegativeCache(self.path)
+        self.assertFalse(cache.skip('S0102-6720(09)000300001'))
+        cache.record('S0102-6720(09)000300001', False)
+        cache.record('S0102-67202009000300001', True)
+        cache.save()
+
+        for bloom in [False, True]:
+            cache = NegativeCache(self.path, bloom=bloom)
+
+            self.assertTrue(cache.skip('S0102-6720(09)000300001'))
+            self.assertFalse(cache.skip('S0102-67202009000300001'))
+            self.assertEqual(cache.stats['fbpe'].skipped, 1)
+            self.assertEqual(cache.stats['pid'].skipped, 0)
+
+    def test_pid_not_remembered(self):
+        cache = NegativeCache(self.path)
+        cache.record('S0102-67202009000300001', False)
+        cache.save()
+
+        cache = NegativeCache(self.path)
+
+        self.assertFalse(cache.skip('S0102-67202009000300001'))
+        self.assertEqual(cache.stats['pid'].skipped, 0)
+        self.assertEqual(cache.history['pid'].empty, 1)
+
+    def test_not_remembered(self):
+        cache = NegativeCache(self.path)
+        cache.record('S0102-6720(09)000300001', False, remember=False)
+        cache.save()
+
+        self.assertFalse(NegativeCache(self.path).skip('S0102-6720(09)000300001'))
+        self.assertEqual(cache.stats['fbpe'].empty, 1)
+
+    def test_expired_keys(self):
+        NegativeCache(self.path).save()
+        connection = sqlite3.connect(self.path)
+        connection.execute(
+            'INSERT INTO empty_keys (key, key_type, checked) VALUES (?, ?, ?)',
+            ('S0102-6720(09)000300001', 'fbpe', time.time() - 31 * 86400))
+        connection.commit()
+        connection.close()
+
+        self.assertFalse(NegativeCache(self.path, ttl=30).skip('S0102-6720(09)000300001'))
+        self.assertFalse(NegativeCache(self.path, ttl=60).skip('S0102-6720(09)000300001'))
+
+    def test_skip_empty_rate(self):
+        cache = NegativeCache(self.path)
+        for i in range(MIN_SAMPLES):
+            cache.record('/PDF/ABCD/V22N3/A%04d.PDF' % i, False)
+            cache.record('/ABCD/2009.V22N3/%d/' % i, i % 2 == 0)
+            cache.record('/ABCD/2009.V22N3/%d/' % i, i % 2 == 0)
+        cache.save()
+
+        cache = NegativeCache(self.path, skip_empty_rate=0.99)
+
+        self.assertEqual(cache.skipped_types, set(['pdf']))
+        self.assertFalse(cache.skip('S0102-67202009000300001'))
+        self.assertTrue(cache.skip('/PDF/ABCD/V22N3/OTHER.PDF'))
+        self.assertFalse(cache.skip('/ABCD/2009.V22N3/other/'))
+
+
+class FakeRatchet(object):
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.calls = []
+
+    def document_periods(self, code, begin_date, end_date, granularity):
+        self.calls.append(code)
+        return self.keys.get(code, [])
+
+
+class DumperNegativeCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def dumper(self, ratchet, **kwargs):
+        dumper = Dumper.__new__(Dumper)
+        dumper._ratchet = ratchet
+        dumper._negative_cache = NegativeCache(self.path)
+        dumper.from_date = kwargs.get('from_date', '1500-01-01')
+        dumper.until_date = kwargs.get('until_date', '2100-01-01')
+        dumper.full_history = dumper.from_date == '1500-01-01'
+        dumper.dayly_granularity = False
+
+        return dumper
+
+    def test_ratchet_periods(self):
+        ratchet = FakeRatchet({'S0102-67202009000300001': ['period']})
+
+        dumper = self.dumper(ratchet)
+        for key in ['S0102-67202009000300001', 'S0102-6720(09)000300001']:
+            dumper.ratchet_periods(key)
+        dumper._negative_cache.save()
+
+        dumper = self.dumper(ratchet)
+        self.assertEqual(dumper.ratchet_periods('S0102-67202009000300001'), ['period'])
+        self.assertEqual(dumper.ratchet_periods('S0102-6720(09)000300001'), [])
+
+        self.assertEqual(ratchet.calls, [
+            'S0102-67202009000300001', 'S0102-6720(09)000300001', 'S0102-67202009000300001'])
+
+    def test_ratchet_periods_new_pid(self):
+        ratchet = FakeRatchet({})
+
+        dumper = self.dumper(ratchet)
+        self.assertEqual(dumper.ratchet_periods('S0102-67202009000300001'), [])
+        dumper._negative_cache.save()
+
+        # o documento recebe os primeiros acessos após a execução anterior
+        ratchet.keys['S0102-67202009000300001'] = ['period']
+        dumper = self.dumper(ratchet)
+
+        self.assertEqual(dumper.ratchet_periods('S0102-67202009000300001'), ['period'])
+        self.assertEqual(ratchet.calls, ['S0102-67202009000300001', 'S0102-67202009000300001'])
+
+    def test_ratchet_periods_window(self):
+        ratchet = FakeRatchet({})
+
+        dumper = self.dumper(ratchet, from_date='2013-01-01')
+        dumper.ratchet_periods('S0102-6720(09)000300001')
+        dumper._negative_cache.save()
+
+        dumper = self.dumper(ratchet)
+        dumper.ratchet_periods('S0102-6720(09)000300001')
+
+        self.assertEqual(len(ratchet.calls), 2)
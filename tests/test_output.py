@@ -0,0 +1,59 @@
+# coding: utf-8
+import gzip
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import output
+
+
+class CSVWriterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir)
+
+    def read(self, name, opener=io.open):
+        with opener(os.path.join(self.workdir, name), 'rb') as f:
+            return f.read().decode('utf-8')
+
+    def test_writerow_quotes_all_fields(self):
+        path = os.path.join(self.workdir, 'out.csv')
+
+        with output.CSVWriter(path) as writer:
+            writer.write([u'scl', u'título "a"', 10])
+
+        self.assertEqual(self.read('out.csv'), u'"scl","título ""a""","10"\r\n')
+
+    def test_writeline(self):
+        path = os.path.join(self.workdir, 'out.json')
+
+        with output.CSVWriter(path) as writer:
+            writer.write(u'{"pid": "S0102-67202009000300001"}')
+
+        self.assertEqual(self.read('out.json'), u'{"pid": "S0102-67202009000300001"}\r\n')
+
+    def test_gzip_by_extension(self):
+        path = os.path.join(self.workdir, 'out.csv.gz')
+
+        with output.CSVWriter(path) as writer:
+            writer.writerows([[u'a', u'b'], [u'c', u'd']])
+
+        self.assertEqual(self.read('out.csv.gz', gzip.open), u'"a","b"\r\n"c","d"\r\n')
+
+    def test_unknown_compression(self):
+        path = os.path.join(self.workdir, 'out.csv')
+
+        with self.assertRaises(ValueError):
+            output.CSVWriter(path, compression='rar')
+
+    def test_compression_by_extension(self):
+
+        self.assertEqual(output.compression_by_extension('out.csv.gz'), 'gzip')
+        self.assertEqual(output.compression_by_extension('out.csv.zst'), 'zstd')
+        self.assertIsNone(output.compression_by_extension('out.csv'))
+        self.assertIsNone(output.compression_by_extension(None))
@@ -0,0 +1,45 @@
+# coding: utf-8
+import copy
+import unittest
+
+import projection
+from tests.fixtures import articlemeta
+
+
+class ProjectionTest(unittest.TestCase):
+
+    def test_project(self):
+        record = copy.deepcopy(articlemeta.document)
+        record['article']['v10'] = [{'n': 'Maria', 's': 'Silva', '1': 'aff1'}]
+        record['article']['v70'] = [{'_': 'USP', 'i': 'aff1', 'p': 'Brasil'}]
+        record['article']['v83'] = [{'a': 'Resumo', 'l': 'pt'}]
+        original = copy.deepcopy(record)
+
+        result = projection.project(record, ['affiliations'])
+
+        self.assertNotIn('citations', result)
+        self.assertNotIn('v83', result['article'])
+        self.assertNotIn('v10', result['article'])
+        self.assertIn('v70', result['article'])
+        self.assertEqual(result['article']['v12'], record['article']['v12'])
+        self.assertEqual(record, original)
+
+    def test_project_all_fields(self):
+
+        self.assertIs(projection.project(articlemeta.document, None), articlemeta.document)
+        self.assertEqual(
+            projection.project(articlemeta.document, list(projection.DOCUMENT_FIELDS)),
+            articlemeta.document)
+
+    def test_merge_fields(self):
+
+        self.assertEqual(
+            projection.merge_fields([['authors'], [], ['affiliations', 'authors']]),
+            ['affiliations', 'authors'])
+        self.assertIsNone(projection.merge_fields([['authors'], None]))
+
+    def test_check_fields(self):
+
+        projection.check_fields(['citations'])
+        with self.assertRaises(ValueError):
+            projection.check_fields(['body'])
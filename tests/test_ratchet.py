@@ -0,0 +1,249 @@
+# coding: utf-8
+import copy
+import json
+import unittest
+
+from thriftpy.thrift import TApplicationException
+
+from accesses.dumpdata import join_periods
+from thrift.ratchet import Ratchet, date_bound, record_periods, window_record, window_tree
+from tests.fixtures import ratchet
+
+
+class FakeClient(object):
+
+    def __init__(self, range_supported=True, periods_supported=True):
+        self.range_supported = range_supported
+        self.periods_supported = periods_supported
+        self.calls = []
+
+    def general(self, code):
+        self.calls.append('general')
+        return json.dumps(ratchet.record_1)
+
+    def general_range(self, code, begin_date, end_date, granularity):
+        self.calls.append('general_range')
+        if not self.range_supported:
+            raise TApplicationException(TApplicationException.UNKNOWN_METHOD)
+        return json.dumps(window_record(ratchet.record_1, begin_date, end_date, granularity))
+
+    def accesses(self, code, begin_date, end_date, granularity):
+        self.calls.append('accesses')
+        if not self.periods_supported:
+            raise TApplicationException(TApplicationException.UNKNOWN_METHOD)
+        return record_periods(
+            window_record(ratchet.record_1, begin_date, end_date, granularity), granularity)
+
+
+class FakeRatchet(Ratchet):
+
+    def __init__(self, client):
+        super(FakeRatchet, self).__init__('localhost', 11630)
+        self._fake_client = client
+
+    @property
+    def client(self):
+        return self._fake_client
+
+
+class WindowTest(unittest.TestCase):
+
+    def test_window_tree_monthly(self):
+        tree = {
+            'total': 6,
+            'y2012': {
+                'total': 6,
+                'm01': {'total': 3, 'd08': 1, 'd20': 2},
+                'm02': {'total': 3, 'd01': 3}
+            }
+        }
+
+        result = window_tree(tree, '2012-01-10', '2012-01-31')
+
+        self.assertEqual(result, {'total': 3, 'y2012': {'total': 3, 'm01': {'total': 3}}})
+
+    def test_window_tree_daily(self):
+        tree = {
+            'total': 6,
+            'y2012': {
+                'total': 6,
+                'm01': {'total': 3, 'd08': 1, 'd20': 2},
+                'm02': {'total': 3, 'd01': 3}
+            }
+        }
+
+        result = window_tree(tree, '2012-01-10', '2012-01-31', 'daily')
+
+        self.assertEqual(result, {'total': 2, 'y2012': {'total': 2, 'm01': {'total': 2, 'd20': 2}}})
+
+    def test_date_bound(self):
+
+        self.assertEqual(date_bound('2012'), '2012-01-01')
+        self.assertEqual(date_bound('2012', end=True), '2012-12-31')
+        self.assertEqual(date_bound('2012-02', end=True), '2012-02-29')
+        self.assertEqual(date_bound('2013-02', end=True), '2013-02-28')
+        self.assertEqual(date_bound('2013-05-10', end=True), '2013-05-10')
+
+    def test_window_tree_year_bounds(self):
+        tree = {
+            'total': 10,
+            'y2012': {'total': 3, 'm01': {'total': 3, 'd08': 3}},
+            'y2013': {'total': 4, 'm05': {'total': 4, 'd31': 4}},
+            'y2014': {'total': 3, 'm01': {'total': 3, 'd01': 3}}
+        }
+
+        for granularity in ['monthly', 'daily']:
+            result = window_tree(tree, '2012', '2013', granularity)
+
+            self.assertEqual(result['total'], 7)
+            self.assertEqual(result['y2013']['total'], 4)
+            self.assertNotIn('y2014', result)
+
+    def test_window_tree_month_bounds(self):
+        tree = {
+            'total': 6,
+            'y2013': {
+                'total': 6,
+                'm04': {'total': 1, 'd30': 1},
+                'm05': {'total': 3, 'd01': 1, 'd31': 2},
+                'm06': {'total': 2, 'd01': 2}
+            }
+        }
+
+        result = window_tree(tree, '2013-05', '2013-05', 'daily')
+
+        self.assertEqual(result, {
+            'total': 3, 'y2013': {'total': 3, 'm05': {'total': 3, 'd01': 1, 'd31': 2}}})
+        self.assertEqual(window_tree(tree, '2013-05', '2013-06')['total'], 5)
+
+    def test_window_record_joined_accesses(self):
+
+        for granularity in ['monthly', 'daily']:
+            size = 7 if granularity == 'monthly' else 10
+            for begin, end in [('2012-02-10', '2012-05-03'), ('1500-01-01', '2030-01-01'), ('2020-01-01', '2020-12-31')]:
+                windowed = window_record(ratchet.record_1, begin, end, granularity)
+                full = record_periods(copy.deepcopy(ratchet.record_1), granularity)
+
+                self.assertEqual(
+                    join_periods(record_periods(windowed, granularity)),
+                    join_periods([i for i in full if begin[:size] <= i.period <= end[:size]])
+                )
+
+
+def periods_as_dict(periods):
+    result = {}
+    for period in periods:
+        for atype in ['abstract', 'html', 'pdf', 'readcube']:
+            count = getattr(period, 'access_%s' % atype)
+            if count is not None:
+                result.setdefault(period.period, {})[atype] = count
+
+    return result
+
+
+class RecordPeriodsTest(unittest.TestCase):
+
+    def test_join_periods(self):
+        periods = record_periods(ratchet.record_1, 'monthly')
+        expected = dict(
+            (period, dict((atype, count * 2) for atype, count in accesses.items()))
+            for period, accesses in periods_as_dict(periods).items()
+        )
+
+        self.assertEqual(join_periods(periods + periods), expected)
+
+    def test_record_periods_sorted(self):
+        periods = [i.period for i in record_periods(ratchet.record_1, 'daily')]
+
+        self.assertEqual(periods, sorted(periods))
+
+    def test_record_periods_empty(self):
+
+        self.assertEqual(record_periods({'meta': {'total': 0}, 'objects': []}), [])
+
+
+class RatchetTest(unittest.TestCase):
+
+    def test_invalid_protocol(self):
+
+        with self.assertRaises(ValueError):
+            Ratchet('localhost', 11630, protocol='json')
+
+        with self.assertRaises(ValueError):
+            Ratchet('localhost', 11630, transport='http')
+
+    def test_unavailable_protocol(self):
+        from thrift import ratchet as module
+
+        module.PROTOCOLS['missing'] = ('thriftpy.protocol', 'TMissingProtocolFactory')
+        try:
+            with self.assertRaises(ValueError) as context:
+                Ratchet('localhost', 11630, protocol='missing')
+        finally:
+            del module.PROTOCOLS['missing']
+
+        self.assertIn('not available', str(context.exception))
+
+    def test_document_periods(self):
+        client = FakeClient()
+
+        result = FakeRatchet(client).document_periods('pid', '2013-01-01', '2013-01-31')
+
+        self.assertEqual(periods_as_dict(result)['2013-01']['html'], 11)
+        self.assertEqual(client.calls, ['accesses'])
+
+    def test_document_periods_not_supported(self):
+        client = FakeClient(periods_supported=False)
+        server = FakeRatchet(client)
+
+        result = server.document_periods('pid', '2013-01-01', '2013-01-31')
+        server.document_periods('pid', '2013-01-01', '2013-01-31')
+
+        self.assertEqual(periods_as_dict(result)['2013-01']['html'], 11)
+        self.assertEqual(client.calls, ['accesses', 'general_range', 'general_range'])
+
+    def test_stub_server_protocols(self):
+        from benchmarks.stubs import Dataset, RatchetHandler, StubServer
+        from thrift.ratchet import load_ratchet_thrift, protocol_factory, transport_factory
+
+        dataset = Dataset.synthetic(1, 1)
+        code = list(dataset.documents)[0]
+        expected = periods_as_dict(record_periods(
+            window_record(ratchet.record_1, '2013-01-01', '2013-12-31', 'daily'), 'daily'))
+
+        for protocol, transport in [('binary', 'buffered'), ('compact', 'framed')]:
+            server = StubServer(
+                load_ratchet_thrift().RatchetStats, RatchetHandler(dataset),
+                proto_factory=protocol_factory(protocol),
+                trans_factory=transport_factory(transport)
+            ).start()
+            try:
+                client = Ratchet(server.host, server.port, protocol, transport)
+                result = client.document_periods(code, '2013-01-01', '2013-12-31', 'daily')
+            finally:
+                server.stop()
+
+            self.assertEqual(periods_as_dict(result), expected)
+
+    def test_document_range(self):
+        client = FakeClient()
+
+        result = json.loads(FakeRatchet(client).document_range('pid', '2013-01-01', '2013-01-31'))
+
+        self.assertEqual(result['objects'][0]['html']['y2013']['total'], 11)
+        self.assertEqual(client.calls, ['general_range'])
+
+    def test_document_range_not_supported(self):
+        client = FakeClient(range_supported=False)
+        server = FakeRatchet(client)
+
+        result = json.loads(server.document_range('pid', '2013-01-01', '2013-01-31'))
+        server.document_range('pid', '2013-01-01', '2013-01-31')
+
+        self.assertEqual(result['objects'][0]['html']['y2013']['total'], 11)
+        self.assertEqual(client.calls, ['general_range', 'general', 'general'])
+
+    def test_document_range_invalid_granularity(self):
+
+        with self.assertRaises(ValueError):
+            FakeRatchet(FakeClient()).document_range('pid', '2013-01-01', '2013-01-31', 'yearly')
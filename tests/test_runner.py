@@ -0,0 +1,77 @@
+# coding: utf-8
+import os
+import shutil
+import tempfile
+import unittest
+
+from xylose.scielodocument import Article
+
+import runner
+from snapshot.store import SnapshotStore
+from benchmarks.stubs import synthetic_documents
+from publication import documents_counts
+from export import natural_keys
+
+
+class FakeArticleMeta(object):
+
+    def __init__(self, documents):
+        self._documents = documents
+
+    def journals(self, collection=None, issn=None):
+        journals = {}
+        for document in self._documents:
+            journals.setdefault(document.journal.scielo_issn, document.journal)
+        return list(journals.values())
+
+    def documents(self, collection=None, issn=None, from_date=None):
+        return [i for i in self._documents if i.journal.scielo_issn == issn]
+
+
+class RunnerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.source = 'snapshot:%s' % os.path.join(self.workdir, 'scl.db')
+        documents = [Article(i) for i in synthetic_documents(2, 5, 'scl')]
+        SnapshotStore(self.source[len('snapshot:'):]).build(
+            FakeArticleMeta(documents), 'scl')
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir)
+
+    def read(self, path):
+        with open(path, 'rb') as f:
+            return f.read().splitlines()
+
+    def test_reports_match_single_report_processings(self):
+        output_dir = os.path.join(self.workdir, 'run')
+        os.mkdir(output_dir)
+
+        runner.Runner(
+            'scl', ['documents_counts', 'natural_keys'], output_dir=output_dir,
+            source=self.source, workers=3).run()
+
+        counts_file = os.path.join(self.workdir, 'counts.csv')
+        documents_counts.Dumper('scl', output_file=counts_file, source=self.source).run()
+        keys_file = os.path.join(self.workdir, 'keys.csv')
+        natural_keys.Dumper('scl', output_file=keys_file, source=self.source).run('csv')
+
+        for name, expected_file in [('documents_counts', counts_file), ('natural_keys', keys_file)]:
+            result = self.read(os.path.join(output_dir, '%s.csv' % name))
+            expected = self.read(expected_file)
+            self.assertEqual(len(result), 11)
+            self.assertEqual(result[0], expected[0])
+            self.assertEqual(sorted(result[1:]), sorted(expected[1:]))
+
+    def test_report_file(self):
+
+        self.assertEqual(runner.report_file('out', 'natural_keys'), 'out/natural_keys.csv')
+        self.assertEqual(runner.report_file('out', 'natural_keys', 'gzip'), 'out/natural_keys.csv.gz')
+
+    def test_nationality_report_requires_home_nationality(self):
+
+        with self.assertRaises(ValueError):
+            runner.report_dumper(
+                'documents_affiliations_nationality', 'scl',
+                os.path.join(self.workdir, 'nationality.csv'), source=self.source)
@@ -0,0 +1,96 @@
+# coding: utf-8
+import json
+import threading
+import unittest
+
+try:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+except ImportError:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+
+from clients.search import Search
+
+
+class FakeSolrHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        length = int(self.headers.get('content-length', 0))
+        body = self.rfile.read(length).decode('utf-8')
+        self.server.methods.append('POST')
+        self.server.requests.append((self.path, json.loads(body) if body else None))
+        self._respond()
+
+    def do_GET(self):
+        self.server.methods.append('GET')
+        self.server.requests.append((self.path, None))
+        self._respond()
+
+    def _respond(self):
+        self.send_response(200)
+        self.send_header('content-type', 'application/json')
+        self.end_headers()
+        self.wfile.write(b'{"responseHeader": {"status": 0}}')
+
+    def log_message(self, *args):
+        pass
+
+
+class SearchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = HTTPServer(('127.0.0.1', 0), FakeSolrHandler)
+        self.server.requests = []
+        self.server.methods = []
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.endpoint = 'http://127.0.0.1:%d/solr/search/update' % self.server.server_port
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_update_document_indicators_flush_on_batch_size(self):
+        search = Search(self.endpoint, batch_size=2)
+
+        search.update_document_indicators('S1-scl', 1, 10)
+        self.assertEqual(self.server.requests, [])
+
+        search.update_document_indicators('S2-scl', None, 20)
+
+        self.assertEqual(len(self.server.requests), 1)
+        path, docs = self.server.requests[0]
+        self.assertTrue(path.startswith('/solr/search/update?wt=json'))
+        self.assertEqual(docs, [
+            {'id': 'S1-scl', 'total_received': {'set': '1'}, 'total_access': {'set': '10'}},
+            {'id': 'S2-scl', 'total_access': {'set': '20'}}
+        ])
+
+    def test_update_document_indicators_without_values(self):
+        search = Search(self.endpoint, batch_size=1)
+
+        search.update_document_indicators('S1-scl', None, None)
+
+        self.assertEqual(self.server.requests, [])
+
+    def test_update_document_indicators_flush_on_interval(self):
+        search = Search(self.endpoint, batch_size=1000, flush_interval=0)
+
+        search.update_document_indicators('S1-scl', 1, 10)
+
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_deploy(self):
+        search = Search(self.endpoint, batch_size=1000)
+
+        search.update_document_indicators('S1-scl', 1, 10)
+        search.update_document_indicators('S2-scl', 2, 20)
+        search.deploy()
+
+        paths = [path for path, docs in self.server.requests]
+        self.assertEqual(len(paths), 3)
+        self.assertEqual(len(self.server.requests[0][1]), 2)
+        self.assertIn('commit=true', paths[1])
+        self.assertIn('optimize=true', paths[2])
+        self.assertEqual(self.server.methods, ['POST', 'GET', 'GET'])
+        self.assertEqual([docs for path, docs in self.server.requests[1:]], [None, None])
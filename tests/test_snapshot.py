@@ -0,0 +1,127 @@
+# coding: utf-8
+import os
+import tempfile
+import unittest
+
+from xylose.scielodocument import Article
+
+import utils
+from snapshot.store import SnapshotStore
+from tests.fixtures import articlemeta
+
+
+class FakeArticleMeta(object):
+
+    def __init__(self, documents):
+        self._documents = documents
+
+    def journals(self, collection=None, issn=None):
+        return [self._documents[0].journal]
+
+    def documents(self, collection=None, issn=None, from_date=None):
+        return self._documents
+
+
+class SnapshotStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        self.store = SnapshotStore(self.path)
+        self.store.build(FakeArticleMeta([Article(articlemeta.document)]), 'scl')
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_articlemeta_server_from_snapshot(self):
+
+        result = utils.articlemeta_server('snapshot:%s' % self.path)
+
+        self.assertTrue(isinstance(result, SnapshotStore))
+        self.assertEqual(result.path, self.path)
+
+    def test_journals(self):
+
+        result = [i.scielo_issn for i in self.store.journals(collection='scl')]
+
+        self.assertEqual(result, ['0102-6720'])
+
+    def test_documents(self):
+
+        result = [i.publisher_id for i in self.store.documents(collection='scl', issn='0102-6720')]
+
+        self.assertEqual(result, ['S0102-67202009000300001'])
+
+    def test_documents_other_issn(self):
+
+        result = list(self.store.documents(collection='scl', issn='1234-4321'))
+
+        self.assertEqual(result, [])
+
+    def test_documents_only_identifiers(self):
+
+        result = list(self.store.documents(collection='scl', only_identifiers=True))
+
+        self.assertEqual(result[0].code, 'S0102-67202009000300001')
+        self.assertEqual(result[0].collection, 'scl')
+
+    def test_documents_from_date(self):
+
+        result = list(self.store.documents(collection='scl', from_date='2011-01-01'))
+
+        self.assertEqual(result, [])
+
+    def test_document(self):
+
+        result = self.store.document('S0102-67202009000300001', 'scl')
+
+        self.assertEqual(result.data, articlemeta.document)
+
+    def test_document_not_found(self):
+
+        result = self.store.document('S0102-67202009000300002', 'scl')
+
+        self.assertIsNone(result)
+
+    def test_document_unavailable_format(self):
+
+        result = self.store.document('S0102-67202009000300001', 'scl', fmt='xmlwos')
+
+        self.assertIsNone(result)
+
+    def test_documents_with_fields(self):
+
+        full = list(self.store.documents(collection='scl'))[0]
+        slim = list(self.store.documents(collection='scl', fields=['affiliations']))[0]
+
+        self.assertEqual(full.data, articlemeta.document)
+        self.assertNotIn('citations', slim.data)
+        self.assertNotIn('v83', slim.data['article'])
+        self.assertEqual(slim.mixed_affiliations, full.mixed_affiliations)
+
+    def test_document_with_citations(self):
+
+        result = self.store.document('S0102-67202009000300001', 'scl', fields=['citations'])
+
+        self.assertEqual(len(result.citations), len(Article(articlemeta.document).citations))
+
+    def test_documents_previous_format(self):
+        import sqlite3
+        from snapshot.store import encode
+
+        connection = sqlite3.connect(self.path)
+        connection.execute('DROP TABLE documents')
+        connection.execute(
+            'CREATE TABLE documents (collection TEXT, pid TEXT, issn TEXT, doi TEXT, '
+            'processing_date TEXT, data BLOB, PRIMARY KEY (collection, pid))')
+        connection.execute(
+            'INSERT INTO documents VALUES (?, ?, ?, ?, ?, ?)',
+            ('scl', 'S0102-67202009000300001', '0102-6720', None, '2012-01-01',
+             encode(articlemeta.document)))
+        connection.commit()
+        connection.close()
+
+        store = SnapshotStore(self.path)
+
+        self.assertEqual(list(store.documents())[0].data, articlemeta.document)
+        self.assertNotIn('citations', list(store.documents(fields=[]))[0].data)
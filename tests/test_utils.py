@@ -1,4 +1,5 @@
 # coding: utf-8
+import time
 import unittest
 
 import utils
@@ -53,3 +54,131 @@ class UtilsTest(unittest.TestCase):
         result = utils.split_date('')
 
         self.assertEqual(result, ('', '', ''))
+
+    def test_run_pipeline(self):
+        result = []
+
+        utils.run_pipeline(
+            range(10),
+            [
+                ('double', lambda x: x * 2, 3),
+                ('odd', lambda x: x if x % 4 else None, 2),
+                ('collect', result.append, 1)
+            ]
+        )
+
+        self.assertEqual(sorted(result), [2, 6, 10, 14, 18])
+
+    def test_run_pipeline_discard_failed_items(self):
+        result = []
+
+        utils.run_pipeline(
+            [1, 0, 2],
+            [
+                ('invert', lambda x: 1.0 / x, 2),
+                ('collect', result.append, 1)
+            ]
+        )
+
+        self.assertEqual(sorted(result), [0.5, 1.0])
+
+    def test_prefetch(self):
+
+        for depth in [0, 1, 3, 100]:
+            self.assertEqual(list(utils.prefetch(iter(range(10)), depth)), list(range(10)))
+
+    def test_prefetch_propagates_errors(self):
+
+        def items():
+            yield 1
+            yield 2
+            raise ValueError('page failed')
+
+        result = []
+        with self.assertRaises(ValueError):
+            for item in utils.prefetch(items(), 5):
+                result.append(item)
+
+        self.assertEqual(result, [1, 2])
+
+    def test_prefetch_reads_ahead(self):
+        read = []
+
+        def items():
+            for i in range(10):
+                read.append(i)
+                yield i
+
+        iterator = utils.prefetch(items(), 3)
+        self.assertEqual(next(iterator), 0)
+        time.sleep(0.2)
+        # o item entregue, os 3 da fila e o aguardando espaço na fila
+        self.assertEqual(len(read), 5)
+        iterator.close()
+
+    def test_rate_limiter_disabled(self):
+        limiter = utils.RateLimiter(None)
+
+        self.assertEqual(limiter.interval, 0)
+        limiter.wait()
+
+    def test_rate_limiter(self):
+        limiter = utils.RateLimiter(100)
+
+        limiter.wait()
+        limiter.wait()
+
+        self.assertAlmostEqual(limiter.interval, 0.01)
+
+    def test_parse_shard(self):
+
+        self.assertEqual(utils.parse_shard('2/4'), (2, 4))
+
+    def test_parse_shard_invalid(self):
+
+        for value in ['0/4', '5/4', '1/0', '2', 'a/b']:
+            with self.assertRaises(ValueError):
+                utils.parse_shard(value)
+
+    def test_shard_of_is_stable(self):
+
+        self.assertEqual(utils.shard_of('0102-6720', 4), utils.shard_of('0102-6720', 4))
+        self.assertEqual(utils.shard_of('1234-432x', 4), utils.shard_of('1234-432X', 4))
+        self.assertTrue(1 <= utils.shard_of('0102-6720', 4) <= 4)
+
+    def test_sharded_articlemeta(self):
+
+        class Journal(object):
+            def __init__(self, scielo_issn):
+                self.scielo_issn = scielo_issn
+
+        class FakeArticleMeta(object):
+            issns = ['%04d-%04d' % (1000 + i, 1000 + i) for i in range(20)]
+
+            def journals(self, collection=None, issn=None, **kwargs):
+                return [Journal(i) for i in self.issns if issn in (None, i)]
+
+            def documents(self, collection=None, issn=None, **kwargs):
+                return [(i, n) for i in self.issns if issn in (None, i) for n in range(2)]
+
+        shards = [utils.ShardedArticleMeta(FakeArticleMeta(), (k, 3)) for k in range(1, 4)]
+
+        journals = [j.scielo_issn for s in shards for j in s.journals(collection='scl')]
+        documents = [d for s in shards for d in s.documents(collection='scl')]
+
+        self.assertEqual(sorted(journals), FakeArticleMeta.issns)
+        self.assertEqual(sorted(documents), sorted(FakeArticleMeta().documents()))
+        self.assertEqual(
+            sum(len(list(s.documents(collection='scl', issn='1000-1000'))) for s in shards), 2)
+
+    def test_slugify(self):
+
+        self.assertEqual(utils.slugify(u'rbgo_37_2_none_São Paulo-- (x)'), u'rbgo_37_2_none_sao-paulo-x')
+
+    def test_slugify_keeps_leading_hyphen(self):
+
+        self.assertEqual(utils.slugify(u' -Ação: Teste\t\n'), u'-acao-teste')
+
+    def test_slugify_allow_unicode(self):
+
+        self.assertEqual(utils.slugify(u'Ação  Teste!', allow_unicode=True), u'ação-teste')
@@ -0,0 +1,359 @@
+# coding: utf-8
+from __future__ import absolute_import
+import json
+import logging
+
+from accessstats.client import ThriftClient as AccessesThriftClient
+
+import instrumentation
+
+logger = logging.getLogger(__name__)
+
+
+class AccessStats(AccessesThriftClient):
+
+    @property
+    def client(self):
+        return instrumentation.instrument(
+            super(AccessStats, self).client, 'accessstats')
+
+    def _compute_access_lifetime(self, query_result):
+
+        data = []
+
+        for publication_year in query_result['aggregations']['publication_year']['buckets']:
+            for access_year in publication_year['access_year']['buckets']:
+                data.append([
+                    publication_year['key'],
+                    access_year['key'],
+                    int(access_year['access_html']['value']),
+                    int(access_year['access_abstract']['value']),
+                    int(access_year['access_pdf']['value']),
+                    int(access_year['access_epdf']['value']),
+                    int(access_year['access_total']['value'])
+                ])
+
+        return sorted(data)
+
+    def access_lifetime(self, issn, collection, raw=False):
+
+        body = {
+            "query": {
+                "bool": {
+                    "must": [{
+                            "match": {
+                                "collection": collection
+                            }
+                        },
+                        {
+                            "match": {
+                                "issn": issn
+                            }
+                        }
+                    ]
+                }
+            },
+            "size": 0,
+            "aggs": {
+                "publication_year": {
+                    "terms": {
+                        "field": "publication_year",
+                        "size": 0,
+                        "order": {
+                            "access_total": "desc"
+                        }
+                  },
+                  "aggs": {
+                        "access_total": {
+                            "sum": {
+                                "field": "access_total"
+                            }
+                        },
+                        "access_year": {
+                            "terms": {
+                                "field": "access_year",
+                                "size": 0,
+                                "order": {
+                                    "access_total": "desc"
+                                }
+                            },
+                            "aggs": {
+                                "access_total": {
+                                    "sum": {
+                                        "field": "access_total"
+                                    }
+                                },
+                                "access_abstract": {
+                                    "sum": {
+                                        "field": "access_abstract"
+                                    }
+                                },
+                                "access_epdf": {
+                                    "sum": {
+                                        "field": "access_epdf"
+                                    }
+                                },
+                                "access_html": {
+                                    "sum": {
+                                        "field": "access_html"
+                                    }
+                                },
+                                "access_pdf": {
+                                    "sum": {
+                                        "field": "access_pdf"
+                                    }
+                                }
+                            }
+                        }
+                    }
+                }
+            }
+        }
+
+        query_parameters = [
+            ('size', '0')
+        ]
+
+        query_result = self.search(json.dumps(body), query_parameters)
+
+        computed = self._compute_access_lifetime(query_result)
+
+        return query_result if raw else computed
+
+    def _compute_documents_access_total(self, query_result):
+
+        return {
+            item['key']: int(item['access_total']['value'])
+            for item in query_result['aggregations']['pid']['buckets']
+        }
+
+    def documents_access_total(self, issn, collection):
+        """
+        Retorna em uma única consulta o total de acessos de cada documento
+        do periódico no formato {pid: total}.
+        """
+
+        body = {
+            "query": {
+                "bool": {
+                    "must": [{
+                            "match": {
+                                "collection": collection
+                            }
+                        },
+                        {
+                            "match": {
+                                "issn": issn
+                            }
+                        }
+                    ]
+                }
+            },
+            "size": 0,
+            "aggs": {
+                "pid": {
+                    "terms": {
+                        "field": "pid",
+                        "size": 0
+                    },
+                    "aggs": {
+                        "access_total": {
+                            "sum": {
+                                "field": "access_total"
+                            }
+                        }
+                    }
+                }
+            }
+        }
+
+        query_parameters = [
+            ('size', '0')
+        ]
+
+        query_result = self.search(json.dumps(body), query_parameters)
+
+        return self._compute_documents_access_total(query_result)
+
+    def journal_access_monthnyear(self, issn):
+
+        body = {
+            "query": {
+                "match": {
+                    "issn": issn
+                }
+            },
+            "aggs": {
+                "access_year": {
+                    "terms": {
+                        "field": "access_year",
+                        "size": 0
+                    },
+                    "aggs": {
+                        "access_month": {
+                            "terms": {
+                                "field": "access_month",
+                                "size": 0
+                            },
+                            "aggs": {
+                                "access_total": {
+                                    "sum": {
+                                        "field": "access_total"
+                                    }
+                                },
+                                "access_epdf": {
+                                    "sum": {
+                                        "field": "access_epdf"
+                                    }
+                                },
+                                "access_pdf": {
+                                    "sum": {
+                                        "field": "access_pdf"
+                                    }
+                                },
+                                "access_html": {
+                                    "sum": {
+                                        "field": "access_html"
+                                    }
+                                },
+                                "access_abstract": {
+                                    "sum": {
+                                        "field": "access_abstract"
+                                    }
+                                }
+                            }
+                        }
+                    }
+                }
+            }
+        }
+
+        query_parameters = [
+            ('size', '1000')
+        ]
+
+        query_result = self.search(json.dumps(body), query_parameters)
+
+        return query_result
+
+    def collection_access_monthnyear(self, collection):
+
+        body = {
+            "query": {
+                "match": {
+                    "collection": collection
+                }
+            },
+            "aggs": {
+                "access_year": {
+                    "terms": {
+                        "field": "access_year",
+                        "size": 0
+                    },
+                    "aggs": {
+                        "access_month": {
+                            "terms": {
+                                "field": "access_month",
+                                "size": 0
+                            },
+                            "aggs": {
+                                "access_total": {
+                                    "sum": {
+                                        "field": "access_total"
+                                    }
+                                },
+                                "access_epdf": {
+                                    "sum": {
+                                        "field": "access_epdf"
+                                    }
+                                },
+                                "access_pdf": {
+                                    "sum": {
+                                        "field": "access_pdf"
+                                    }
+                                },
+                                "access_html": {
+                                    "sum": {
+                                        "field": "access_html"
+                                    }
+                                },
+                                "access_abstract": {
+                                    "sum": {
+                                        "field": "access_abstract"
+                                    }
+                                }
+                            }
+                        }
+                    }
+                }
+            }
+        }
+
+        query_parameters = [
+            ('size', '1000')
+        ]
+
+        query_result = self.search(json.dumps(body), query_parameters)
+
+        return query_result
+
+    def document_access_monthnyear(self, code):
+
+        body = {
+            "query": {
+                "match": {
+                    "id": code
+                }
+            },
+            "aggs": {
+                "access_year": {
+                    "terms": {
+                        "field": "access_year",
+                        "size": 0
+                    },
+                    "aggs": {
+                        "access_month": {
+                            "terms": {
+                                "field": "access_month",
+                                "size": 0
+                            },
+                            "aggs": {
+                                "access_total": {
+                                    "sum": {
+                                        "field": "access_total"
+                                    }
+                                },
+                                "access_epdf": {
+                                    "sum": {
+                                        "field": "access_epdf"
+                                    }
+                                },
+                                "access_pdf": {
+                                    "sum": {
+                                        "field": "access_pdf"
+                                    }
+                                },
+                                "access_html": {
+                                    "sum": {
+                                        "field": "access_html"
+                                    }
+                                },
+                                "access_abstract": {
+                                    "sum": {
+                                        "field": "access_abstract"
+                                    }
+                                }
+                            }
+                        }
+                    }
+                }
+            }
+        }
+
+        query_parameters = [
+            ('size', '0')
+        ]
+
+        query_result = self.search(json.dumps(body), query_parameters)
+
+        return query_result
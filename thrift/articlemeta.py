@@ -0,0 +1,307 @@
+# coding: utf-8
+from __future__ import absolute_import
+import os
+import re
+import time
+import socket
+import logging
+import threading
+from contextlib import contextmanager
+
+import thriftpy
+from thriftpy.rpc import make_client
+from thriftpy.transport import TTransportException
+import articlemeta.client
+from articlemeta.client import (
+    ThriftClient as ArticleMetaThriftClient, LIMIT, ServerError, UnauthorizedAccess)
+
+import instrumentation
+import utils
+from projection import project_document, check_fields
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 11620
+POOL_SIZE = 8
+MAX_FAILURES = 3
+EJECT_SECONDS = 30
+IDLE_SECONDS = 2
+
+# IDL distribuído com o articlemetaapi
+ARTICLEMETA_THRIFT_FILE = os.path.join(
+    os.path.dirname(articlemeta.client.__file__), 'thrift', 'articlemeta.thrift')
+
+_articlemeta_thrift = None
+
+
+def load_articlemeta_thrift():
+    """
+    Carrega o IDL do ArticleMeta com o thriftpy apenas quando o primeiro
+    cliente é criado. O ThriftClient do articlemetaapi carrega o mesmo IDL
+    com o thriftpy2, os serviços e exceções utilizados pelo ArticleMeta são
+    os do thriftpy, o mesmo runtime de make_client e TTransportException.
+    """
+    global _articlemeta_thrift
+
+    if _articlemeta_thrift is None:
+        _articlemeta_thrift = thriftpy.load(
+            ARTICLEMETA_THRIFT_FILE, module_name='articlemeta_thrift')
+
+    return _articlemeta_thrift
+
+
+class StaleConnection(TTransportException):
+    """
+    Falha de uma conexão reaproveitada do pool, possivelmente encerrada pelo
+    servidor por inatividade. Não é contabilizada como falha da réplica.
+    """
+
+
+class Endpoint(object):
+    """
+    Réplica do ArticleMeta: conexões abertas disponíveis, chamadas em
+    andamento e falhas consecutivas.
+    """
+
+    def __init__(self, address, port=DEFAULT_PORT):
+        self.address = address
+        self.port = port
+        self.idle = []
+        self.outstanding = 0
+        self.calls = 0
+        self.failures = 0
+        self.ejected_until = 0
+
+    @property
+    def name(self):
+        return '%s:%d' % (self.address, self.port)
+
+    def available(self, now):
+        return self.ejected_until <= now
+
+
+def parse_endpoints(domain):
+    """
+    Réplicas informadas em ``domain`` separadas por vírgula ou espaço, ex:
+    'am1:11720, am2:11720'.
+    """
+    endpoints = []
+
+    for item in re.split(r'[,\s]+', domain.strip()):
+        if not item:
+            continue
+        address, _, port = item.partition(':')
+        endpoints.append(Endpoint(address, int(port) if port else DEFAULT_PORT))
+
+    if not endpoints:
+        raise ValueError('no ArticleMeta endpoint in: %r' % domain)
+
+    return endpoints
+
+
+class ArticleMeta(ArticleMetaThriftClient):
+    """
+    Cliente thrift do ArticleMeta. Com ``prefetch_pages`` os métodos
+    journals e documents leem em uma thread até ``prefetch_pages`` páginas de
+    ``page_size`` registros à frente do consumidor (ver utils.prefetch).
+
+    ``domain`` aceita uma lista de réplicas (ver parse_endpoints). Cada
+    chamada é enviada à réplica com menos chamadas em andamento e as
+    conexões são mantidas abertas, até ``pool_size`` por réplica, para as
+    chamadas seguintes. A réplica com ``max_failures`` falhas consecutivas é
+    afastada por ``eject_seconds`` segundos, a primeira chamada após o prazo
+    verifica o seu restabelecimento. As novas tentativas após uma falha são
+    enviadas sem espera a outra réplica disponível.
+    """
+
+    def __init__(self, domain=None, admintoken=None, timeout=5000,
+                 page_size=LIMIT, prefetch_pages=0, pool_size=POOL_SIZE,
+                 max_failures=MAX_FAILURES, eject_seconds=EJECT_SECONDS):
+        self.endpoints = parse_endpoints(domain or 'articlemeta.scielo.org:11621')
+        super(ArticleMeta, self).__init__(
+            domain=self.endpoints[0].name, admintoken=admintoken, timeout=timeout)
+        self.page_size = page_size
+        self.prefetch_pages = prefetch_pages
+        self.pool_size = pool_size
+        self.max_failures = max_failures
+        self.eject_seconds = eject_seconds
+        self.ARTICLEMETA_THRIFT = load_articlemeta_thrift()
+        self._lock = threading.Lock()
+
+    def _acquire(self):
+        """
+        Réplica disponível com menos chamadas em andamento. Quando todas
+        estão afastadas é utilizada a que retorna primeiro.
+        """
+        with self._lock:
+            now = time.time()
+            available = [i for i in self.endpoints if i.available(now)]
+            if available:
+                endpoint = min(available, key=lambda i: (i.outstanding, i.calls))
+            else:
+                endpoint = min(self.endpoints, key=lambda i: i.ejected_until)
+            endpoint.outstanding += 1
+            endpoint.calls += 1
+
+            client = None
+            while endpoint.idle and client is None:
+                client, since = endpoint.idle.pop()
+                if now - since > IDLE_SECONDS:
+                    client.close()
+                    client = None
+
+        return endpoint, client
+
+    def _release(self, endpoint, client, broken=False, failed=False):
+        closing = []
+
+        with self._lock:
+            endpoint.outstanding -= 1
+            if failed:
+                endpoint.failures += 1
+                if endpoint.failures >= self.max_failures:
+                    endpoint.ejected_until = time.time() + self.eject_seconds
+                    closing = [i for i, _ in endpoint.idle]
+                    endpoint.idle = []
+                    logger.warning('ArticleMeta endpoint %s ejected for %d seconds' % (
+                        endpoint.name, self.eject_seconds))
+            elif not broken:
+                if endpoint.ejected_until:
+                    logger.info('ArticleMeta endpoint %s is back' % endpoint.name)
+                endpoint.failures = 0
+                endpoint.ejected_until = 0
+
+            if client is not None:
+                if broken or endpoint.ejected_until or len(endpoint.idle) >= self.pool_size:
+                    closing.append(client)
+                else:
+                    endpoint.idle.append((client, time.time()))
+
+        for item in closing:
+            item.close()
+
+    @contextmanager
+    def _connection(self, endpoint, client):
+        reused = client is not None
+        broken = failed = False
+
+        try:
+            if client is None:
+                client = make_client(
+                    self.ARTICLEMETA_THRIFT.ArticleMeta, endpoint.address,
+                    endpoint.port, timeout=self._timeout)
+            yield client
+        except (TTransportException, socket.error) as e:
+            broken = True
+            failed = not reused
+            if reused:
+                raise StaleConnection(message=str(e))
+            raise
+        except self.ARTICLEMETA_THRIFT.ServerError:
+            failed = True
+            raise
+        finally:
+            self._release(endpoint, client, broken, failed)
+
+    def _retry_elsewhere(self, endpoint):
+        now = time.time()
+
+        return any(i.available(now) for i in self.endpoints if i is not endpoint)
+
+    def dispatcher(self, *args, **kwargs):
+        """
+        Como ArticleMetaThriftClient.dispatcher, a espera entre as tentativas
+        ocorre apenas quando não há outra réplica disponível.
+        """
+        func = args[0]
+        msg = 'Error requesting articlemeta: %s' % str(func)
+
+        for attempt in range(self.ATTEMPTS):
+            endpoint, client = self._acquire()
+            try:
+                with self._connection(endpoint, client) as cl:
+                    return getattr(
+                        instrumentation.instrument(cl, 'articlemeta'), func)(*args[1:], **kwargs)
+
+            except StaleConnection:
+                continue
+
+            except (TTransportException, self.ARTICLEMETA_THRIFT.ServerError,
+                    socket.error) as e:
+                msg = 'Error requesting articlemeta %s: %s args: %s kwargs: %s message: %s' % (
+                    endpoint.name, str(func), str(args[1:]), str(kwargs), str(e)
+                )
+                logger.info("Request Retry (%d,%d): %s", attempt + 1, self.ATTEMPTS, msg)
+                if not self._retry_elsewhere(endpoint):
+                    time.sleep(self.ATTEMPTS * 2)
+
+            except self.ARTICLEMETA_THRIFT.Unauthorized as e:
+                msg = 'Unautorized access to articlemeta: %s args: %s kwargs: %s message: %s' % (
+                    str(func), str(args[1:]), str(kwargs), str(e)
+                )
+                raise UnauthorizedAccess(msg)
+
+            except self.ARTICLEMETA_THRIFT.ValueError as e:
+                msg = 'Error requesting articlemeta: %s args: %s kwargs: %s message: %s' % (
+                    str(func), str(args[1:]), str(kwargs), str(e)
+                )
+                raise ValueError(msg)
+
+        raise ServerError(msg)
+
+    def _prefetch(self, items, limit):
+
+        return utils.prefetch(items, self.prefetch_pages * limit)
+
+    @property
+    def client(self):
+        return instrumentation.instrument(make_client(
+            self.ARTICLEMETA_THRIFT.ArticleMeta, self._address, self._port,
+            timeout=self._timeout), 'articlemeta')
+
+    @contextmanager
+    def client_cntxt(self):
+        with self._connection(*self._acquire()) as client:
+            yield instrumentation.instrument(client, 'articlemeta')
+
+    def document(self, code, collection, replace_journal_metadata=True,
+                 fmt='xylose', body=False, fields=None):
+        """
+        Com ``fields`` (ver projection) o registro é reduzido às partes
+        informadas após a leitura, o ArticleMeta retorna o registro completo.
+        """
+        document = super(ArticleMeta, self).document(
+            code, collection, replace_journal_metadata=replace_journal_metadata,
+            fmt=fmt, body=body)
+
+        if fmt != 'xylose' or document is None:
+            return document
+
+        return project_document(document, fields)
+
+    def journals(self, collection=None, issn=None, only_identifiers=False, limit=None):
+        limit = limit or self.page_size
+
+        return self._prefetch(super(ArticleMeta, self).journals(
+            collection=collection, issn=issn, only_identifiers=only_identifiers,
+            limit=limit), limit)
+
+    def documents(self, collection=None, issn=None, from_date=None,
+                  until_date=None, fmt='xylose', body=False, extra_filter=None,
+                  only_identifiers=False, limit=None, fields=None):
+        check_fields(fields)
+        limit = limit or self.page_size
+
+        return self._prefetch(self._documents(
+            collection=collection, issn=issn, from_date=from_date,
+            until_date=until_date, fmt=fmt, body=body,
+            extra_filter=extra_filter, only_identifiers=only_identifiers,
+            limit=limit, fields=fields), limit)
+
+    def _documents(self, fields=None, **kwargs):
+
+        for document in super(ArticleMeta, self).documents(**kwargs):
+            if kwargs['only_identifiers'] or kwargs['fmt'] != 'xylose' or document is None:
+                yield document
+                continue
+            yield project_document(document, fields)
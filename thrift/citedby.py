@@ -0,0 +1,178 @@
+# coding: utf-8
+from __future__ import absolute_import
+import json
+import logging
+
+from citedby.client import ThriftClient as CitedByThriftClient
+from citedby.custom_query import journal_titles
+
+import instrumentation
+import utils
+
+logger = logging.getLogger(__name__)
+
+
+class Citedby(CitedByThriftClient):
+
+    @property
+    def client(self):
+        return instrumentation.instrument(
+            super(Citedby, self).client, 'citedby')
+
+    def publication_and_citing_years(self, issn, titles, py_range=None):
+
+        body = {"query": {"filtered": {}}}
+
+        fltr = {
+            "filter": {
+                "bool": {
+                    "must": []
+
+                }
+            }
+        }
+
+        if py_range:
+            fltr["filter"]["bool"]['must'].append(
+                {
+                    "range": {
+                        "publication_year": {
+                            "gte": py_range[0],
+                            "lte": py_range[1]
+                        }
+                    }
+                }
+            )
+
+        query = {
+            "query": {
+                "bool": {
+                    "should": [],
+                    "must_not": []
+                }
+            }
+        }
+
+        aggs = {
+            "aggs": {
+                "publication_year": {
+                    "terms": {
+                        "field": "publication_year",
+                        "size": 0
+                    },
+                    "aggs": {
+                        "reference_publication_year": {
+                            "terms": {
+                                "field": "reference_publication_year",
+                                "size": 0,
+                                "order": {
+                                    "_term": "desc"
+                                }
+                            }
+                        }
+                    }
+                }
+            }
+        }
+
+        for item in self._fuzzy_custom_query(issn, titles):
+            query['query']['bool']['should'].append(item)
+
+        for item in self._must_not_custom_query(issn):
+            query['query']['bool']['must_not'].append(item)
+
+        body['query']['filtered'].update(fltr)
+        body['query']['filtered'].update(query)
+        body.update(aggs)
+
+        query_parameters = [
+            ('size', '0'),
+            ('search_type', 'count')
+        ]
+
+        query_result = self.search(json.dumps(body), query_parameters)
+
+        return query_result
+
+    def citations_received(self, pids, rpc_fallback=False):
+        """
+        Retorna o total de citações recebidas por cada PID no formato
+        {pid: total}.
+
+        O índice do Citedby não permite agregar as citações por documento
+        citado, os totais são obtidos do relatório pré-produzido (heap)
+        carregado pela biblioteca citedbyapi. Quando ``rpc_fallback`` é
+        verdadeiro os PIDs ausentes do relatório são consultados na API.
+        """
+        # o relatório é carregado na importação do módulo, apenas pelos
+        # processamentos que o utilizam
+        from citedby import citations
+
+        result = {}
+        for pid in pids:
+            data = citations.raw_data(pid)
+
+            if not data and rpc_fallback:
+                data = self.citedby_pid(pid, metaonly=True, from_heap=False)
+
+            if data and 'article' in data:
+                result[pid] = data['article'].get('total_received', 0)
+
+        return result
+
+    def has_optmized_journal_queries(self, issn):
+
+        if journal_titles.load(issn):
+            return True
+
+        return False
+
+    @staticmethod
+    def _must_not_custom_query(issn):
+        """
+            Este metodo constroi a lista de filtros por título de periódico que
+            será aplicada na pesquisa boleana como restrição "must_not".
+            A lista de filtros é coletada do template de pesquisa customizada
+            do periódico, quanto este template existir.
+        """
+
+        custom_queries = set([utils.cleanup_string(i) for i in journal_titles.load(issn).get('must_not', [])])
+
+        for item in custom_queries:
+
+            query = {
+                "match": {
+                    "reference_source_cleaned": item
+                }
+            }
+
+            yield query
+
+    @staticmethod
+    def _fuzzy_custom_query(issn, titles):
+        """
+            Este metodo constroi a lista de filtros por título de periódico que
+            será aplicada na pesquisa boleana como match por similaridade "should".
+            A lista de filtros é coletada do template de pesquisa customizada
+            do periódico, quanto este template existir.
+        """
+        custom_queries = journal_titles.load(issn).get('should', [])
+        titles = [{'title': i} for i in titles if i not in [x['title'] for x in custom_queries]]
+        titles.extend(custom_queries)
+
+        for item in titles:
+
+            if len(item['title'].strip()) == 0:
+                continue
+
+            query = {
+                "fuzzy": {
+                    "reference_source_cleaned": {
+                        "value": utils.cleanup_string(item['title']),
+                        "fuzziness": item.get('fuzziness', 3),
+                        "max_expansions": 50
+                    }
+                }
+            }
+
+            yield query
@@ -0,0 +1,380 @@
+# coding: utf-8
+from __future__ import absolute_import
+import json
+import logging
+from datetime import date
+
+from publicationstats.client import ThriftClient as PublicationThriftClient
+
+import instrumentation
+
+logger = logging.getLogger(__name__)
+
+
+class PublicationStats(PublicationThriftClient):
+
+    @property
+    def client(self):
+        return instrumentation.instrument(
+            super(PublicationStats, self).client, 'publicationstats')
+
+    def _compute_documents_languages_by_year(self, query_result, years=0):
+
+        year = date.today().year
+
+        years = {str(i): {'pt': 0, 'en': 0, 'es': 0, 'other': 0} for i in range(year, year-years, -1)}
+
+        for item in query_result['aggregations']['publication_year']['buckets']:
+            if not item['key'] in years:
+                continue
+
+            langs = {'pt': 0, 'en': 0, 'es': 0, 'other': 0}
+
+            for language in item['languages']['buckets']:
+                if language['key'] in langs:
+                    langs[language['key']] += language['doc_count']
+                else:
+                    langs['other'] += language['doc_count']
+
+            years[item['key']] = langs
+
+        return years
+
+    def documents_languages_by_year(self, issn, collection, years=0):
+
+        body = {
+            "query": {
+                "filtered": {
+                    "query": {
+                        "bool": {
+                            "must": [
+                                {
+                                    "match": {
+                                        "issn": issn
+                                    }
+                                },
+                                {
+                                    "match": {
+                                        "collection": collection
+                                    }
+                                }
+                            ]
+                        }
+                    }
+                }
+            },
+            "aggs": {
+                "publication_year": {
+                    "terms": {
+                        "field": "publication_year",
+                        "size": years,
+                        "order": {
+                            "_term": "desc"
+                        }
+                    },
+                    "aggs": {
+                        "languages": {
+                            "terms": {
+                                "field": "languages",
+                                "size": 0
+                            }
+                        }
+                    }
+                }
+            }
+        }
+
+        query_parameters = [
+            ('size', '0')
+        ]
+
+        query_result = self.search('article', json.dumps(body), query_parameters)
+
+        return self._compute_documents_languages_by_year(query_result, years=years)
+
+    def _compute_number_of_articles_by_year(self, query_result, years=0):
+
+
+        if years == 0:
+            return query_result['aggregations']['id']['value']
+
+        year = date.today().year
+
+        years = {str(i): 0 for i in range(year, year-years, -1)}
+
+        for item in query_result['aggregations']['publication_year']['buckets']:
+            if not item['key'] in years:
+                continue
+
+            years[item['key']] = item.get('doc_count', 0)
+
+        return [(k, v) for k, v in sorted(years.items(), reverse=True)]
+
+    def number_of_articles_by_year(self, issn, collection, document_types=None, years=0):
+
+        body = {
+            "query": {
+                "filtered": {
+                    "query": {
+                        "bool": {
+                            "must": [
+                                {
+                                    "match": {
+                                        "issn": issn
+                                    }
+                                },
+                                {
+                                    "match": {
+                                        "collection": collection
+                                    }
+                                }
+                            ]
+                        }
+                    }
+                }
+            },
+            "aggs": {
+                "id": {
+                    "cardinality": {
+                        "field": "id"
+                    }
+                }
+            }
+        }
+
+        if document_types:
+
+            body['query']['filtered']['filter'] = {
+                "query": {
+                    "bool": {
+                        "should": []
+                    }
+                }
+            }
+
+            for item in document_types:
+
+                body['query']['filtered']['filter']['query']['bool']['should'].append({
+                    "match": {
+                        "document_type": item
+                    }
+                })
+
+        if years != 0:
+            body['aggs'] = {
+                "publication_year": {
+                    "terms": {
+                        "field": "publication_year",
+                        "size": years,
+                        "order": {
+                            "_term": 'desc'
+                        }
+                    },
+                    "aggs": {
+                        "id": {
+                            "cardinality": {
+                                "field": "id"
+                            }
+                        }
+                    }
+                }
+            }
+
+        query_parameters = [
+            ('size', '0')
+        ]
+
+        query_result = self.search('article', json.dumps(body), query_parameters)
+
+        return self._compute_number_of_articles_by_year(query_result, years=years)
+
+    def _compute_number_of_issues_by_year(self, query_result, years=0):
+
+        if years == 0:
+            return query_result['aggregations']['issue']['value']
+
+        year = date.today().year
+
+        years = {str(i): 0 for i in range(year, year-years, -1)}
+
+        for item in query_result['aggregations']['publication_year']['buckets']:
+            if not item['key'] in years:
+                continue
+            years[item['key']] = item.get('issue', {}).get('value', 0)
+
+        return [(k, v) for k, v in sorted(years.items(), reverse=True)]
+
+    def number_of_issues_by_year(self, issn, collection, years=0, type=None):
+        """
+        type: ['regular', 'supplement', 'pressrelease', 'ahead', 'special']
+        """
+
+        body = {
+            "query": {
+                "bool": {
+                    "must": [
+                        {
+                            "match": {
+                                "issn": issn
+                            }
+                        },
+                        {
+                            "match": {
+                                "collection": collection
+                            }
+                        }
+                    ]
+                }
+            },
+            "aggs": {
+                "issue": {
+                    "cardinality": {
+                        "field": "issue"
+                    }
+                }
+            }
+
+        }
+
+        if type:
+            body['query']['bool']['must'].append({"match": {"issue_type": type}})
+
+        if years != 0:
+            body['aggs'] = {
+                "publication_year": {
+                    "terms": {
+                        "field": "publication_year",
+                        "size": years,
+                        "order": {
+                            "_term": 'desc'
+                        }
+                    },
+                    "aggs": {
+                        "issue": {
+                            "cardinality": {
+                                "field": "issue"
+                            }
+                        }
+                    }
+                }
+            }
+
+        query_parameters = [
+            ('size', '0')
+        ]
+
+        query_result = self.search(
+            'article', json.dumps(body), query_parameters
+        )
+
+        return self._compute_number_of_issues_by_year(
+            query_result, years=years)
+
+    def _compute_first_included_document_by_journal(self, query_result):
+
+        if len(query_result.get('hits', {'hits': []}).get('hits', [])) == 0:
+            return None
+
+        return query_result['hits']['hits'][0].get('_source', None)
+
+    def first_included_document_by_journal(self, issn, collection):
+
+        body = {
+            "query": {
+                "filtered": {
+                    "query": {
+                        "bool": {
+                            "must": [
+                                {
+                                    "match": {
+                                        "collection": collection
+                                    }
+                                },
+                                {
+                                    "match": {
+                                        "issn": issn
+                                    }
+                                },
+                                {
+                                    "match": {
+                                        "issue_type": "regular"
+                                    }
+                                }
+                            ]
+                        }
+                    }
+                }
+            },
+            "sort": [
+                {
+                    "publication_date": {
+                        "order": "asc"
+                    }
+                }
+            ]
+        }
+
+        query_parameters = [
+            ('size', '1')
+        ]
+
+        query_result = self.search('article', json.dumps(body), query_parameters)
+
+        return self._compute_first_included_document_by_journal(query_result)
+
+    def _compute_last_included_document_by_journal(self, query_result):
+
+        if len(query_result.get('hits', {'hits': []}).get('hits', [])) == 0:
+            return None
+
+        return query_result['hits']['hits'][0].get('_source', None)
+
+    def last_included_document_by_journal(self, issn, collection, metaonly=False):
+
+        body = {
+            "query": {
+                "filtered": {
+                    "query": {
+                        "bool": {
+                            "must": [
+                                {
+                                    "match": {
+                                        "collection": collection
+                                    }
+                                },
+                                {
+                                    "match": {
+                                        "issn": issn
+                                    }
+                                },
+                                {
+                                    "match": {
+                                        "issue_type": "regular"
+                                    }
+                                }
+                            ]
+                        }
+                    },
+                    "filter": {
+                        "exists": {
+                            "field": "publication_date"
+                        }
+                    }
+                }
+            },
+            "sort": [
+                {
+                    "publication_date": {
+                        "order": "desc"
+                    }
+                }
+            ]
+        }
+
+        query_parameters = [
+            ('size', '1')
+        ]
+
+        query_result = self.search('article', json.dumps(body), query_parameters)
+
+        return self._compute_last_included_document_by_journal(query_result)
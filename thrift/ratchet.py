@@ -0,0 +1,288 @@
+# coding: utf-8
+from __future__ import absolute_import
+import os
+import re
+import json
+import logging
+import calendar
+import importlib
+
+import thriftpy
+from thriftpy.rpc import make_client
+from thriftpy.thrift import TApplicationException
+
+import instrumentation
+
+logger = logging.getLogger(__name__)
+
+RATCHET_THRIFT_FILE = os.path.join(os.path.dirname(__file__), 'ratchet.thrift')
+
+YEAR_KEY = re.compile(r'^y[0-9]{4}$')
+GRANULARITIES = ('monthly', 'daily')
+ACCESS_TYPES = ('abstract', 'html', 'pdf', 'readcube')
+
+# protocolo e transporte devem ser os mesmos configurados no servidor, as
+# fábricas são importadas apenas quando utilizadas pois nem todas as versões
+# do thriftpy oferecem o protocolo compact
+PROTOCOLS = {
+    'binary': ('thriftpy.protocol', 'TBinaryProtocolFactory'),
+    'compact': ('thriftpy.protocol', 'TCompactProtocolFactory'),
+}
+TRANSPORTS = {
+    'buffered': ('thriftpy.transport', 'TBufferedTransportFactory'),
+    'framed': ('thriftpy.transport', 'TFramedTransportFactory'),
+}
+
+_ratchet_thrift = None
+
+
+def _factory(factories, kind, name):
+    try:
+        module, attr = factories[name]
+    except KeyError:
+        raise ValueError('invalid thrift %s: %s' % (kind, name))
+
+    try:
+        return getattr(importlib.import_module(module), attr)()
+    except (ImportError, AttributeError):
+        raise ValueError(
+            'the %s thrift %s is not available in the installed thriftpy' % (name, kind))
+
+
+def protocol_factory(name):
+    """
+    Fábrica do protocolo thrift ``name`` (ver PROTOCOLS), levanta ValueError
+    quando o protocolo é inválido ou não é oferecido pelo thriftpy instalado.
+    """
+    return _factory(PROTOCOLS, 'protocol', name)
+
+
+def transport_factory(name):
+    """
+    Fábrica do transporte thrift ``name`` (ver TRANSPORTS), levanta
+    ValueError quando o transporte é inválido ou não é oferecido pelo
+    thriftpy instalado.
+    """
+    return _factory(TRANSPORTS, 'transport', name)
+
+
+def load_ratchet_thrift():
+    """
+    Carrega o IDL do Ratchet apenas quando o primeiro cliente é criado.
+    """
+    global _ratchet_thrift
+
+    if _ratchet_thrift is None:
+        _ratchet_thrift = thriftpy.load(RATCHET_THRIFT_FILE)
+
+    return _ratchet_thrift
+
+
+def date_bound(date, end=False):
+    """
+    Data ISO completa de um limite de período informado como 'AAAA',
+    'AAAA-MM' ou 'AAAA-MM-DD'. O limite final ``end`` é o último dia do mês
+    ou do ano.
+
+    input:
+        '2013-02', end=True
+    output:
+        '2013-02-28'
+    """
+    date = date[:10]
+    if len(date) == 4:
+        date += '-12' if end else '-01'
+    if len(date) == 7:
+        year, month = int(date[:4]), int(date[5:7])
+        date += '-%02d' % (calendar.monthrange(year, month)[1] if end else 1)
+
+    return date
+
+
+def window_tree(tree, begin_date, end_date, granularity='monthly'):
+    """
+    Restringe uma árvore de acessos ({'total', 'yAAAA': {'total', 'mMM':
+    {'total', 'dDD'}}}) ao período informado, recalculando os totais. Na
+    granularidade mensal os dias são omitidos. As árvores aninhadas (ex: os
+    tipos de acesso) são restringidas da mesma forma e as demais chaves são
+    mantidas. Os limites podem ser datas parciais (ver date_bound).
+    """
+    begin_date = date_bound(begin_date)
+    end_date = date_bound(end_date, end=True)
+    result = {}
+    total = 0
+
+    for key, value in tree.items():
+        if key == 'total':
+            continue
+
+        if not YEAR_KEY.match(key):
+            if isinstance(value, dict):
+                value = window_tree(value, begin_date, end_date, granularity)
+            result[key] = value
+            continue
+
+        if not begin_date[:4] <= key[1:] <= end_date[:4]:
+            continue
+
+        year = {}
+        for mkey, days in value.items():
+            dt = '%s-%s' % (key[1:], mkey[1:])
+            if mkey == 'total' or not begin_date[:7] <= dt <= end_date[:7]:
+                continue
+
+            if granularity == 'daily':
+                month = dict(
+                    (dkey, count) for dkey, count in days.items()
+                    if dkey != 'total' and begin_date <= '%s-%s' % (dt, dkey[1:]) <= end_date
+                )
+                if not month:
+                    continue
+                month['total'] = sum(month.values())
+            else:
+                month = {'total': days['total']}
+
+            year[mkey] = month
+
+        if year:
+            year['total'] = sum(month['total'] for month in year.values())
+            result[key] = year
+            total += year['total']
+
+    if 'total' in tree:
+        result['total'] = total
+
+    return result
+
+
+def window_record(record, begin_date, end_date, granularity='monthly'):
+    """
+    Restringe ao período informado o registro retornado pelo método general
+    do Ratchet.
+    """
+    result = dict(record)
+    result['objects'] = [
+        window_tree(item, begin_date, end_date, granularity)
+        for item in record.get('objects', [])
+    ]
+
+    return result
+
+
+def record_periods(record, granularity='monthly'):
+    """
+    Converte o registro retornado pelo método general do Ratchet na lista de
+    PeriodAccesses do primeiro objeto, ordenada por período ('AAAA-MM' ou
+    'AAAA-MM-DD' conforme a granularidade), com os acessos de cada tipo em
+    access_<tipo>. É o mesmo retorno do método accesses.
+    """
+    periods = {}
+
+    for item in record.get('objects', [])[:1]:
+        for atype in ACCESS_TYPES:
+            for year, months in item.get(atype, {}).items():
+                if not YEAR_KEY.match(year):
+                    continue
+                for month, days in months.items():
+                    if month == 'total':
+                        continue
+                    dt = '%s-%s' % (year[1:], month[1:])
+                    if granularity == 'daily':
+                        counts = [
+                            ('%s-%s' % (dt, day[1:]), count)
+                            for day, count in days.items() if day != 'total'
+                        ]
+                    else:
+                        counts = [(dt, days['total'])]
+                    for period, count in counts:
+                        accesses = periods.setdefault(period, {})
+                        accesses[atype] = accesses.get(atype, 0) + count
+
+    period_accesses = load_ratchet_thrift().PeriodAccesses
+
+    return [
+        period_accesses(period=period, **dict(
+            ('access_%s' % atype, count) for atype, count in periods[period].items()))
+        for period in sorted(periods)
+    ]
+
+
+class Ratchet(object):
+
+    def __init__(self, address, port, protocol='binary', transport='buffered'):
+        """
+        Cliente thrift para o Ratchet. ``protocol`` ('binary' ou 'compact') e
+        ``transport`` ('buffered' ou 'framed') devem corresponder aos do
+        servidor.
+        """
+        self._address = address
+        self._port = port
+        self._proto_factory = protocol_factory(protocol)
+        self._trans_factory = transport_factory(transport)
+        self._range_supported = True
+        self._periods_supported = True
+
+    @property
+    def client(self):
+        client = make_client(
+            load_ratchet_thrift().RatchetStats,
+            self._address,
+            self._port,
+            proto_factory=self._proto_factory,
+            trans_factory=self._trans_factory
+        )
+
+        return instrumentation.instrument(client, 'ratchet')
+
+    def document(self, code):
+
+        data = self.client.general(code=code)
+
+        return data
+
+    def document_range(self, code, begin_date, end_date, granularity='monthly'):
+        """
+        Acessos do documento restritos ao período informado (datas ISO). Os
+        servidores sem o método general_range retornam todo o histórico, que
+        é restringido localmente.
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError('invalid granularity: %s' % granularity)
+
+        if self._range_supported:
+            try:
+                return self.client.general_range(
+                    code=code, begin_date=begin_date, end_date=end_date,
+                    granularity=granularity)
+            except TApplicationException as e:
+                if e.type != TApplicationException.UNKNOWN_METHOD:
+                    raise
+                logger.warning('Ratchet general_range is not available, filtering the accesses locally')
+                self._range_supported = False
+
+        return json.dumps(window_record(
+            json.loads(self.document(code)), begin_date, end_date, granularity))
+
+    def document_periods(self, code, begin_date, end_date, granularity='monthly'):
+        """
+        Lista de PeriodAccesses do documento no período informado. O método
+        accesses dispensa a serialização e a leitura do JSON; nos servidores
+        sem esse método os períodos são extraídos do retorno do general_range.
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError('invalid granularity: %s' % granularity)
+
+        if self._periods_supported:
+            try:
+                return self.client.accesses(
+                    code=code, begin_date=begin_date, end_date=end_date,
+                    granularity=granularity)
+            except TApplicationException as e:
+                if e.type != TApplicationException.UNKNOWN_METHOD:
+                    raise
+                logger.warning('Ratchet accesses is not available, reading the accesses from the JSON records')
+                self._periods_supported = False
+
+        return record_periods(
+            json.loads(self.document_range(code, begin_date, end_date, granularity)),
+            granularity)
@@ -6,6 +6,18 @@ exception ValueError {
     1: string message,
 }
 
+/* acessos de um período ('AAAA-MM' ou 'AAAA-MM-DD') por tipo de acesso,
+   os tipos sem acessos registrados não são enviados */
+struct PeriodAccesses {
+    1: string period,
+    2: optional i32 access_abstract,
+    3: optional i32 access_html,
+    4: optional i32 access_pdf,
+    5: optional i32 access_readcube,
+}
+
 service RatchetStats {
     string general(1:string code) throws (1:ValueError value_err, 2:ServerError server_err)
-}
\ No newline at end of file
+    string general_range(1:string code, 2:string begin_date, 3:string end_date, 4:string granularity) throws (1:ValueError value_err, 2:ServerError server_err)
+    list<PeriodAccesses> accesses(1:string code, 2:string begin_date, 3:string end_date, 4:string granularity) throws (1:ValueError value_err, 2:ServerError server_err)
+}
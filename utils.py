@@ -6,8 +6,19 @@ import re
 import unicodedata
 import logging
 import string
+import threading
+import time
+import zlib
 
-from thrift import clients
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
 
 try:
     from configparser import ConfigParser
@@ -36,20 +47,33 @@ def cleanup_string(text):
     return remove_tags(cleaned_str).lower()
 
 
+# bytes ASCII removidos por slugify, tudo exceto letras, dígitos, _, - e
+# espaços
+SLUG_DELETE = bytes(bytearray(
+    i for i in range(128)
+    if not (chr(i).isalnum() or chr(i) in '_-' or chr(i).isspace())
+))
+SLUG_SEPARATORS = re.compile(r'[-\s]+')
+SLUG_NOT_ALLOWED = re.compile(r'[^\w\s-]', re.UNICODE)
+
+
 def slugify(value, allow_unicode=False):
     """
     Convert to ASCII if 'allow_unicode' is False. Convert spaces to hyphens.
     Remove characters that aren't alphanumerics, underscores, or hyphens.
     Convert to lowercase. Also strip leading and trailing whitespace.
+
+    Sem 'allow_unicode' os caracteres são removidos dos bytes ASCII com
+    bytes.translate e SLUG_DELETE, em vez de uma expressão regular.
     """
-    value
     if allow_unicode:
         value = unicodedata.normalize('NFKC', value)
+        value = SLUG_NOT_ALLOWED.sub('', value).strip().lower()
     else:
-        value = unicodedata.normalize('NFKD', value).encode('ascii', 'ignore').decode('ascii')
-    value = re.sub(r'[^\w\s-]', '', value).strip().lower()
+        value = unicodedata.normalize('NFKD', value).encode('ascii', 'ignore')
+        value = value.translate(None, SLUG_DELETE).decode('ascii').strip().lower()
 
-    return re.sub(r'[-\s]+', '-', value)
+    return SLUG_SEPARATORS.sub('-', value)
 
 
 class SingletonMixin(object):
@@ -120,36 +144,303 @@ class Configuration(SingletonMixin):
             section in [section for section in self.conf.sections()]]
 
 
-config = Configuration.from_env()
-settings = dict(config.items())
+class LazySettings(Mapping):
+    """
+    Configurações lidas do arquivo indicado em PROCESSING_SETTINGS_FILE apenas
+    no primeiro acesso. Na ausência da variável de ambiente as configurações
+    ficam vazias e os valores padrão de cada cliente são utilizados.
+    """
+
+    def __init__(self):
+        self._settings = None
+
+    def _load(self):
+        if self._settings is None:
+            try:
+                self._settings = dict(Configuration.from_env().items())
+            except ValueError as e:
+                logger.warning('%s, using default settings', e)
+                self._settings = {}
+
+        return self._settings
+
+    def __getitem__(self, key):
+        return self._load()[key]
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self):
+        return len(self._load())
+
+
+settings = LazySettings()
+
+
+class RateLimiter(object):
+    """
+    Limita a quantidade de chamadas por segundo compartilhadas entre threads.
+
+    ``rate`` é o número máximo de chamadas por segundo, ``None`` ou ``0``
+    desabilita a limitação.
+    """
+
+    def __init__(self, rate=None):
+        self.interval = 1.0 / rate if rate else 0
+        self._lock = threading.Lock()
+        self._next_call = 0
+
+    def wait(self):
+        if not self.interval:
+            return
+
+        with self._lock:
+            now = time.time()
+            delay = self._next_call - now
+            self._next_call = max(now, self._next_call) + self.interval
+
+        if delay > 0:
+            time.sleep(delay)
+
+
+_STOP = object()
+
+
+def run_pipeline(items, stages, maxsize=100):
+    """
+    Executa uma sequência de estágios sobre os itens informados, cada estágio
+    com o seu próprio conjunto de threads e uma fila limitada de entrada.
+
+    ``stages`` é uma lista de tuplas (nome, função, número de threads). Cada
+    função recebe um item e retorna o item que será entregue ao próximo
+    estágio, ou ``None`` para descartá-lo. Os retornos do último estágio são
+    descartados. Exceções são registradas no log e descartam apenas o item
+    que as originou.
+    """
+
+    def worker(name, func, inbox, outbox):
+        while True:
+            item = inbox.get()
+            if item is _STOP:
+                return
+            try:
+                result = func(item)
+            except Exception as e:
+                logger.error('Fail to process item at stage %s', name)
+                logger.exception(e)
+                continue
+            if result is not None and outbox is not None:
+                outbox.put(result)
+
+    queues = [queue.Queue(maxsize) for _ in stages]
+    pools = []
+    for index, (name, func, workers) in enumerate(stages):
+        outbox = queues[index + 1] if index + 1 < len(queues) else None
+        pool = [
+            threading.Thread(target=worker, args=(name, func, queues[index], outbox))
+            for _ in range(max(workers, 1))
+        ]
+        for thread in pool:
+            thread.daemon = True
+            thread.start()
+        pools.append(pool)
+
+    for item in items:
+        queues[0].put(item)
+
+    for index, pool in enumerate(pools):
+        for _ in pool:
+            queues[index].put(_STOP)
+        for thread in pool:
+            thread.join()
+
+
+class _Raised(object):
+
+    def __init__(self, error):
+        self.error = error
+
+
+def prefetch(items, depth):
+    """
+    Itera ``items`` em uma thread, mantendo até ``depth`` itens lidos à
+    frente do consumidor em uma fila limitada, para que a leitura (ex:
+    chamadas remotas) ocorra enquanto o consumidor processa os itens já
+    lidos. As exceções da leitura são relançadas no consumidor, na mesma
+    posição da sequência. Com ``depth`` menor que 1 os itens são lidos sem
+    thread.
+    """
+    if depth < 1:
+        for item in items:
+            yield item
+        return
+
+    buffer = queue.Queue(depth)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def producer():
+        try:
+            for item in items:
+                if not put(item):
+                    return
+        except Exception as e:
+            put(_Raised(e))
+            return
+        put(_STOP)
+
+    thread = threading.Thread(target=producer)
+    thread.daemon = True
+    thread.start()
+
+    try:
+        while True:
+            item = buffer.get()
+            if item is _STOP:
+                return
+            if isinstance(item, _Raised):
+                raise item.error
+            yield item
+    finally:
+        # consumidor interrompido, a thread é encerrada na próxima inclusão
+        stop.set()
+
+
+def parse_shard(value):
+    """
+    Converte 'K/N' em (K, N), com 1 <= K <= N.
+
+    ex:
+    '2/4': (2, 4)
+    """
+    try:
+        k, n = [int(i) for i in value.split('/')]
+    except (AttributeError, ValueError):
+        raise ValueError('invalid shard, expected K/N: %s' % value)
+
+    if n < 1 or not 1 <= k <= n:
+        raise ValueError('invalid shard, expected 1 <= K <= N: %s' % value)
+
+    return (k, n)
+
+
+def shard_of(issn, shards):
+    """
+    Partição (1..shards) do ISSN. O crc32 do ISSN é estável entre execuções,
+    máquinas e versões do Python, ao contrário de hash().
+    """
+    return zlib.crc32(issn.strip().upper().encode('ascii')) % shards + 1
+
+
+class ShardedArticleMeta(object):
+    """
+    Restringe os periódicos e documentos do ArticleMeta aos periódicos da
+    partição ``shard`` (K, N), definida pelo scielo_issn.
+    """
+
+    def __init__(self, articlemeta, shard):
+        self._articlemeta = articlemeta
+        self.shard = shard
+
+    def __getattr__(self, name):
+        return getattr(self._articlemeta, name)
+
+    def in_shard(self, issn):
+        k, n = self.shard
+        return shard_of(issn, n) == k
+
+    @staticmethod
+    def _issn(journal):
+        return getattr(journal, 'scielo_issn', None) or journal.code
+
+    def journals(self, collection=None, issn=None, **kwargs):
+        if issn and not self.in_shard(issn):
+            return
+
+        for journal in self._articlemeta.journals(collection=collection, issn=issn, **kwargs):
+            if self.in_shard(self._issn(journal)):
+                yield journal
+
+    def documents(self, collection=None, issn=None, **kwargs):
+        if issn:
+            issns = [issn] if self.in_shard(issn) else []
+        else:
+            issns = []
+            for journal in self.journals(collection=collection, only_identifiers=True):
+                if self._issn(journal) not in issns:
+                    issns.append(self._issn(journal))
+
+        for issn in issns:
+            for document in self._articlemeta.documents(collection=collection, issn=issn, **kwargs):
+                yield document
 
 
 def publicationstats_server():
-    server = settings['app:main'].get('publicationstats_thriftserver', 'publication.scielo.org:11620')
-    return clients.PublicationStats(server)
+    from thrift.publicationstats import PublicationStats
+    server = settings.get('app:main', {}).get('publicationstats_thriftserver', 'publication.scielo.org:11620')
+    return PublicationStats(server)
 
 
 def citedby_server():
-    server = settings['app:main'].get('citedby_thriftserver', 'citedby.scielo.org:11610')
-    return clients.Citedby(domain=server)
+    from thrift.citedby import Citedby
+    server = settings.get('app:main', {}).get('citedby_thriftserver', 'citedby.scielo.org:11610')
+    return Citedby(domain=server)
 
 
 def ratchet_server():
-    server = settings['app:main'].get('ratchet_thriftserver', 'ratchet.scielo.org:11630').split(':')
+    from thrift.ratchet import Ratchet
+    app = settings.get('app:main', {})
+    server = app.get('ratchet_thriftserver', 'ratchet.scielo.org:11630').split(':')
     host = server[0]
     port = int(server[1])
-    return clients.Ratchet(host, port)
+    return Ratchet(
+        host, port,
+        protocol=app.get('ratchet_thrift_protocol', 'binary'),
+        transport=app.get('ratchet_thrift_transport', 'buffered')
+    )
+
+
+def articlemeta_server(source=None, shard=None):
+    """
+    Retorna o cliente do ArticleMeta, articlemeta_thriftserver pode
+    informar uma lista de réplicas. Quando ``source`` tem o formato
+    ``snapshot:PATH`` os registros são lidos do snapshot local PATH
+    (ver processing_snapshot). Com ``shard`` (K, N) apenas os periódicos da
+    partição K de N são retornados (ver parse_shard).
+    """
+    if source and source.startswith('snapshot:'):
+        from snapshot.store import SnapshotStore
+        client = SnapshotStore(source[len('snapshot:'):])
+    else:
+        from thrift.articlemeta import ArticleMeta
+        config = settings.get('app:main', {})
+        client = ArticleMeta(
+            domain=config.get('articlemeta_thriftserver', 'articlemeta.scielo.org:11621'),
+            admintoken=config.get('articlemeta_admintoken', None),
+            page_size=int(config.get('articlemeta_page_size', 1000)),
+            prefetch_pages=int(config.get('articlemeta_prefetch_pages', 1)),
+            pool_size=int(config.get('articlemeta_pool_size', 8)),
+            eject_seconds=int(config.get('articlemeta_eject_seconds', 30))
+        )
 
+    if shard:
+        return ShardedArticleMeta(client, shard)
 
-def articlemeta_server():
-    server = settings['app:main'].get('articlemeta_thriftserver', 'articlemeta.scielo.org:11621')
-    admintoken = settings['app:main'].get('articlemeta_admintoken', None)
-    return clients.ArticleMeta(domain=server, admintoken=admintoken)
+    return client
 
 
 def accessstats_server():
-    server = settings['app:main'].get('accessesstats_thriftserver', 'ratchet.scielo.org:11660')
-    return clients.AccessStats(server)
+    from thrift.accessstats import AccessStats
+    server = settings.get('app:main', {}).get('accessesstats_thriftserver', 'ratchet.scielo.org:11660')
+    return AccessStats(server)
 
 
 def is_valid_date(value):